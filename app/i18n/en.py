@@ -82,5 +82,13 @@ STRINGS_EN = {
         "sentiment_off_topic": "Off-topic",
         "feedback_cta": "Help us improve: please fill out this short form.",
         "feedback_button": "Share feedback",
+        "partial_result": "⚠️ Time limit reached: based on {coverage}% of the comments.",
+        "theme_praise": "praise",
+        "theme_criticism": "criticism",
+        "theme_first_comment": "first comment",
+        "theme_greeting": "greeting",
+        "theme_no_content": "no content",
+        "theme_timestamp": "timestamp",
+        "theme_emoji_reaction": "emoji reaction",
     },
 } 
\ No newline at end of file
@@ -81,5 +81,13 @@ STRINGS_RU = {"ru": {
     "sentiment_off_topic": "Не по теме",
     "feedback_cta": "Помогите нам стать лучше: заполните короткую форму.",
     "feedback_button": "Оставить отзыв",
+    "partial_result": "⚠️ Достигнут лимит времени: анализ по {coverage}% комментариев.",
+    "theme_praise": "похвала",
+    "theme_criticism": "критика",
+    "theme_first_comment": "первый комментарий",
+    "theme_greeting": "приветствие",
+    "theme_no_content": "без содержания",
+    "theme_timestamp": "таймкод",
+    "theme_emoji_reaction": "реакция эмодзи",
 },
 } 
@@ -3,7 +3,16 @@ from contextlib import asynccontextmanager
 
 from fastapi import Depends, FastAPI
 from config import get_settings
+from app.services.abort import get_abort_watcher
+from app.routers.analyze.jobs import jobs_router
 from app.routers.analyze.youtube_video import youtube_router
+from app.services.analyzer import get_analyzer
+from app.services.cache import get_result_cache
+from app.services.idempotency import get_idempotency_store
+from app.services.jobs import get_job_store
+from app.services.limiter import get_openai_limiter, get_openai_rate_limiter
+from app.services.singleflight import get_single_flight
+from app.services.youtube import close_youtube_service
 
 # Configure logging
 logging.basicConfig(
@@ -20,6 +29,7 @@ async def lifespan(app: FastAPI):
     settings = get_settings()  
     yield    
     # Shutdown
+    await close_youtube_service()
     logger.info("Bot shutdown complete")
 
 
@@ -45,6 +55,7 @@ app = FastAPI(
 )
 
 app.include_router(youtube_router)
+app.include_router(jobs_router)
 
 
 @app.get("/health")
@@ -52,6 +63,24 @@ async def root():
     """Health check endpoint."""
     return {"status": "ok"}
 
+
+@app.get("/metrics")
+async def metrics():
+    """Saturation and cache counters of the analysis pipeline."""
+    return {
+        "openai_limiter": get_openai_limiter().stats(),
+        "openai_rate_limiter": get_openai_rate_limiter().stats(),
+        "comment_cache": get_analyzer().cache.stats(),
+        "comment_dedup": dict(get_analyzer().dedup_stats),
+        "prefilter": get_analyzer().prefilter.stats(),
+        "result_cache": get_result_cache().stats(),
+        "single_flight": get_single_flight().stats(),
+        "analysis_jobs": get_job_store().stats(),
+        "idempotency": get_idempotency_store().stats(),
+        "aborted_requests": get_abort_watcher().stats(),
+        "aborted_work": dict(get_analyzer().abort_stats),
+    }
+
 # For running with: uvicorn app.main:app
 if __name__ == "__main__":
     import uvicorn
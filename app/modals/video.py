@@ -1,5 +1,5 @@
 from typing import Literal, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class CommentAnalysisResult(BaseModel):
@@ -15,6 +15,9 @@ class Comment(BaseModel):
     author: str
     reply_count: int = 0
     analysis_result: Optional[CommentAnalysisResult] = None
+    id: Optional[str] = None  # YouTube comment ID (the thread ID for top-level comments)
+    parent_id: Optional[str] = None  # set on replies
+    replies: list["Comment"] = Field(default_factory=list)  # fetched replies, see expand_replies()
 
 
 class VideoInfo(BaseModel):
@@ -22,11 +25,19 @@ class VideoInfo(BaseModel):
     video_id: str
     title: str
     channel: str
+    # statistics.commentCount (replies included); None when the channel hides it
+    comment_count: Optional[int] = None
 
 class VideoAnalysisRequest(BaseModel):
     """Request model for video analysis."""
     video_url: str
     language: Optional[Literal["en", "ru"]] = "en"  # Default to English
+    # Seconds the caller will wait; past it the analysis returns a partial result
+    deadline_s: Optional[float] = Field(default=None, gt=0, le=600)
+    # "full": the first max_comments comments; "sample": a random sample of max_comments;
+    # "sequential": classify a stratified random sample until sentiment shares are stable;
+    # "auto": pick one of them from the video's comment count and the deadline
+    mode: Literal["auto", "full", "sample", "sequential"] = "full"
 
 class VideoAnalysisResponse(BaseModel):
     """Response model for video analysis."""
@@ -34,4 +45,27 @@ class VideoAnalysisResponse(BaseModel):
     count_comments_per_sentiment: dict[str, int]
     likes_per_category: dict[str, int]
     video_info: Optional[VideoInfo] = None
-    comments_count: int = 0
\ No newline at end of file
+    comments_count: int = 0
+    cache_hit: bool = False  # served from the analysis result cache
+    cache_age_s: float = 0.0  # age of the cached analysis in seconds
+    partial: bool = False  # deadline reached before every comment was classified / summarized
+    coverage: float = 1.0  # share of fetched comments that were classified
+    classified_count: int = 0  # comments actually classified (sample size in sequential mode)
+    # sequential mode: confidence interval (low, high) of each sentiment's share
+    sentiment_intervals: Optional[dict[str, tuple[float, float]]] = None
+    # how the comments were fetched: "single_page", "full", "sample" or "sequential"
+    fetch_strategy: Optional[str] = None
+
+class AnalysisJobProgress(BaseModel):
+    """Comments of a background analysis fetched and classified so far."""
+    fetched: int = 0
+    classified: int = 0
+
+class AnalysisJobResponse(BaseModel):
+    """State of a background analysis job."""
+    job_id: str
+    status: Literal["pending", "running", "succeeded", "failed"]
+    progress: AnalysisJobProgress
+    result: Optional[VideoAnalysisResponse] = None  # set once the job succeeded
+    error_status: Optional[int] = None  # HTTP status the synchronous endpoint would have answered with
+    error: Optional[str] = None
@@ -0,0 +1,127 @@
+import asyncio
+import json
+from typing import AsyncIterator
+
+from fastapi import FastAPI, APIRouter, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from app.modals.video import AnalysisJobProgress, AnalysisJobResponse, VideoAnalysisRequest
+from app.services.analyzer import get_analyzer
+from app.services.cache import get_result_cache
+from app.services.jobs import AnalysisJob, TooManyJobs, get_job_store
+from app.services.pipeline import AnalysisPipeline
+from app.services.progress import AnalysisProgress
+from app.services.singleflight import get_single_flight
+from app.services.youtube import get_youtube_service
+
+# Idle SSE streams get a comment line this often so proxies keep them open
+SSE_KEEPALIVE_S = 15.0
+
+app = FastAPI()
+jobs_router = APIRouter(
+    prefix="/analyze/jobs",
+    tags=["YouTube Analysis"],
+)
+
+
+@jobs_router.post("", response_model=AnalysisJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_analysis_job(
+    request: VideoAnalysisRequest,
+    response: Response,
+) -> AnalysisJobResponse:
+    """Start the analysis in the background and return its job right away."""
+    youtube_service = get_youtube_service()
+    video_id = youtube_service.extract_video_id(request.video_url)
+    if not video_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid video URL")
+
+    pipeline = AnalysisPipeline(
+        youtube_service,
+        get_analyzer(),
+        result_cache=get_result_cache(),
+        single_flight=get_single_flight(),
+    )
+    key = pipeline.join_key(
+        pipeline.analysis_key(video_id, language=request.language, mode=request.mode),
+        request.deadline_s,
+    )
+    try:
+        job = get_job_store().submit(
+            key,
+            lambda progress: pipeline.run(
+                video_id,
+                language=request.language,
+                deadline_s=request.deadline_s,
+                mode=request.mode,
+                progress=progress,
+            ),
+        )
+    except TooManyJobs as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+    response.headers["Location"] = f"{jobs_router.prefix}/{job.id}"
+    return _job_response(job)
+
+
+@jobs_router.get("/{job_id}", response_model=AnalysisJobResponse)
+async def get_analysis_job(job_id: str) -> AnalysisJobResponse:
+    """Status, progress and (once finished) result or error of a job."""
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return _job_response(job)
+
+
+@jobs_router.get(
+    "/{job_id}/events",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def stream_analysis_job_events(job_id: str) -> StreamingResponse:
+    """
+    Server-Sent Events of a job as they happen: a "progress" snapshot first,
+    then "video_info", "page", "classified", "summary_delta" (topic summary
+    text as it is generated) and "summary" events, and finally "result" (the
+    VideoAnalysisResponse) or "error".
+    """
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return StreamingResponse(
+        _sse(job.progress),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _sse(progress: AnalysisProgress) -> AsyncIterator[str]:
+    events = aiter(progress.events())
+    next_event = asyncio.ensure_future(anext(events, None))
+    try:
+        while True:
+            done, _ = await asyncio.wait({next_event}, timeout=SSE_KEEPALIVE_S)
+            if not done:
+                yield ": keep-alive\n\n"
+                continue
+            event = next_event.result()
+            if event is None:
+                return
+            yield f"event: {event.name}\ndata: {json.dumps(event.data, ensure_ascii=False)}\n\n"
+            next_event = asyncio.ensure_future(anext(events, None))
+    finally:
+        # The client went away: let the pending read unwind before closing the subscription
+        next_event.cancel()
+        await asyncio.gather(next_event, return_exceptions=True)
+        await events.aclose()
+
+
+def _job_response(job: AnalysisJob) -> AnalysisJobResponse:
+    return AnalysisJobResponse(
+        job_id=job.id,
+        status=job.status,
+        progress=AnalysisJobProgress(fetched=job.progress.fetched, classified=job.progress.classified),
+        result=job.result,
+        error_status=job.error_status,
+        error=job.error,
+    )
+
+app.include_router(jobs_router)
@@ -1,8 +1,22 @@
-from fastapi import FastAPI, APIRouter, HTTPException, status
+import asyncio
+from typing import Optional
+
+from fastapi import FastAPI, APIRouter, Header, HTTPException, Request, Response, status
 from app.modals.video import VideoAnalysisRequest, VideoAnalysisResponse, VideoInfo
+from app.services.abort import RequestAborted, get_abort_watcher
 from app.services.analyzer import get_analyzer
+from app.services.cache import get_result_cache
+from app.services.idempotency import IdempotencyKeyReused, get_idempotency_store
+from app.services.pipeline import AnalysisError, AnalysisPipeline
+from app.services.singleflight import get_single_flight
 from app.services.youtube import get_youtube_service
 
+# Share of the client's X-Request-Timeout after which the analysis wraps up with
+# what it has, so the (partial) result is sent before the client gives up
+CLIENT_TIMEOUT_SHARE = 0.9
+# Status logged for analyses cancelled because the client went away (nginx convention)
+CLIENT_CLOSED_REQUEST = 499
+
 app = FastAPI()
 youtube_router = APIRouter(
     prefix="/analyze/youtube",
@@ -13,43 +27,64 @@ youtube_router = APIRouter(
 @youtube_router.post("/comments", response_model=VideoAnalysisResponse)
 async def analyze_youtube_video(
     request: VideoAnalysisRequest,
+    http_request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
+    x_request_timeout: Optional[float] = Header(default=None, gt=0),
 ) -> VideoAnalysisResponse:
+    """
+    Analyze a video. Retries that repeat the first request's Idempotency-Key
+    attach to its analysis (running or finished) instead of starting a new one.
+
+    The analysis is cancelled, OpenAI calls included, when the client
+    disconnects or its X-Request-Timeout (seconds) runs out; it also bounds
+    the analysis deadline, like `deadline_s`.
+    """
+    hard_deadline = None
+    deadline_s = request.deadline_s
+    if x_request_timeout is not None:
+        hard_deadline = asyncio.get_running_loop().time() + x_request_timeout
+        deadline_s = min(deadline_s or x_request_timeout, x_request_timeout * CLIENT_TIMEOUT_SHARE)
+
     youtube_service = get_youtube_service()
     video_id = youtube_service.extract_video_id(request.video_url)
     if not video_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid video URL")
 
-    try:
-        comments = youtube_service.get_comments(video_id)
-    except PermissionError as e:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
-    except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    pipeline = AnalysisPipeline(
+        youtube_service,
+        get_analyzer(),
+        result_cache=get_result_cache(),
+        single_flight=get_single_flight(),
+    )
 
-    if not comments:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No comments to analyze")
+    def analyze():
+        return pipeline.run(
+            video_id,
+            language=request.language,
+            deadline_s=deadline_s,
+            mode=request.mode,
+        )
+
+    async def analyze_once() -> tuple[VideoAnalysisResponse, bool]:
+        if idempotency_key is None:
+            return await analyze(), False
+        return await get_idempotency_store().run(idempotency_key, request.model_dump_json(), analyze)
 
     try:
-        video_info = youtube_service.get_video_info(video_id)
-    except PermissionError as e:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
-    except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
-
-    if not video_info:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
-
-    analyzer = get_analyzer()
-    result = await analyzer.analyze_async(comments, language=request.language)
-    count_comments_per_sentiment = analyzer.count_comment_per_sentiment(comments)
-    likes_per_category = analyzer.count_likes_per_category(comments)
-
-    return VideoAnalysisResponse(
-        analyze_result=result,
-        count_comments_per_sentiment=dict(count_comments_per_sentiment),
-        likes_per_category=dict(likes_per_category),
-        video_info=video_info,
-        comments_count=len(comments),
-    )
+        result, replayed = await get_abort_watcher().run(
+            analyze_once(), is_disconnected=http_request.is_disconnected, deadline=hard_deadline
+        )
+    except RequestAborted as e:
+        if e.reason == "deadline":
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Client deadline exceeded")
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    except AnalysisError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail=str(e))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
 
 app.include_router(youtube_router)
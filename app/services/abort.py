@@ -0,0 +1,83 @@
+import asyncio
+from typing import Awaitable, Callable, Literal, TypeVar
+
+from config import Settings, get_settings
+
+T = TypeVar("T")
+
+AbortReason = Literal["disconnected", "deadline"]
+
+
+class RequestAborted(Exception):
+    """Raised when the work of a request was cancelled because its client stopped waiting."""
+
+    def __init__(self, reason: AbortReason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AbortWatcher:
+    """
+    Runs the work of a request and cancels it once nobody will read the
+    result: the client disconnected (checked every `poll_s` seconds) or the
+    client's own deadline passed. Cancelling reaches down to the
+    classification workers and their in-flight OpenAI calls; work shared
+    with other requests (single flight, idempotency keys) keeps running for
+    them.
+    """
+
+    def __init__(self, *, poll_s: float = 0.5):
+        self.poll_s = poll_s
+        self.disconnected = 0
+        self.deadline = 0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "AbortWatcher":
+        return cls(poll_s=settings.client_disconnect_poll_s)
+
+    async def run(
+        self,
+        work: Awaitable[T],
+        *,
+        is_disconnected: Callable[[], Awaitable[bool]],
+        deadline: float | None = None,
+    ) -> T:
+        """
+        Await `work`, raising RequestAborted (after cancelling it) when
+        `is_disconnected()` turns true or `deadline` (event loop time) passes.
+        """
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(work)
+        try:
+            while True:
+                timeout = self.poll_s
+                if deadline is not None:
+                    timeout = max(0.0, min(timeout, deadline - loop.time()))
+                done, _ = await asyncio.wait({task}, timeout=timeout)
+                if done:
+                    return task.result()
+                if deadline is not None and loop.time() >= deadline:
+                    self.deadline += 1
+                    raise RequestAborted("deadline")
+                if await is_disconnected():
+                    self.disconnected += 1
+                    raise RequestAborted("disconnected")
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"disconnected": self.disconnected, "deadline": self.deadline}
+
+
+# Singleton instance
+_abort_watcher: AbortWatcher | None = None
+
+
+def get_abort_watcher() -> AbortWatcher:
+    """Get or create the request abort watcher singleton."""
+    global _abort_watcher
+    if _abort_watcher is None:
+        _abort_watcher = AbortWatcher.from_settings(get_settings())
+    return _abort_watcher
@@ -1,14 +1,50 @@
 import asyncio
 import logging
 from collections import Counter
+from dataclasses import dataclass
 import random
-from typing import List, Optional
+from typing import AsyncIterable, Callable, List, Optional, get_args
 from openai import DefaultAioHttpClient, RateLimitError, AsyncOpenAI
 import json
 import re
 
 from config import get_settings
 from app.modals.video import  Comment, CommentAnalysisResult
+from app.services.cache import CommentAnalysisCache
+from app.services.concurrency import gather_fail_fast, ready_batches
+from app.services.dedup import NearDuplicateIndex
+from app.services.prefilter import CommentPrefilter
+from app.services.progress import AnalysisProgress
+from app.services.sampling import max_half_width, share_intervals, stratified_order
+from app.services.themes import ThemeCluster, cluster_themes, theme_table
+from app.services.limiter import get_openai_limiter, get_openai_rate_limiter
+
+
+SENTIMENTS = get_args(CommentAnalysisResult.model_fields["sentiment"].annotation)
+
+
+@dataclass
+class CommentStreamAnalysis:
+    """Outcome of CommentAnalyzer.analyze_comment_stream_async()."""
+    summary: str
+    # Comments whose classification finished, in arrival order
+    comments: List[Comment]
+    # Comments pulled from the stream before it ended or the deadline hit
+    received: int
+    # Classification was cut short by the deadline
+    deadline_reached: bool = False
+    # The deadline left no time for the topic-analysis call
+    summary_is_local: bool = False
+    # Sequential sampling: confidence interval of each sentiment share
+    sentiment_intervals: Optional[dict[str, tuple[float, float]]] = None
+
+    @property
+    def coverage(self) -> float:
+        return len(self.comments) / self.received if self.received else 1.0
+
+    @property
+    def partial(self) -> bool:
+        return self.deadline_reached or self.summary_is_local
 
 
 class CommentAnalyzer:
@@ -21,14 +57,31 @@ class CommentAnalyzer:
     # max concurrent workers
     MAX_WORKERS = 2
 
-        # IMPORTANT: this is your true concurrency knob now
+    # Classification workers per analysis. The process-wide OpenAI limiter
+    # (see app.services.limiter) decides how many of them actually run at once.
     MAX_IN_FLIGHT_REQUESTS = 20
+    # bounded queue between the comment fetcher and the classification workers
+    PIPELINE_QUEUE_SIZE = 100
+    # Comments indexed for duplicates per worker-thread hop (signatures are CPU-bound)
+    DEDUP_BATCH_SIZE = 50
+    # Engagement priority of a queued comment: likes + REPLY_PRIORITY_WEIGHT * replies
+    REPLY_PRIORITY_WEIGHT = 2
 
     # Retry tuning
     MAX_RETRIES = 6
     BASE_BACKOFF_S = 0.5
     MAX_BACKOFF_S = 20.0
 
+    # Share of a deadline (at most DEADLINE_SUMMARY_RESERVE_S) kept for the topic summary
+    DEADLINE_SUMMARY_RESERVE_S = 8.0
+    DEADLINE_SUMMARY_RESERVE_SHARE = 0.3
+    # Themes listed by the local fallback summary
+    LOCAL_SUMMARY_THEMES = 10
+
+    # Token estimate for the TPM budget, corrected from resp.usage after each call
+    CHARS_PER_TOKEN = 4
+    PROMPT_OVERHEAD_TOKENS = 300
+
     def __init__(self):
         settings = get_settings()
         self.openai_client = AsyncOpenAI(
@@ -40,6 +93,29 @@ class CommentAnalyzer:
         self.link_regex = re.compile(r"https?://\S+|www\.\S+")
         self.comment_prompt_id = settings.comment_prompt_id
         self.topic_analysis_prompt_id = settings.topic_analysis_prompt_id
+        # Batched classification is enabled only when a batch prompt is configured
+        self.comment_batch_prompt_id = settings.comment_batch_prompt_id
+        self.batch_size = settings.comment_batch_size or self.BATCH_SIZE
+        self.cache = CommentAnalysisCache.from_settings(settings)
+        self.prefilter = CommentPrefilter.from_settings(settings)
+        self.theme_similarity = settings.theme_similarity
+        self.max_topic_themes = settings.topic_max_themes
+        self.topic_map_reduce_threshold = settings.topic_map_reduce_threshold
+        self.topic_map_fan_out = settings.topic_map_fan_out
+        self.topic_reduce_fan_in = settings.topic_reduce_fan_in
+        self.topic_reduce_prompt_id = settings.topic_reduce_prompt_id
+        self.sequential_margin = settings.sequential_margin
+        self.sequential_confidence = settings.sequential_confidence
+        self.sequential_min_sample = settings.sequential_min_sample
+        self.sequential_step = settings.sequential_step
+        self.sampling_rng = random.Random()
+        self.dedup_threshold = settings.comment_dedup_threshold
+        self.dedup_stats: Counter = Counter()
+        # Work dropped because the analysis was cancelled (client gone or out of time):
+        # OpenAI calls cancelled mid-flight and received comments left unclassified
+        self.abort_stats: Counter = Counter()
+        self.limiter = get_openai_limiter()
+        self.rate_limiter = get_openai_rate_limiter()
 
     def chunked(self, seq, size):
         """Genreator that yields successive n-sized chunks from seq."""
@@ -50,30 +126,104 @@ class CommentAnalyzer:
         """Return True if the given text contains a link."""
         return bool(self.link_regex.search(text))
     
-    async def _call_with_retries(self, *, model: str, input, prompt):
+    async def _call_with_retries(
+        self,
+        *,
+        model: str,
+        input,
+        prompt,
+        observe_latency: bool = True,
+        deadline: float | None = None,
+        on_delta: Callable[[str], None] | None = None,
+    ):
         """
         Retry wrapper for transient rate limits.
+        Every attempt is paced by the RPM/TPM budgets and runs under the
+        process-wide adaptive limiter; long generations pass
+        observe_latency=False so they don't look like overload.
+        The rate-limit headers of every response, not only of 429s, update the
+        budgets. With a `deadline` (event loop time) it raises TimeoutError
+        instead of backing off past it.
+        With `on_delta` the response is streamed and every output text delta
+        is passed to it as it is generated; the slot is held until the stream
+        completes. Rate limits are reported before the first delta, so a
+        retry never repeats text.
+        A call cancelled while in flight is counted in abort_stats.
         """
+        estimated_tokens = self._estimate_tokens(input)
+        last_error: RateLimitError | None = None
         for attempt in range(self.MAX_RETRIES):
+            await self.rate_limiter.acquire(estimated_tokens)
             try:
-                return await self.openai_client.responses.create(
-                    model=model,
-                    input=input,
-                    prompt=prompt,
-                )
+                # The slot is held per attempt, so backoff sleeps free it for others
+                async with self.limiter.acquire(observe_latency=observe_latency):
+                    try:
+                        # Raw response, for the rate-limit headers every reply carries
+                        raw = await self.openai_client.responses.with_raw_response.create(
+                            model=model,
+                            input=input,
+                            prompt=prompt,
+                            **({"stream": True} if on_delta is not None else {}),
+                        )
+                        self.rate_limiter.apply_headers(raw.headers)
+                        resp = raw.parse()
+                        if on_delta is not None:
+                            resp = await self._consume_stream(resp, on_delta)
+                    except asyncio.CancelledError:
+                        self.abort_stats["openai_calls"] += 1
+                        raise
             except RateLimitError as e:
                 # If it's quota exhaustion, retries won't help
                 if "insufficient_quota" in str(e):
                     raise ValueError(
                         "OpenAI API quota exceeded. Please add credits to your OpenAI account."
                     ) from e
+                last_error = e
+
+                # The server told us when to come back: the rate limiter now
+                # holds every caller until then, so no extra sleep here
+                response = getattr(e, "response", None)
+                if self.rate_limiter.apply_headers(getattr(response, "headers", None)) is not None:
+                    continue
 
                 # Exponential backoff + jitter
                 backoff = min(self.MAX_BACKOFF_S, self.BASE_BACKOFF_S * (2**attempt))
                 backoff = backoff * (0.75 + 0.5 * random.random())
+                if deadline is not None and asyncio.get_running_loop().time() + backoff >= deadline:
+                    raise TimeoutError("Deadline reached while backing off from rate limits") from e
                 await asyncio.sleep(backoff)
+            else:
+                self.rate_limiter.reconcile(estimated_tokens, getattr(resp, "usage", None))
+                return resp
+
+        raise last_error
 
-        raise RateLimitError("Rate limit: exceeded max retries")
+    @staticmethod
+    async def _consume_stream(stream, on_delta: Callable[[str], None]):
+        """
+        Forward the text deltas of a Responses stream; returns the completed
+        response. A stream that fails, stops incomplete or ends without a
+        "response.completed" event raises RuntimeError, since its text is partial.
+        """
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                on_delta(event.delta)
+            elif event.type == "response.completed":
+                return event.response
+            elif event.type == "response.failed":
+                error = getattr(event.response, "error", None)
+                raise RuntimeError(f"OpenAI response failed: {getattr(error, 'message', error)}")
+            elif event.type == "response.incomplete":
+                details = getattr(event.response, "incomplete_details", None)
+                raise RuntimeError(f"OpenAI response incomplete: {getattr(details, 'reason', details)}")
+            elif event.type == "error":
+                raise RuntimeError(f"OpenAI stream error: {getattr(event, 'message', event)}")
+        raise RuntimeError("OpenAI stream ended without a completed response")
+
+    def _estimate_tokens(self, input) -> int:
+        """Rough token count of one call (input + stored prompt + output) for the TPM budget."""
+        text = input if isinstance(input, str) else str(input)
+        return len(text) // self.CHARS_PER_TOKEN + self.PROMPT_OVERHEAD_TOKENS
 
     def _build_prompt(self, prompt_id: str, language: str | None):
         prompt = {"id": prompt_id}
@@ -89,6 +239,9 @@ class CommentAnalyzer:
             logger.warning("Failed to decode analysis JSON")
             return None
 
+        return self._comment_analysis_from_dict(data)
+
+    def _comment_analysis_from_dict(self, data) -> Optional[CommentAnalysisResult]:
         if not isinstance(data, dict):
             return None
 
@@ -105,75 +258,577 @@ class CommentAnalyzer:
 
         return CommentAnalysisResult(sentiment=sentiment, main_theme=main_theme)
 
+    def _parse_batch_analysis(self, output_text: str, size: int) -> dict[int, CommentAnalysisResult]:
+        """
+        Parse a batched reply: a JSON array (or {"results": [...]}) of objects
+        carrying the comment `index` next to `sentiment` and `main_theme`.
+        Entries with a missing or out-of-range index are dropped.
+        """
+        try:
+            data = json.loads(output_text)
+        except json.JSONDecodeError:
+            logging.getLogger(__name__).warning("Failed to decode batch analysis JSON")
+            return {}
+
+        if isinstance(data, dict):
+            data = data.get("results")
+        if not isinstance(data, list):
+            return {}
+
+        results: dict[int, CommentAnalysisResult] = {}
+        for item in data:
+            if not isinstance(item, dict):
+                continue
+            index = item.get("index")
+            if not isinstance(index, int) or not 0 <= index < size:
+                continue
+            result = self._comment_analysis_from_dict(item)
+            if result is not None:
+                results[index] = result
+        return results
+
     async def analyze_single_comment_async(
         self,
         comment: Comment,
         *,
-        semaphore: asyncio.Semaphore,
         prompt=None,
         language: str | None = None,
+        deadline: float | None = None,
     ) -> Optional[CommentAnalysisResult]:
         if self.contains_link(comment.text):
             return None
 
-        async with semaphore:
+        # Custom prompts bypass the prefilter and the cache: both stand in for comment_prompt_id
+        if prompt is None:
+            local = self.prefilter.classify(comment.text, language=language)
+            if local is not None:
+                return local
+            cached = await self.cache.get(self._cache_key(comment, language))
+            if cached is not None:
+                return cached
+
+        return await self._classify_uncached(comment, prompt=prompt, language=language, deadline=deadline)
+
+    async def _classify_uncached(
+        self,
+        comment: Comment,
+        *,
+        prompt=None,
+        language: str | None = None,
+        deadline: float | None = None,
+    ) -> Optional[CommentAnalysisResult]:
+        resp = await self._call_with_retries(
+            model=self.model,
+            input=comment.text,
+            prompt=prompt or self._build_prompt(self.comment_prompt_id, language),
+            deadline=deadline,
+        )
+        result = self._parse_comment_analysis(resp.output_text)
+        if prompt is None and result is not None:
+            await self.cache.set(self._cache_key(comment, language), result)
+        return result
+
+    def _cache_key(self, comment: Comment, language: str | None, *, batch: bool = False) -> str:
+        """Cache key of a result of the single prompt, or (`batch`) of the batch prompt."""
+        return self.cache.make_key(
+            comment.text,
+            model=self.model,
+            prompt_id=f"batch:{self.comment_batch_prompt_id}" if batch else self.comment_prompt_id,
+            language=language,
+        )
+
+    async def analyze_comment_batch_async(
+        self,
+        comments: List[Comment],
+        *,
+        language: str | None = None,
+        deadline: float | None = None,
+    ) -> List[Optional[CommentAnalysisResult]]:
+        """
+        Classify several comments with one request to the batch prompt.
+        Trivial and cached comments are answered locally; comments the batch
+        reply does not cover (malformed JSON, missing indices) fall back to
+        single calls.
+        """
+        results: List[Optional[CommentAnalysisResult]] = [None] * len(comments)
+        pending = []
+        for i, c in enumerate(comments):
+            if self.contains_link(c.text):
+                continue
+            results[i] = self.prefilter.classify(c.text, language=language)
+            if results[i] is not None:
+                continue
+            results[i] = await self.cache.get(self._cache_key(c, language))
+            if results[i] is None and self.comment_batch_prompt_id:
+                results[i] = await self.cache.get(self._cache_key(c, language, batch=True))
+            if results[i] is None:
+                pending.append(i)
+
+        if len(pending) > 1 and self.comment_batch_prompt_id:
+            batch_input = json.dumps(
+                [{"index": n, "text": comments[i].text} for n, i in enumerate(pending)],
+                ensure_ascii=False,
+            )
             resp = await self._call_with_retries(
                 model=self.model,
-                input=comment.text,
-                prompt=prompt or self._build_prompt(self.comment_prompt_id, language),
+                input=batch_input,
+                prompt=self._build_prompt(self.comment_batch_prompt_id, language),
+                deadline=deadline,
             )
-            return self._parse_comment_analysis(resp.output_text)
+            parsed = self._parse_batch_analysis(resp.output_text, len(pending))
+            if len(parsed) < len(pending):
+                logging.getLogger(__name__).warning(
+                    "Batch reply covered %s/%s comments, falling back to single calls",
+                    len(parsed), len(pending),
+                )
+            for n, i in enumerate(pending):
+                results[i] = parsed.get(n)
+                if results[i] is not None:
+                    await self.cache.set(self._cache_key(comments[i], language, batch=True), results[i])
+            pending = [i for n, i in enumerate(pending) if n not in parsed]
+
+        async def single(i: int):
+            results[i] = await self._classify_uncached(comments[i], language=language, deadline=deadline)
+
+        await asyncio.gather(*(single(i) for i in pending))
+        return results
 
     async def categorize_comments_async(
         self,
         comments: List[Comment],
         *,
         language: str | None = None,
+        deadline: float | None = None,
     ) -> List[Optional[Comment]]:
+        """
+        Classify a list of comments. With a `deadline` (event loop time) only
+        the comments classified by then are returned.
+        """
         if not comments:
             raise ValueError("No comments to analyze")
 
-        semaphore = asyncio.Semaphore(self.MAX_IN_FLIGHT_REQUESTS)
-        results: List[Optional[Comment]] = [None] * len(comments)
+        async def comment_stream():
+            for c in comments:
+                yield c
+
+        return await self.categorize_comment_stream_async(comment_stream(), language=language, deadline=deadline)
+
+    async def categorize_comment_stream_async(
+        self,
+        comments: AsyncIterable[Comment],
+        *,
+        language: str | None = None,
+        deadline: float | None = None,
+    ) -> List[Comment]:
+        """
+        Classify comments while they are still being fetched.
+
+        A producer pulls comments from `comments` into a bounded queue and
+        classification workers drain it, so the first page is being classified
+        while the next one is downloaded. A full queue blocks the producer,
+        which in turn stops the fetcher from running ahead (backpressure).
+        Queued comments are dispatched by engagement (likes and replies), so
+        when a deadline cuts classification short the comments that weigh
+        most in the like counters are already done.
+
+        Exact and near-duplicate comments are collapsed before they reach the
+        queue: only the first of each group is classified and its result is
+        copied to the rest, which keep their own likes for the counters.
+        Comments are returned in arrival order with `analysis_result` set.
+
+        With a `deadline` (event loop time) fetching and classification stop
+        when it is reached and only the comments classified by then are returned.
+        """
+        classified, _, _ = await self._categorize_stream(
+            comments, language=language, deadline=self._classification_deadline(deadline)
+        )
+        return classified
 
-        async def worker(i: int, c: Comment):
-            c.analysis_result = await self.analyze_single_comment_async(
-                c, semaphore=semaphore, language=language
+    async def _categorize_stream(
+        self,
+        comments: AsyncIterable[Comment],
+        *,
+        language: str | None,
+        deadline: float | None,
+        workers: int | None = None,
+        progress: AnalysisProgress | None = None,
+    ) -> tuple[List[Comment], int, bool]:
+        """
+        categorize_comment_stream_async() that stops at `deadline` itself (no
+        summary reserve) and also returns how many comments were received and
+        whether the deadline was reached. `workers` defaults to MAX_IN_FLIGHT_REQUESTS;
+        classified comments are counted in `progress`.
+        """
+        workers = workers or self.MAX_IN_FLIGHT_REQUESTS
+        # (-priority, arrival index, comment); end-of-stream sentinels sort last
+        queue: asyncio.PriorityQueue[tuple[float, int, Optional[Comment]]] = asyncio.PriorityQueue(
+            maxsize=self.PIPELINE_QUEUE_SIZE
+        )
+        results: List[Comment] = []
+        finished: set[int] = set()
+        dedup: NearDuplicateIndex[Comment] = NearDuplicateIndex(threshold=self.dedup_threshold)
+        duplicates: List[tuple[Comment, Comment]] = []
+
+        async def producer():
+            async for batch in ready_batches(comments, self.DEDUP_BATCH_SIZE):
+                received = len(results)
+                results.extend(batch)
+                # Indexed off the event loop: the hashing would stall every other request
+                representatives = await asyncio.to_thread(
+                    dedup.find_or_add_many, [(c.text, c) for c in batch]
+                )
+                for arrival, (c, representative) in enumerate(zip(batch, representatives), received + 1):
+                    if representative is not None:
+                        duplicates.append((c, representative))
+                        continue
+                    await queue.put((-self._priority(c), arrival, c))
+            for i in range(workers):
+                await queue.put((float("inf"), i, None))
+
+        batch_size = self.batch_size if self.comment_batch_prompt_id else 1
+
+        async def worker():
+            done = False
+            while not done:
+                _, _, c = await queue.get()
+                if c is None:
+                    return
+                # Take the next most engaging queued comments, up to one batch
+                batch = [c]
+                while len(batch) < batch_size and not queue.empty():
+                    _, _, c = queue.get_nowait()
+                    if c is None:
+                        done = True
+                        break
+                    batch.append(c)
+
+                batch_results = await self.analyze_comment_batch_async(
+                    batch, language=language, deadline=deadline
+                )
+                for c, result in zip(batch, batch_results):
+                    c.analysis_result = result
+                    finished.add(id(c))
+                if progress is not None:
+                    progress.add_classified(len(batch))
+
+        deadline_reached = False
+        try:
+            async with asyncio.timeout_at(deadline):
+                await gather_fail_fast(
+                    producer(),
+                    *(worker() for _ in range(workers)),
+                )
+        except TimeoutError:
+            if deadline is None:
+                raise
+            deadline_reached = True
+            logging.getLogger(__name__).warning(
+                "Deadline reached: %s/%s received comments classified", len(finished), len(results)
             )
-            results[i] = c
+        except asyncio.CancelledError:
+            self.abort_stats["comments"] += len(results) - len(finished)
+            raise
+
+        copied = 0
+        for c, representative in duplicates:
+            if id(representative) in finished:
+                c.analysis_result = representative.analysis_result
+                finished.add(id(c))
+                copied += 1
+        if progress is not None:
+            progress.add_classified(copied)
+
+        self.dedup_stats.update(
+            comments=len(results),
+            exact_duplicates=dedup.exact_duplicates,
+            near_duplicates=dedup.near_duplicates,
+        )
+        if not results:
+            raise ValueError("No comments to analyze")
+        return [c for c in results if id(c) in finished], len(results), deadline_reached
 
-        tasks = [asyncio.create_task(worker(i, c)) for i, c in enumerate(comments)]
-        await asyncio.gather(*tasks)
-        return results
+    def _priority(self, comment: Comment) -> float:
+        return comment.like_count + self.REPLY_PRIORITY_WEIGHT * comment.reply_count
 
-    async def analyze_async(
+    def _classification_deadline(self, deadline: float | None) -> float | None:
+        """Stop classifying early enough to leave time for the topic summary."""
+        if deadline is None:
+            return None
+        remaining = deadline - asyncio.get_running_loop().time()
+        return deadline - min(self.DEADLINE_SUMMARY_RESERVE_S, self.DEADLINE_SUMMARY_RESERVE_SHARE * remaining)
+
+    async def _summarize_topics_async(
         self,
-        comments: List[Comment],
+        categorized_comments: List[Optional[Comment]],
         *,
         language: str | None = None,
+        deadline: float | None = None,
+        on_delta: Callable[[str], None] | None = None,
     ) -> str:
         """
-        Async version of analyze() that assumes comments already have analysis_result,
-        or calls categorize first if you prefer.
+        Summarize the topics of classified comments. Themes are clustered
+        locally and only a ranked table of at most `max_topic_themes` rows
+        (count, likes and sentiment mix per cluster) is sent, so the prompt
+        size doesn't grow with the number of comments. Above
+        `topic_map_reduce_threshold` clusters the summary is built map-reduce
+        when a `topic_reduce_prompt_id` is configured.
+        With `on_delta` the call that writes the final summary is streamed.
         """
-        categorized_comments = await self.categorize_comments_async(comments, language=language)
-        comments_theme_list = [
+        clusters = self._cluster_themes(categorized_comments)
+        if self.topic_reduce_prompt_id and len(clusters) > self.topic_map_reduce_threshold:
+            return await self._map_reduce_topics(
+                clusters, language=language, deadline=deadline, on_delta=on_delta
+            )
+        return await self._summarize_theme_rows(
+            theme_table(clusters, max_themes=self.max_topic_themes),
+            language=language,
+            deadline=deadline,
+            on_delta=on_delta,
+        )
+
+    def _cluster_themes(self, categorized_comments: List[Optional[Comment]]) -> List[ThemeCluster]:
+        return cluster_themes(
+            (
+                (c.analysis_result.main_theme, c.like_count, c.analysis_result.sentiment)
+                for c in categorized_comments
+                if c and c.analysis_result and c.analysis_result.main_theme
+            ),
+            similarity=self.theme_similarity,
+        )
+
+    def _local_topic_summary(self, categorized_comments: List[Optional[Comment]]) -> str:
+        """Fallback summary when the deadline leaves no time for the topic-analysis call."""
+        clusters = self._cluster_themes(categorized_comments)[:self.LOCAL_SUMMARY_THEMES]
+        return "\n".join(f"• {c.label} — {c.comments} ({c.likes} 👍)" for c in clusters)
+
+    async def _summarize_theme_rows(
+        self,
+        theme_rows: List[dict],
+        *,
+        language: str | None,
+        deadline: float | None = None,
+        on_delta: Callable[[str], None] | None = None,
+    ) -> str:
+        resp = await self._call_with_retries(
+            model=self.model,
+            input=json.dumps(theme_rows, ensure_ascii=False, separators=(",", ":")),
+            prompt=self._build_prompt(self.topic_analysis_prompt_id, language),
+            observe_latency=False,
+            deadline=deadline,
+            on_delta=on_delta,
+        )
+        return resp.output_text
+
+    async def _map_reduce_topics(
+        self,
+        clusters: List[ThemeCluster],
+        *,
+        language: str | None,
+        deadline: float | None = None,
+        on_delta: Callable[[str], None] | None = None,
+    ) -> str:
+        """
+        Map: split the ranked clusters into `topic_map_fan_out` chunks and
+        summarize them in parallel. Reduce: merge the partial summaries
+        `topic_reduce_fan_in` at a time with the reduce prompt, whose input is
+        the partial summaries rather than theme rows, round after round, until
+        one is left.
+        All calls share the process-wide OpenAI limiter.
+        """
+        chunk_size = -(-len(clusters) // self.topic_map_fan_out)
+        chunks = [clusters[i:i + chunk_size] for i in range(0, len(clusters), chunk_size)]
+        summaries = await gather_fail_fast(*(
+            self._summarize_theme_rows(
+                theme_table(chunk, max_themes=self.max_topic_themes),
+                language=language,
+                deadline=deadline,
+                on_delta=on_delta if len(chunks) == 1 else None,
+            )
+            for chunk in chunks
+        ))
+        partials = [
             {
-                "main_theme": c.analysis_result.main_theme,
-                "like_count": c.like_count,
-                "sentiment": c.analysis_result.sentiment,
+                "comments": sum(c.comments for c in chunk),
+                "likes": sum(c.likes for c in chunk),
+                "summary": summary,
             }
-            for c in categorized_comments
-            if c and c.analysis_result and c.analysis_result.main_theme
+            for chunk, summary in zip(chunks, summaries)
         ]
 
+        fan_in = max(2, self.topic_reduce_fan_in)
+        while len(partials) > 1:
+            groups = [partials[i:i + fan_in] for i in range(0, len(partials), fan_in)]
+            reduced = await gather_fail_fast(*(
+                self._reduce_summaries(
+                    group,
+                    language=language,
+                    deadline=deadline,
+                    on_delta=on_delta if len(groups) == 1 else None,
+                )
+                for group in groups
+            ))
+            partials = [
+                {
+                    "comments": sum(p["comments"] for p in group),
+                    "likes": sum(p["likes"] for p in group),
+                    "summary": summary,
+                }
+                for group, summary in zip(groups, reduced)
+            ]
+        return partials[0]["summary"]
+
+    async def _reduce_summaries(
+        self,
+        partials: List[dict],
+        *,
+        language: str | None,
+        deadline: float | None = None,
+        on_delta: Callable[[str], None] | None = None,
+    ) -> str:
+        if len(partials) == 1:
+            return partials[0]["summary"]
         resp = await self._call_with_retries(
             model=self.model,
-            input=str(comments_theme_list),
-            prompt=self._build_prompt(self.topic_analysis_prompt_id, language),
+            input=json.dumps(partials, ensure_ascii=False, separators=(",", ":")),
+            prompt=self._build_prompt(self.topic_reduce_prompt_id, language),
+            observe_latency=False,
+            deadline=deadline,
+            on_delta=on_delta,
         )
         return resp.output_text
 
+    async def analyze_async(
+        self,
+        comments: List[Comment],
+        *,
+        language: str | None = None,
+    ) -> str:
+        """
+        Async version of analyze() that assumes comments already have analysis_result,
+        or calls categorize first if you prefer.
+        """
+        categorized_comments = await self.categorize_comments_async(comments, language=language)
+        return await self._summarize_topics_async(categorized_comments, language=language)
+
+    async def analyze_comment_stream_async(
+        self,
+        comments: AsyncIterable[Comment],
+        *,
+        language: str | None = None,
+        deadline: float | None = None,
+        workers: int | None = None,
+        progress: AnalysisProgress | None = None,
+    ) -> CommentStreamAnalysis:
+        """
+        Pipelined version of analyze_async(): classify comments as they stream in,
+        then summarize topics.
+
+        With a `deadline` (event loop time) classification stops early enough
+        to summarize whatever finished; if even the summary call can't make it,
+        a local summary of the largest themes is returned instead. `workers`
+        caps the concurrent classification workers (default MAX_IN_FLIGHT_REQUESTS).
+        """
+        classified, received, deadline_reached = await self._categorize_stream(
+            comments,
+            language=language,
+            deadline=self._classification_deadline(deadline),
+            workers=workers,
+            progress=progress,
+        )
+        analysis = CommentStreamAnalysis(
+            summary="", comments=classified, received=received, deadline_reached=deadline_reached
+        )
+        return await self._summarize_analysis(analysis, language=language, deadline=deadline, progress=progress)
+
+    async def analyze_sequential_async(
+        self,
+        comments: List[Comment],
+        *,
+        language: str | None = None,
+        deadline: float | None = None,
+        workers: int | None = None,
+        progress: AnalysisProgress | None = None,
+    ) -> CommentStreamAnalysis:
+        """
+        Adaptive sequential sampling: classify `comments` in a random order
+        stratified by likes, `sequential_step` at a time, and stop as soon as
+        the confidence interval of every sentiment share is within
+        `sequential_margin` (after at least `sequential_min_sample` comments).
+        """
+        if not comments:
+            raise ValueError("No comments to analyze")
+
+        async def stream(chunk: List[Comment]):
+            for c in chunk:
+                yield c
+
+        # Link comments are never classified, so they are not part of the population
+        pool = [c for c in comments if not self.contains_link(c.text)]
+        order = stratified_order(pool, rng=self.sampling_rng)
+        classify_until = self._classification_deadline(deadline)
+        classified: List[Comment] = []
+        intervals: dict[str, tuple[float, float]] = {}
+        deadline_reached = False
+        for start in range(0, len(order), self.sequential_step):
+            done, _, deadline_reached = await self._categorize_stream(
+                stream(order[start:start + self.sequential_step]),
+                language=language,
+                deadline=classify_until,
+                workers=workers,
+                progress=progress,
+            )
+            classified.extend(done)
+            counts = self.count_comment_per_sentiment(classified)
+            intervals = share_intervals(
+                {sentiment: counts.get(sentiment, 0) for sentiment in SENTIMENTS},
+                confidence=self.sequential_confidence,
+                population=len(pool),
+            )
+            if deadline_reached:
+                break
+            if len(classified) >= self.sequential_min_sample and max_half_width(intervals) <= self.sequential_margin:
+                break
+
+        analysis = CommentStreamAnalysis(
+            summary="",
+            comments=classified,
+            received=len(comments),
+            deadline_reached=deadline_reached,
+            sentiment_intervals=intervals,
+        )
+        return await self._summarize_analysis(analysis, language=language, deadline=deadline, progress=progress)
+
+    async def _summarize_analysis(
+        self,
+        analysis: CommentStreamAnalysis,
+        *,
+        language: str | None,
+        deadline: float | None,
+        progress: AnalysisProgress | None = None,
+    ) -> CommentStreamAnalysis:
+        """
+        Fill in the topic summary, falling back to a local one at the deadline,
+        and report it as a "summary" event in `progress`.
+        """
+        classified = analysis.comments
+        if not classified:
+            return analysis
+        # Stream the summary only while someone is listening for its deltas
+        on_delta = progress.summary_delta if progress is not None and progress.listening else None
+        try:
+            async with asyncio.timeout_at(deadline):
+                analysis.summary = await self._summarize_topics_async(
+                    classified, language=language, deadline=deadline, on_delta=on_delta
+                )
+        except TimeoutError:
+            if deadline is None:
+                raise
+            analysis.summary = self._local_topic_summary(classified)
+            analysis.summary_is_local = True
+        if progress is not None:
+            progress.summary_ready(analysis.summary, local=analysis.summary_is_local)
+        return analysis
+
     def categorize_comments(
         self,
         comments: List[Comment],
@@ -0,0 +1,289 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from config import Settings, get_settings
+from app.modals.video import CommentAnalysisResult
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_comment_text(text: str) -> str:
+    """Case- and whitespace-insensitive form of a comment used for cache keys."""
+    return " ".join(text.lower().split())
+
+
+class CommentAnalysisCache:
+    """
+    Content-addressed cache of per-comment classification results.
+
+    Two tiers: an in-process LRU in front of an optional SQLite file that
+    survives restarts. Both tiers expire entries after `ttl_s` and are
+    bounded in size (least recently used entries are evicted first).
+    """
+
+    # Disk eviction runs once per this many writes instead of on every insert
+    DISK_EVICTION_INTERVAL = 100
+
+    def __init__(
+        self,
+        *,
+        max_memory_entries: int = 10_000,
+        path: str | None = None,
+        max_disk_entries: int = 200_000,
+        ttl_s: float = 7 * 24 * 3600,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_s = ttl_s
+        self.clock = clock
+        self._memory: OrderedDict[str, tuple[CommentAnalysisResult, float]] = OrderedDict()
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self._writes_since_eviction = 0
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS comment_analysis ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS comment_analysis_accessed_at"
+                " ON comment_analysis (accessed_at)"
+            )
+            self._db.commit()
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "CommentAnalysisCache":
+        return cls(
+            max_memory_entries=settings.comment_cache_max_entries,
+            path=settings.comment_cache_path,
+            max_disk_entries=settings.comment_cache_disk_max_entries,
+            ttl_s=settings.comment_cache_ttl_s,
+        )
+
+    @staticmethod
+    def make_key(text: str, *, model: str, prompt_id: str | None, language: str | None) -> str:
+        """Hash of everything that determines the classification of a comment."""
+        raw = "\x1f".join([normalize_comment_text(text), model, prompt_id or "", language or ""])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[CommentAnalysisResult]:
+        now = self.clock()
+        entry = self._memory.get(key)
+        if entry is not None:
+            result, created_at = entry
+            if now - created_at < self.ttl_s:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return result
+            del self._memory[key]
+
+        if self._db is not None:
+            row = await asyncio.to_thread(self._db_get, key, now)
+            if row is not None:
+                result, created_at = row
+                self._remember(key, result, created_at)
+                self.hits_disk += 1
+                return result
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, result: CommentAnalysisResult) -> None:
+        now = self.clock()
+        self._remember(key, result, now)
+        if self._db is not None:
+            await asyncio.to_thread(self._db_set, key, result, now)
+
+    def stats(self) -> dict:
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+    def _remember(self, key: str, result: CommentAnalysisResult, created_at: float) -> None:
+        self._memory[key] = (result, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _db_get(self, key: str, now: float) -> tuple[CommentAnalysisResult, float] | None:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM comment_analysis WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at >= self.ttl_s:
+                self._db.execute("DELETE FROM comment_analysis WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute(
+                "UPDATE comment_analysis SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+        try:
+            return CommentAnalysisResult(**json.loads(value)), created_at
+        except (ValueError, TypeError):
+            logger.warning("Dropping unreadable comment cache entry %s", key)
+            return None
+
+    def _db_set(self, key: str, result: CommentAnalysisResult, now: float) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO comment_analysis (key, value, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, result.model_dump_json(), now, now),
+            )
+            self._writes_since_eviction += 1
+            if self._writes_since_eviction >= self.DISK_EVICTION_INTERVAL:
+                self._writes_since_eviction = 0
+                self._db_evict(now)
+            self._db.commit()
+
+    def _db_evict(self, now: float) -> None:
+        """Drop expired rows, then the least recently used ones above the size bound."""
+        self._db.execute(
+            "DELETE FROM comment_analysis WHERE created_at <= ?", (now - self.ttl_s,)
+        )
+        self._db.execute(
+            "DELETE FROM comment_analysis WHERE key IN ("
+            " SELECT key FROM comment_analysis ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
+
+
+class ResultCache:
+    """
+    TTL cache of whole-video analysis results with stale-while-revalidate.
+
+    An entry younger than `ttl_s` is fresh. Up to `stale_s` seconds after
+    that it is stale: it is still served, and the caller schedules a
+    background refresh (at most one per key at a time).
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_s: float = 600,
+        stale_s: float = 1800,
+        max_entries: int = 512,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_s = ttl_s
+        self.stale_s = stale_s
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._refreshing: set[str] = set()
+        self._background_tasks: set[asyncio.Task] = set()
+        self.hits_fresh = 0
+        self.hits_stale = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "ResultCache":
+        return cls(
+            ttl_s=settings.result_cache_ttl_s,
+            stale_s=settings.result_cache_stale_s,
+            max_entries=settings.result_cache_max_entries,
+        )
+
+    @staticmethod
+    def make_key(video_id: str, *, language: str | None, **params: Any) -> str:
+        """Key of one analysis: video, language and every parameter that shapes the result."""
+        return json.dumps([video_id, language, params], sort_keys=True, default=str)
+
+    def get(self, key: str) -> tuple[Any, float, bool] | None:
+        """Return (value, age_s, is_stale), or None on a miss."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = self.clock() - stored_at
+            if age < self.ttl_s + self.stale_s:
+                self._entries.move_to_end(key)
+                is_stale = age >= self.ttl_s
+                if is_stale:
+                    self.hits_stale += 1
+                else:
+                    self.hits_fresh += 1
+                return value, age, is_stale
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        if self.ttl_s <= 0:
+            return
+        self._entries[key] = (value, self.clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def schedule_refresh(self, key: str, refresh: Callable[[], Awaitable[Any]]) -> None:
+        """
+        Recompute `key` in the background unless a refresh is already running.
+        `refresh` stores its result itself, so it decides what is cacheable.
+        """
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = asyncio.create_task(self._refresh(key, refresh))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _refresh(self, key: str, refresh: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await refresh()
+            self.refreshes += 1
+        except Exception:
+            logger.exception("Background refresh failed for %s; keeping stale entry", key)
+        finally:
+            self._refreshing.discard(key)
+
+    def stats(self) -> dict:
+        return {
+            "hits_fresh": self.hits_fresh,
+            "hits_stale": self.hits_stale,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "entries": len(self._entries),
+        }
+
+
+# Singleton instance
+_result_cache: ResultCache | None = None
+
+
+def get_result_cache() -> ResultCache:
+    """Get or create the analysis result cache singleton."""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache.from_settings(get_settings())
+    return _result_cache
@@ -0,0 +1,69 @@
+"""Small asyncio helpers shared by the services."""
+import asyncio
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, TypeVar
+
+T = TypeVar("T")
+
+_END = object()
+
+
+async def gather_fail_fast(*aws: Awaitable[Any]) -> list[Any]:
+    """
+    Run awaitables concurrently and return their results in order.
+    On the first failure the remaining ones are cancelled and the error is re-raised.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        errors = [
+            task.exception() for task in tasks
+            if task in done and not task.cancelled() and task.exception() is not None
+        ]
+        if errors:
+            raise errors[0]
+        return [task.result() for task in tasks]
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+def discard_future(future: asyncio.Future) -> None:
+    """Cancel a future nobody will await, without leaving an unretrieved exception behind."""
+    if not future.done():
+        future.cancel()
+    elif not future.cancelled():
+        future.exception()
+
+
+async def ready_batches(items: AsyncIterable[T], max_size: int) -> AsyncIterator[list[T]]:
+    """
+    Group `items` into lists of at most `max_size`. A batch is handed out as
+    soon as it is full or the next item isn't there yet, so batching never
+    holds back items that already arrived.
+    """
+    iterator = aiter(items)
+    batch: list[T] = []
+    next_item = asyncio.ensure_future(anext(iterator, _END))
+    try:
+        while True:
+            if not next_item.done():
+                # One loop turn lets an item that is already buffered arrive
+                await asyncio.sleep(0)
+            if batch and (len(batch) >= max_size or not next_item.done()):
+                yield batch
+                batch = []
+                continue
+            item = await next_item
+            if item is _END:
+                break
+            batch.append(item)
+            next_item = asyncio.ensure_future(anext(iterator, _END))
+        if batch:
+            yield batch
+    finally:
+        if not next_item.done():
+            next_item.cancel()
+            await asyncio.gather(next_item, return_exceptions=True)
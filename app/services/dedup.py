@@ -0,0 +1,132 @@
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+from typing import Generic, Hashable, Iterable, TypeVar
+
+from app.services.cache import normalize_comment_text
+
+T = TypeVar("T")
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+# Multiply-shift spreads the 32-bit shingle CRC over 64 bits (odd constant: a bijection)
+_MIX64 = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+# Offset per bin of distance for values borrowed by empty bins (densification)
+_DENSIFY_STEP = 1 << 58
+
+
+class NearDuplicateIndex(Generic[T]):
+    """
+    Incremental index that maps each added text to the first member of its
+    duplicate group.
+
+    Exact duplicates (ignoring case, whitespace and punctuation) are found
+    by hash. Near duplicates are found with MinHash signatures over character
+    shingles, bucketed with LSH banding, and confirmed by the exact Jaccard
+    similarity of the shingle sets, so banding only decides which candidates
+    are compared. Texts shorter than `min_near_length` characters have too
+    few shingles for a meaningful similarity and only match exactly.
+
+    Signatures use one-permutation hashing: each shingle is hashed once to
+    64 bits, the hash picks one of `num_perm` bins and the bin keeps its
+    smallest value; empty bins borrow from the next non-empty one. That costs
+    one hash per shingle instead of one per shingle and permutation.
+    """
+
+    def __init__(
+        self,
+        *,
+        threshold: float | None = 0.8,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 4,
+        min_near_length: int = 20,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_near_length = max(min_near_length, shingle_size)
+        self.seed = seed
+        self._exact: dict[str, T] = {}
+        self._buckets: defaultdict[Hashable, list[tuple[frozenset[int], T]]] = defaultdict(list)
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def find_or_add_many(self, entries: Iterable[tuple[str, T]]) -> list[T | None]:
+        """find_or_add() for each (text, item), in order; meant to run off the event loop."""
+        return [self.find_or_add(text, item) for text, item in entries]
+
+    def find_or_add(self, text: str, item: T) -> T | None:
+        """
+        Return the representative of the group `text` belongs to, or None if
+        `text` starts a new group (with `item` as its representative).
+        """
+        normalized = normalize_comment_text(text)
+        exact_form = " ".join(_PUNCTUATION.sub(" ", normalized).split()) or normalized
+        digest = hashlib.blake2b(exact_form.encode("utf-8"), digest_size=16).hexdigest()
+        representative = self._exact.get(digest)
+        if representative is not None:
+            self.exact_duplicates += 1
+            return representative
+        self._exact[digest] = item
+
+        if self.threshold is None or len(normalized) < self.min_near_length:
+            return None
+
+        shingles = self._shingles(normalized)
+        band_keys = self._band_keys(shingles)
+        for key in band_keys:
+            for other_shingles, other in self._buckets[key]:
+                if _jaccard(shingles, other_shingles) >= self.threshold:
+                    self._exact[digest] = other
+                    self.near_duplicates += 1
+                    return other
+
+        for key in band_keys:
+            self._buckets[key].append((shingles, item))
+        return None
+
+    def _shingles(self, normalized: str) -> frozenset[int]:
+        """64-bit hashes of the character shingles."""
+        k, seed = self.shingle_size, self.seed
+        data = normalized.encode("utf-8") if normalized.isascii() else None
+        if data is not None:
+            shingles = (data[i:i + k] for i in range(len(data) - k + 1))
+        else:
+            shingles = (normalized[i:i + k].encode("utf-8") for i in range(len(normalized) - k + 1))
+        return frozenset((zlib.crc32(shingle, seed) * _MIX64) & _MASK64 for shingle in shingles)
+
+    def _band_keys(self, shingles: frozenset[int]) -> list[tuple]:
+        n = self.num_perm
+        bins: list[int | None] = [None] * n
+        for h in shingles:
+            slot, value = h % n, h // n
+            if bins[slot] is None or value < bins[slot]:
+                bins[slot] = value
+        # Densify: an empty bin takes the value of the next non-empty bin (circularly),
+        # offset by the distance so different empty bins don't all agree
+        signature = [0] * n
+        next_value, distance = 0, 0
+        # Walk backwards twice around the bins so the last ones see the first ones
+        for j in range(2 * n - 1, -1, -1):
+            value = bins[j % n]
+            if value is not None:
+                next_value, distance = value, 0
+            else:
+                distance += 1
+            if j < n:
+                signature[j] = next_value + distance * _DENSIFY_STEP
+        return [
+            (band, *signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+
+def _jaccard(a: frozenset[int], b: frozenset[int]) -> float:
+    return len(a & b) / len(a | b)
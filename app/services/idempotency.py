@@ -0,0 +1,132 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+from config import Settings, get_settings
+from app.services.pipeline import AnalysisError
+
+T = TypeVar("T")
+
+
+class IdempotencyKeyReused(Exception):
+    """Raised when an Idempotency-Key comes back with a different request body."""
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    task: asyncio.Future
+    created_at: float
+    waiters: int = 0
+
+
+class IdempotencyStore:
+    """
+    Outcomes of requests by their Idempotency-Key.
+
+    The first request with a key starts the work; a retry with the same key
+    attaches to it while it is still running and gets its outcome once it
+    finished, for `ttl_s` seconds. The work is shielded, so the first caller
+    going away (e.g. a client timeout) doesn't cancel it for the retry; only
+    when no retry has attached within `abandon_grace_s` is it cancelled.
+    Results and client errors (AnalysisError below 500) are replayed; server
+    errors and cancellations are forgotten so a retry can try again.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_s: float = 3600,
+        max_entries: int = 10000,
+        abandon_grace_s: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.abandon_grace_s = abandon_grace_s
+        self.clock = clock
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self.started = 0
+        self.replayed = 0
+        self.conflicts = 0
+        self.abandoned = 0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "IdempotencyStore":
+        return cls(
+            ttl_s=settings.idempotency_ttl_s,
+            max_entries=settings.idempotency_max_entries,
+            abandon_grace_s=settings.idempotency_abandon_grace_s,
+        )
+
+    async def run(self, key: str, fingerprint: str, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """
+        Return the outcome of `fn()` for `key` and whether it was replayed from
+        an earlier request. `fingerprint` identifies the request body.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and self.clock() - entry.created_at >= self.ttl_s:
+            del self._entries[key]
+            entry = None
+
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                self.conflicts += 1
+                raise IdempotencyKeyReused("Idempotency-Key was already used for a different request")
+            self.replayed += 1
+            return await self._wait(entry), True
+
+        task = asyncio.ensure_future(fn())
+        entry = _Entry(fingerprint=fingerprint, task=task, created_at=self.clock())
+        self._entries[key] = entry
+        self.started += 1
+        task.add_done_callback(lambda done: self._settle(key, entry))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return await self._wait(entry), False
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "started": self.started,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+            "abandoned": self.abandoned,
+        }
+
+    async def _wait(self, entry: _Entry):
+        entry.waiters += 1
+        try:
+            return await asyncio.shield(entry.task)
+        finally:
+            entry.waiters -= 1
+            if entry.waiters == 0 and not entry.task.done():
+                asyncio.get_running_loop().call_later(self.abandon_grace_s, self._abandon, entry)
+
+    def _abandon(self, entry: _Entry) -> None:
+        """Cancel the work if still nobody waits for it (the client didn't retry)."""
+        if entry.waiters == 0 and not entry.task.done():
+            self.abandoned += 1
+            entry.task.cancel()
+
+    def _settle(self, key: str, entry: _Entry) -> None:
+        task = entry.task
+        # Retrieve the error so a task nobody awaits anymore doesn't log it as unhandled
+        error = None if task.cancelled() else task.exception()
+        replayable = error is None or (isinstance(error, AnalysisError) and error.status_code < 500)
+        if (task.cancelled() or not replayable) and self._entries.get(key) is entry:
+            del self._entries[key]
+
+
+# Singleton instance
+_idempotency_store: IdempotencyStore | None = None
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Get or create the Idempotency-Key store singleton."""
+    global _idempotency_store
+    if _idempotency_store is None:
+        _idempotency_store = IdempotencyStore.from_settings(get_settings())
+    return _idempotency_store
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Literal
+
+from config import Settings, get_settings
+from app.modals.video import VideoAnalysisResponse
+from app.services.pipeline import AnalysisError
+from app.services.progress import AnalysisProgress
+
+JobStatus = Literal["pending", "running", "succeeded", "failed"]
+
+
+class TooManyJobs(Exception):
+    """Raised when every retained job is still unfinished and no new one can be accepted."""
+
+
+@dataclass
+class AnalysisJob:
+    """One analysis running (or finished) in the background."""
+    id: str
+    key: str
+    status: JobStatus = "pending"
+    progress: AnalysisProgress = field(default_factory=AnalysisProgress)
+    result: VideoAnalysisResponse | None = None
+    error_status: int | None = None
+    error: str | None = None
+    finished_at: float | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+
+class AnalysisJobStore:
+    """
+    In-memory registry of background analyses.
+
+    `submit()` starts the work as a task and returns immediately; a job for
+    an analysis that is already pending or running is reused instead of
+    starting a second one. Finished jobs are kept for `ttl_s` seconds so
+    their result can be polled. At most `max_jobs` jobs are retained: the
+    oldest finished jobs are dropped first, and when all of them are still
+    running new submissions are refused.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_jobs: int = 1000,
+        ttl_s: float = 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_jobs = max_jobs
+        self.ttl_s = ttl_s
+        self.clock = clock
+        self._jobs: OrderedDict[str, AnalysisJob] = OrderedDict()
+        self._active: dict[str, AnalysisJob] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.submitted = 0
+        self.reused = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "AnalysisJobStore":
+        return cls(max_jobs=settings.analysis_jobs_max, ttl_s=settings.analysis_job_ttl_s)
+
+    def submit(
+        self,
+        key: str,
+        run: Callable[[AnalysisProgress], Awaitable[VideoAnalysisResponse]],
+    ) -> AnalysisJob:
+        """Start `run(progress)` in the background as the job for analysis `key`."""
+        active = self._active.get(key)
+        if active is not None:
+            self.reused += 1
+            return active
+
+        self._evict(room=1)
+        if len(self._jobs) >= self.max_jobs:
+            self.rejected += 1
+            raise TooManyJobs("Too many analyses in progress")
+
+        job = AnalysisJob(id=uuid.uuid4().hex, key=key)
+        self._jobs[job.id] = job
+        self._active[key] = job
+        self.submitted += 1
+        task = asyncio.create_task(self._run(job, run))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> AnalysisJob | None:
+        self._evict()
+        return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        return {
+            "jobs": len(self._jobs),
+            "active": len(self._active),
+            "submitted": self.submitted,
+            "reused": self.reused,
+            "rejected": self.rejected,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+        }
+
+    async def _run(
+        self,
+        job: AnalysisJob,
+        run: Callable[[AnalysisProgress], Awaitable[VideoAnalysisResponse]],
+    ) -> None:
+        job.status = "running"
+        try:
+            job.result = await run(job.progress)
+            job.status = "succeeded"
+            self.succeeded += 1
+        except AnalysisError as e:
+            job.status, job.error_status, job.error = "failed", e.status_code, e.detail
+            self.failed += 1
+        except asyncio.CancelledError:
+            # Shutdown or abort: finish the job so it doesn't stay "running" and can be evicted
+            job.status, job.error_status, job.error = "failed", 503, "Analysis cancelled"
+            self.failed += 1
+            raise
+        except Exception:
+            logging.getLogger(__name__).exception("Analysis job %s failed", job.id)
+            job.status, job.error_status, job.error = "failed", 500, "Analysis failed"
+            self.failed += 1
+        finally:
+            job.finished_at = self.clock()
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            if job.result is not None:
+                job.progress.finish("result", **job.result.model_dump(mode="json"))
+            else:
+                job.progress.finish("error", status=job.error_status, detail=job.error)
+
+    def _evict(self, *, room: int = 0) -> None:
+        """Drop expired finished jobs, then the oldest finished ones until `room` jobs fit."""
+        now = self.clock()
+        finished = [job for job in self._jobs.values() if job.done]
+        for job in finished:
+            if now - job.finished_at >= self.ttl_s or len(self._jobs) + room > self.max_jobs:
+                del self._jobs[job.id]
+
+
+# Singleton instance
+_job_store: AnalysisJobStore | None = None
+
+
+def get_job_store() -> AnalysisJobStore:
+    """Get or create the analysis job store singleton."""
+    global _job_store
+    if _job_store is None:
+        _job_store = AnalysisJobStore.from_settings(get_settings())
+    return _job_store
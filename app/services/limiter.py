@@ -0,0 +1,351 @@
+import asyncio
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from openai import RateLimitError
+
+from config import Settings, get_settings
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Process-wide AIMD concurrency limit for calls to a rate-limited API.
+
+    Every successful call raises the limit by `increase / limit`, i.e. by
+    about `increase` per full window of calls (additive increase). An
+    overload signal, one of `overload_exceptions` or a short-term latency
+    average above `latency_tolerance` times the long-term one, multiplies
+    it by `decrease_factor` (multiplicative decrease), at most once per
+    `decrease_cooldown_s`. Waiters are served in FIFO order.
+    """
+
+    # Latency smoothing: fast average vs. slow baseline
+    FAST_EWMA_ALPHA = 0.2
+    SLOW_EWMA_ALPHA = 0.02
+    # Latency samples needed before latency can trigger a decrease
+    MIN_LATENCY_SAMPLES = 20
+
+    def __init__(
+        self,
+        *,
+        initial_limit: float = 20,
+        min_limit: float = 1,
+        max_limit: float = 100,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 3.0,
+        decrease_cooldown_s: float = 1.0,
+        overload_exceptions: tuple[type[BaseException], ...] = (),
+        clock=time.monotonic,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.decrease_cooldown_s = decrease_cooldown_s
+        self.overload_exceptions = overload_exceptions
+        self.clock = clock
+
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._last_decrease = float("-inf")
+        self._fast_latency: float | None = None
+        self._slow_latency: float | None = None
+        self._latency_samples = 0
+
+        self.acquired = 0
+        self.overloads = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+
+    @classmethod
+    def from_settings(cls, settings: Settings, **kwargs) -> "AdaptiveConcurrencyLimiter":
+        return cls(
+            initial_limit=settings.openai_concurrency_initial,
+            min_limit=settings.openai_concurrency_min,
+            max_limit=settings.openai_concurrency_max,
+            **kwargs,
+        )
+
+    @property
+    def current_limit(self) -> int:
+        return max(1, int(self.limit))
+
+    @asynccontextmanager
+    async def acquire(self, *, observe_latency: bool = True) -> AsyncIterator[None]:
+        """
+        Hold one slot for the duration of the block and learn from its outcome.
+        Pass `observe_latency=False` for calls whose duration is not comparable
+        with the usual ones (e.g. long generations), so they don't skew the baseline.
+        """
+        wait_started = self.clock()
+        await self._acquire_slot()
+        started = self.clock()
+        waited = started - wait_started
+        self.acquired += 1
+        self.total_wait_s += waited
+        self.max_wait_s = max(self.max_wait_s, waited)
+        try:
+            yield
+        except self.overload_exceptions:
+            self.record_overload()
+            raise
+        else:
+            self._record_success(self.clock() - started if observe_latency else None)
+        finally:
+            self._release_slot()
+
+    def record_overload(self) -> None:
+        """Multiplicative decrease (rate limited upstream or latency climbing)."""
+        now = self.clock()
+        self.overloads += 1
+        if now - self._last_decrease < self.decrease_cooldown_s:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.current_limit,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "acquired": self.acquired,
+            "overloads": self.overloads,
+            "avg_wait_s": self.total_wait_s / self.acquired if self.acquired else 0.0,
+            "max_wait_s": self.max_wait_s,
+            "latency_ewma_s": self._fast_latency,
+        }
+
+    def _record_success(self, latency: float | None) -> None:
+        if latency is not None:
+            self._latency_samples += 1
+            if self._fast_latency is None:
+                self._fast_latency = self._slow_latency = latency
+            else:
+                self._fast_latency += self.FAST_EWMA_ALPHA * (latency - self._fast_latency)
+                self._slow_latency += self.SLOW_EWMA_ALPHA * (latency - self._slow_latency)
+
+            if (
+                self._latency_samples >= self.MIN_LATENCY_SAMPLES
+                and self._fast_latency > self.latency_tolerance * self._slow_latency
+            ):
+                self.record_overload()
+                return
+
+        self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+        self._wake()
+
+    async def _acquire_slot(self) -> None:
+        if not self._waiters and self.in_flight < self.current_limit:
+            self.in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # _wake() counts the slot as ours before resolving the future
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self.current_limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+
+# Singleton instance
+_openai_limiter: AdaptiveConcurrencyLimiter | None = None
+
+
+def get_openai_limiter() -> AdaptiveConcurrencyLimiter:
+    """Get or create the OpenAI concurrency limiter shared by the whole process."""
+    global _openai_limiter
+    if _openai_limiter is None:
+        _openai_limiter = AdaptiveConcurrencyLimiter.from_settings(
+            get_settings(),
+            overload_exceptions=(RateLimitError,),
+        )
+    return _openai_limiter
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `capacity` per `period_s`. The level may go negative (debt)."""
+
+    def __init__(self, capacity: float, period_s: float = 60.0, *, clock=time.monotonic):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period_s
+        self.clock = clock
+        self.level = self.capacity
+        self._updated = clock()
+
+    def refill(self) -> None:
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` now and return how long the caller must wait until it is covered."""
+        self.refill()
+        self.level -= min(amount, self.capacity)
+        return -self.level / self.rate if self.level < 0 else 0.0
+
+    def adjust(self, delta: float) -> None:
+        self.refill()
+        self.level = min(self.capacity, self.level + delta)
+
+    def cap(self, remaining: float) -> None:
+        """Never believe we have more left than the server says we do."""
+        self.refill()
+        self.level = min(self.level, remaining)
+
+
+class OpenAIRateLimiter:
+    """
+    Proactive pacing under the account's requests-per-minute and
+    tokens-per-minute budgets.
+
+    Each call reserves one request and its estimated tokens before it is
+    sent; the estimate is corrected from `resp.usage` afterwards. Rate-limit
+    response headers (`retry-after`, `x-ratelimit-remaining-*`,
+    `x-ratelimit-reset-*`) pause or drain the buckets so callers wait for the
+    budget to come back instead of collecting further 429s. A budget of
+    None is not paced locally, but its exhausted headers still pause callers.
+    """
+
+    def __init__(
+        self,
+        *,
+        rpm: int | None = None,
+        tpm: int | None = None,
+        clock=time.monotonic,
+    ):
+        self.clock = clock
+        self.requests = TokenBucket(rpm, clock=clock) if rpm else None
+        self.tokens = TokenBucket(tpm, clock=clock) if tpm else None
+        self._paused_until = 0.0
+        self.paced = 0
+        self.total_delay_s = 0.0
+        self.estimated_tokens = 0
+        self.actual_tokens = 0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "OpenAIRateLimiter":
+        return cls(rpm=settings.openai_rpm_limit, tpm=settings.openai_tpm_limit)
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        """Reserve budget for one call, sleeping until it is available."""
+        delay = max(0.0, self._paused_until - self.clock())
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.reserve(estimated_tokens))
+        self.estimated_tokens += estimated_tokens
+        if delay > 0:
+            self.paced += 1
+            self.total_delay_s += delay
+            await asyncio.sleep(delay)
+
+    def reconcile(self, estimated_tokens: int, usage) -> None:
+        """Correct the token bucket with the usage the API reported."""
+        actual = getattr(usage, "total_tokens", None)
+        if not isinstance(actual, int):
+            return
+        self.actual_tokens += actual
+        if self.tokens is not None:
+            self.tokens.adjust(estimated_tokens - actual)
+
+    def apply_headers(self, headers) -> float | None:
+        """
+        Learn from rate-limit response headers.
+        Returns the server-requested retry delay in seconds, if there was one.
+        """
+        if not headers:
+            return None
+        now = self.clock()
+
+        retry_after = _parse_retry_after(headers)
+        if retry_after is not None:
+            self._paused_until = max(self._paused_until, now + retry_after)
+
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            remaining = _parse_number(headers.get(f"x-ratelimit-remaining-{kind}"))
+            if remaining is None:
+                continue
+            if bucket is not None:
+                bucket.cap(remaining)
+            # An exhausted budget pauses callers even when it isn't paced locally
+            reset = _parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if remaining <= 0 and reset is not None:
+                self._paused_until = max(self._paused_until, now + reset)
+
+        return retry_after
+
+    def stats(self) -> dict:
+        return {
+            "requests_available": self.requests.level if self.requests else None,
+            "tokens_available": self.tokens.level if self.tokens else None,
+            "paused_for_s": max(0.0, self._paused_until - self.clock()),
+            "paced_calls": self.paced,
+            "total_delay_s": self.total_delay_s,
+            "estimated_tokens": self.estimated_tokens,
+            "actual_tokens": self.actual_tokens,
+        }
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_duration(value: str | None) -> float | None:
+    """Parse OpenAI reset durations such as '20ms', '1s' or '6m0s'."""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return _parse_number(value)
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _parse_number(value: str | None) -> float | None:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_retry_after(headers) -> float | None:
+    retry_after_ms = _parse_number(headers.get("retry-after-ms"))
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000
+    return _parse_number(headers.get("retry-after"))
+
+
+# Singleton instance
+_openai_rate_limiter: OpenAIRateLimiter | None = None
+
+
+def get_openai_rate_limiter() -> OpenAIRateLimiter:
+    """Get or create the OpenAI RPM/TPM pacer shared by the whole process."""
+    global _openai_rate_limiter
+    if _openai_rate_limiter is None:
+        _openai_rate_limiter = OpenAIRateLimiter.from_settings(get_settings())
+    return _openai_rate_limiter
@@ -0,0 +1,455 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Literal
+
+import httpx
+
+from app.modals.video import Comment, VideoAnalysisResponse, VideoInfo
+from app.services.analyzer import CommentAnalyzer, CommentStreamAnalysis
+from app.services.cache import ResultCache
+from app.services.concurrency import gather_fail_fast
+from app.services.planner import FetchPlan, FetchPlanner
+from app.services.progress import AnalysisProgress
+from app.services.singleflight import SingleFlight
+from app.services.youtube import YouTubeAPIError, YouTubeService
+
+
+AnalysisMode = Literal["auto", "full", "sequential", "sample"]
+
+# Errors of YouTubeService calls, mapped to an AnalysisError by _youtube_error
+YOUTUBE_ERRORS = (PermissionError, ValueError, YouTubeAPIError, httpx.HTTPError)
+
+
+class AnalysisError(Exception):
+    """Raised when a video cannot be analyzed. `status_code` is the matching HTTP status."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class AnalysisPipeline:
+    """
+    Runs the full analysis of one video: fetch → classify → summarize.
+
+    Video info and the first comment page are requested concurrently; the
+    remaining pages are streamed into the analyzer so classification of
+    page N overlaps with fetching page N+1.
+
+    With a `result_cache`, repeated analyses of the same video are served
+    from memory; stale entries are served immediately and refreshed in the
+    background. With a `single_flight`, concurrent requests for the same
+    analysis share one pipeline run instead of starting their own.
+
+    With a deadline the analysis returns what it has when time is nearly up,
+    marked `partial` with the share of fetched comments it covers; partial
+    results are not cached.
+
+    In "sequential" mode all comments are fetched first and only a
+    stratified random sample is classified, until the sentiment shares
+    are known within the configured margin. In "sample" mode a random
+    sample of max_comments is drawn while the pages stream in, and all
+    of it is classified. In "auto" mode the FetchPlanner picks one of them
+    (or a single page for small videos) from the video's comment count and
+    the time left; the first comment page is fetched alongside the video
+    info it needs and every plan but "sample" (which reads pages in time
+    order) continues from it, so planning costs no extra round trip.
+
+    With reply expansion enabled (reply_threads), the replies of the most
+    replied-to threads are fetched once the top-level comments are in and
+    classified along with them.
+    """
+
+    def __init__(
+        self,
+        youtube_service: YouTubeService,
+        analyzer: CommentAnalyzer,
+        *,
+        result_cache: ResultCache | None = None,
+        single_flight: SingleFlight | None = None,
+        planner: FetchPlanner | None = None,
+    ):
+        self.youtube_service = youtube_service
+        self.analyzer = analyzer
+        self.result_cache = result_cache
+        self.single_flight = single_flight
+        self.planner = planner or FetchPlanner(
+            max_comments=youtube_service.max_comments,
+            sample_max_pages=youtube_service.sample_max_pages,
+            max_workers=analyzer.MAX_IN_FLIGHT_REQUESTS,
+            page_size=youtube_service.COMMENT_PAGE_SIZE,
+        )
+
+    async def run(
+        self,
+        video_id: str,
+        *,
+        language: str | None = None,
+        deadline_s: float | None = None,
+        mode: AnalysisMode = "full",
+        progress: AnalysisProgress | None = None,
+    ) -> VideoAnalysisResponse:
+        """
+        Analyze a video, or serve it from the result cache. Comments fetched and
+        classified along the way are counted in `progress`.
+        """
+        key = self.analysis_key(video_id, language=language, mode=mode)
+        if self.result_cache is not None:
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                response, age, is_stale = cached
+                if is_stale:
+                    self.result_cache.schedule_refresh(
+                        key, lambda: self._run_once(key, video_id, language=language, mode=mode)
+                    )
+                return response.model_copy(update={"cache_hit": True, "cache_age_s": round(age, 3)})
+
+        return await self._run_once(
+            key, video_id, language=language, deadline_s=deadline_s, mode=mode, progress=progress
+        )
+
+    def analysis_key(self, video_id: str, *, language: str | None, mode: AnalysisMode) -> str:
+        """Key of one analysis, shared by every request for it (result cache; see join_key for runs)."""
+        return ResultCache.make_key(
+            video_id,
+            language=language,
+            max_comments=self.youtube_service.max_comments,
+            mode=mode,
+        )
+
+    @staticmethod
+    def join_key(key: str, deadline_s: float | None) -> str:
+        """
+        Key of runs of analysis `key` that can share their result (single flight,
+        jobs): only runs with the same deadline, a shorter one truncates it.
+        """
+        return f"{key}|deadline_s={deadline_s or None}"
+
+    async def _run_once(
+        self,
+        key: str,
+        video_id: str,
+        *,
+        language: str | None,
+        deadline_s: float | None = None,
+        mode: AnalysisMode = "full",
+        progress: AnalysisProgress | None = None,
+    ) -> VideoAnalysisResponse:
+        """
+        Run the analysis, or join the same one already running with the same
+        deadline (a shorter one would truncate the result). The progress of
+        every request sharing the run follows the run's progress.
+        """
+        deadline = asyncio.get_running_loop().time() + deadline_s if deadline_s else None
+        shared = AnalysisProgress()
+        if progress is not None:
+            shared.attach(progress)
+
+        def analyze() -> Awaitable[VideoAnalysisResponse]:
+            return self._analyze_and_cache(
+                key, video_id, language=language, deadline=deadline, mode=mode, progress=shared
+            )
+
+        if self.single_flight is None:
+            return await analyze()
+        return await self.single_flight.do(
+            self.join_key(key, deadline_s),
+            analyze,
+            context=shared,
+            on_join=(lambda leader: leader.attach(progress)) if progress is not None else None,
+        )
+
+    async def _analyze_and_cache(
+        self,
+        key: str,
+        video_id: str,
+        *,
+        language: str | None,
+        deadline: float | None = None,
+        mode: AnalysisMode = "full",
+        progress: AnalysisProgress | None = None,
+    ) -> VideoAnalysisResponse:
+        response = await self._analyze(
+            video_id, language=language, deadline=deadline, mode=mode, progress=progress
+        )
+        if self.result_cache is not None and not response.partial:
+            self.result_cache.set(key, response)
+        return response
+
+    async def _analyze(
+        self,
+        video_id: str,
+        *,
+        language: str | None = None,
+        deadline: float | None = None,
+        mode: AnalysisMode = "full",
+        progress: AnalysisProgress | None = None,
+    ) -> VideoAnalysisResponse:
+        progress = progress or AnalysisProgress()
+        video_info = None
+        first_page = pages = None
+        if mode == "auto":
+            plan, video_info, first_page, pages = await self._plan_with_first_page(
+                video_id, deadline=deadline, progress=progress
+            )
+            if plan.strategy == "sample":
+                # Sampling reads pages in time order, so the first page is dropped
+                await pages.aclose()
+                first_page = pages = None
+        else:
+            plan = self.planner.for_strategy(mode)
+
+        if plan.strategy == "sample":
+            analysis, video_info = await self._sample_and_analyze(
+                video_id, plan, language=language, deadline=deadline, video_info=video_info, progress=progress
+            )
+        else:
+            analysis, video_info = await self._fetch_and_analyze(
+                video_id,
+                plan,
+                language=language,
+                deadline=deadline,
+                video_info=video_info,
+                progress=progress,
+                first_page=first_page,
+                pages=pages,
+            )
+
+        if not analysis.comments:
+            raise AnalysisError(504, "Analysis deadline exceeded")
+
+        comments = analysis.comments
+        return VideoAnalysisResponse(
+            analyze_result=analysis.summary,
+            count_comments_per_sentiment=dict(self.analyzer.count_comment_per_sentiment(comments)),
+            likes_per_category=dict(self.analyzer.count_likes_per_category(comments)),
+            video_info=video_info,
+            comments_count=analysis.received,
+            classified_count=len(comments),
+            partial=analysis.partial,
+            coverage=round(analysis.coverage, 3),
+            sentiment_intervals=_round_intervals(analysis.sentiment_intervals),
+            fetch_strategy=plan.strategy,
+        )
+
+    async def _fetch_and_analyze(
+        self,
+        video_id: str,
+        plan: FetchPlan,
+        *,
+        language: str | None,
+        deadline: float | None,
+        video_info: VideoInfo | None,
+        progress: AnalysisProgress,
+        first_page: list[Comment] | None = None,
+        pages: AsyncIterator[list[Comment]] | None = None,
+    ) -> tuple[CommentStreamAnalysis, VideoInfo]:
+        """
+        Fetch and classify the comments of `plan`, continuing from `first_page`
+        and its `pages` when they were fetched already (see _plan_with_first_page).
+        """
+        if pages is None:
+            pages = self.youtube_service.iter_comment_pages(
+                video_id, limit=plan.limit, page_size=plan.page_size, progress=progress
+            )
+        try:
+            if first_page is None:
+                first_page, video_info = await self._fetch_with_video_info(
+                    video_id, anext(pages, []), deadline=deadline, video_info=video_info, progress=progress
+                )
+
+            comments = _counted(
+                self._with_replies(_comment_stream(first_page, pages, limit=plan.limit)), progress
+            )
+            if plan.strategy == "sequential":
+                pool = await _collect(comments, deadline=deadline)
+                analysis = await self.analyzer.analyze_sequential_async(
+                    pool, language=language, deadline=deadline, workers=plan.workers, progress=progress
+                )
+            else:
+                analysis = await self.analyzer.analyze_comment_stream_async(
+                    comments,
+                    language=language,
+                    deadline=deadline,
+                    workers=plan.workers,
+                    progress=progress,
+                )
+        finally:
+            await pages.aclose()
+        return analysis, video_info
+
+    async def _sample_and_analyze(
+        self,
+        video_id: str,
+        plan: FetchPlan,
+        *,
+        language: str | None,
+        deadline: float | None,
+        video_info: VideoInfo | None,
+        progress: AnalysisProgress,
+    ) -> tuple[CommentStreamAnalysis, VideoInfo]:
+        sample, video_info = await self._fetch_with_video_info(
+            video_id,
+            self.youtube_service.sample_comments(
+                video_id, plan.sample_size, max_pages=plan.max_pages, page_size=plan.page_size, progress=progress
+            ),
+            deadline=deadline,
+            video_info=video_info,
+            progress=progress,
+        )
+        analysis = await self.analyzer.analyze_comment_stream_async(
+            _counted(self._with_replies(_iterate(sample)), progress),
+            language=language,
+            deadline=deadline,
+            workers=plan.workers,
+            progress=progress,
+        )
+        return analysis, video_info
+
+    async def _with_replies(self, comments: AsyncIterator[Comment]) -> AsyncIterator[Comment]:
+        """
+        Pass `comments` through, then the replies of the most replied-to ones
+        (see YouTubeService.expand_replies), unless reply expansion is off.
+        """
+        if self.youtube_service.reply_threads <= 0:
+            async for comment in comments:
+                yield comment
+            return
+
+        threads: list[Comment] = []
+        async for comment in comments:
+            threads.append(comment)
+            yield comment
+        for reply in await self.youtube_service.expand_replies(threads):
+            yield reply
+
+    async def _plan_with_first_page(
+        self,
+        video_id: str,
+        *,
+        deadline: float | None,
+        progress: AnalysisProgress,
+    ) -> tuple[FetchPlan, VideoInfo, list[Comment], AsyncIterator[list[Comment]]]:
+        """
+        Plan from the video info (with its comment count), fetching the first
+        comment page of the default size in the same round trip. Returns the
+        plan, the video info, the first page and the pages that follow it,
+        which the caller must close.
+        """
+        pages = self.youtube_service.iter_comment_pages(
+            video_id, page_size=self.planner.page_size, progress=progress
+        )
+        try:
+            first_page, video_info = await self._fetch_with_video_info(
+                video_id, anext(pages, []), deadline=deadline, progress=progress
+            )
+            time_left = deadline - asyncio.get_running_loop().time() if deadline is not None else None
+            plan = self.planner.plan(video_info.comment_count, time_left_s=time_left)
+        except BaseException:
+            await pages.aclose()
+            raise
+        return plan, video_info, first_page, pages
+
+    async def _fetch_with_video_info(
+        self,
+        video_id: str,
+        comments: Awaitable[list[Comment]],
+        *,
+        deadline: float | None,
+        video_info: VideoInfo | None = None,
+        progress: AnalysisProgress,
+    ) -> tuple[list[Comment], VideoInfo]:
+        """
+        Await the first comments together with the video info (unless it is
+        already known) and validate both.
+        """
+        resolving_info = video_info is None
+        try:
+            async with asyncio.timeout_at(deadline):
+                if video_info is None:
+                    first_comments, video_info = await gather_fail_fast(
+                        comments,
+                        self.youtube_service.get_video_info(video_id),
+                    )
+                else:
+                    first_comments = await comments
+        except YOUTUBE_ERRORS as e:
+            raise _youtube_error(e) from e
+        except TimeoutError as e:
+            raise AnalysisError(504, "Analysis deadline exceeded") from e
+
+        if not first_comments:
+            raise AnalysisError(400, "No comments to analyze")
+        if not video_info:
+            raise AnalysisError(404, "Video not found")
+        if resolving_info:
+            progress.video_info_resolved(video_info.model_dump())
+        return first_comments, video_info
+
+
+def _round_intervals(
+    intervals: dict[str, tuple[float, float]] | None,
+) -> dict[str, tuple[float, float]] | None:
+    if intervals is None:
+        return None
+    return {sentiment: (round(low, 4), round(high, 4)) for sentiment, (low, high) in intervals.items()}
+
+
+def _youtube_error(error: Exception) -> AnalysisError:
+    """
+    Map YouTubeService errors to an AnalysisError. API failures and transport
+    errors (timeouts, resets) are a 502, so they are retried rather than
+    reported as a missing video.
+    """
+    if isinstance(error, PermissionError):
+        return AnalysisError(403, str(error))
+    if isinstance(error, (YouTubeAPIError, httpx.HTTPError)):
+        return AnalysisError(502, "YouTube API unavailable")
+    return AnalysisError(404, str(error))
+
+
+async def _comment_stream(
+    first_page: list[Comment],
+    pages: AsyncIterator[list[Comment]],
+    *,
+    limit: int,
+) -> AsyncIterator[Comment]:
+    """The comments of `first_page`, then of `pages`, up to `limit` in total."""
+    for comment in first_page[:limit]:
+        yield comment
+    remaining = limit - len(first_page)
+    if remaining <= 0:
+        return
+    try:
+        async for page in pages:
+            for comment in page[:remaining]:
+                yield comment
+            remaining -= len(page)
+            if remaining <= 0:
+                return
+    except YOUTUBE_ERRORS as e:
+        raise _youtube_error(e) from e
+
+
+async def _collect(comments: AsyncIterator[Comment], *, deadline: float | None) -> list[Comment]:
+    """Fetch the whole comment pool, keeping what arrived if the deadline hits first."""
+    pool: list[Comment] = []
+    try:
+        async with asyncio.timeout_at(deadline):
+            async for comment in comments:
+                pool.append(comment)
+    except TimeoutError:
+        if deadline is None:
+            raise
+    return pool
+
+
+async def _counted(comments: AsyncIterator[Comment], progress: AnalysisProgress) -> AsyncIterator[Comment]:
+    async for comment in comments:
+        progress.add_fetched()
+        yield comment
+
+
+async def _iterate(comments: list[Comment]) -> AsyncIterator[Comment]:
+    for comment in comments:
+        yield comment
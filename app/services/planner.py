@@ -0,0 +1,101 @@
+import math
+from dataclasses import dataclass
+from typing import Literal
+
+FetchStrategy = Literal["single_page", "full", "sample", "sequential"]
+
+
+@dataclass(frozen=True)
+class FetchPlan:
+    """How the comments of one video are fetched and classified."""
+    strategy: FetchStrategy
+    limit: int  # most comments read from the API
+    page_size: int  # comments requested per commentThreads page
+    sample_size: int  # comments kept by the reservoir ("sample" only)
+    workers: int  # concurrent classification workers
+
+    @property
+    def max_pages(self) -> int:
+        return math.ceil(self.limit / self.page_size)
+
+
+class FetchPlanner:
+    """
+    Picks the fetch strategy for a video from its commentCount (videos().list
+    statistics), the comment budget and the time left:
+
+    - count unknown (statistics hidden): paginate up to max_comments, as before
+    - everything fits in one page: one request sized to the count
+    - everything fits in max_comments and in the time: full pagination
+    - otherwise, if a pool of max_comments is large enough to be worth
+      sampling from and can be read in time: sequential sampling over it
+    - otherwise: reservoir sample of max_comments from the pages that fit
+      in the page and time budgets
+
+    Comments fetched beyond what is classified only cost quota, so the
+    worker count never exceeds the number of comments to classify.
+    """
+
+    # Default page size: commentThreads().list accepts at most 100 results per page
+    PAGE_SIZE = 100
+    # Smallest pool for which sequential sampling beats classifying a fixed sample
+    SEQUENTIAL_MIN_POOL = 1000
+    # Expected duration of one commentThreads page request
+    PAGE_FETCH_S = 0.5
+    # Share of the deadline that fetching may use; the rest is for classification
+    FETCH_TIME_SHARE = 0.5
+
+    def __init__(
+        self,
+        *,
+        max_comments: int,
+        sample_max_pages: int,
+        max_workers: int,
+        page_size: int | None = None,
+    ):
+        self.max_comments = max_comments
+        self.page_size = page_size or self.PAGE_SIZE
+        self.sample_max_pages = sample_max_pages
+        self.max_workers = max_workers
+
+    def plan(self, comment_count: int | None, *, time_left_s: float | None = None) -> FetchPlan:
+        """Plan for a video with `comment_count` comments (None if unknown)."""
+        if comment_count is None:
+            return self.for_strategy("full")
+
+        page_budget = self._page_budget(time_left_s)
+        wanted = min(comment_count, self.max_comments)
+        if comment_count <= self.max_comments and math.ceil(wanted / self.page_size) <= page_budget:
+            if wanted <= self.page_size:
+                return self._plan("single_page", limit=max(1, wanted), page_size=max(1, wanted))
+            return self._plan("full", limit=wanted)
+
+        if (
+            self.max_comments >= self.SEQUENTIAL_MIN_POOL
+            and math.ceil(self.max_comments / self.page_size) <= page_budget
+        ):
+            return self._plan("sequential", limit=self.max_comments)
+
+        pages = max(1, min(self.sample_max_pages, page_budget, math.ceil(comment_count / self.page_size)))
+        return self._plan("sample", limit=pages * self.page_size)
+
+    def for_strategy(self, strategy: FetchStrategy) -> FetchPlan:
+        """The plan for an explicitly requested strategy."""
+        if strategy == "sample":
+            return self._plan("sample", limit=self.sample_max_pages * self.page_size)
+        return self._plan(strategy, limit=self.max_comments)
+
+    def _plan(self, strategy: FetchStrategy, *, limit: int, page_size: int | None = None) -> FetchPlan:
+        sample_size = min(self.max_comments, limit)
+        return FetchPlan(
+            strategy=strategy,
+            limit=limit,
+            page_size=page_size or self.page_size,
+            sample_size=sample_size,
+            workers=max(1, min(self.max_workers, sample_size)),
+        )
+
+    def _page_budget(self, time_left_s: float | None) -> float:
+        if time_left_s is None:
+            return math.inf
+        return max(1, int(time_left_s * self.FETCH_TIME_SHARE / self.PAGE_FETCH_S))
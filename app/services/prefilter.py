@@ -0,0 +1,169 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import Optional
+
+from config import Settings
+from app.i18n import LANGUAGE_NAMES, t
+from app.modals.video import CommentAnalysisResult
+
+
+# Emoji polarity lexicon (variation selectors and skin tones are stripped before lookup)
+POSITIVE_EMOJI = set("❤♥😍🥰😘😊😁😀😃😄😆😂🤣👍👏🙌💪🔥💯⭐🌟🤩💖💕💗💓💞💙💚💛💜🖤🤍🧡🏆🎉🥳")
+NEGATIVE_EMOJI = set("👎😡😠🤬💩🤮🤢😢😭😞😒🙄💔😤😩😫")
+
+# One-word lexicon: normalized word -> (sentiment, main_theme).
+# Laughter ("lol", "haha") is left to the LLM: it is as often sarcastic as it is praise.
+WORD_LEXICON: dict[str, tuple[str, str]] = {
+    **dict.fromkeys(
+        [
+            "nice", "great", "good", "awesome", "amazing", "cool", "love", "beautiful",
+            "perfect", "excellent", "wow", "thanks", "thank", "thx", "ty", "brilliant",
+            "wonderful", "fantastic", "legend", "goat",
+            "masterpiece", "underrated", "класс", "классно", "круто", "супер", "отлично",
+            "спасибо", "красиво", "топ", "шикарно", "огонь", "обожаю", "хорошо", "лучший",
+        ],
+        ("positive", "praise"),
+    ),
+    **dict.fromkeys(
+        [
+            "bad", "boring", "terrible", "awful", "trash", "garbage", "cringe", "dislike",
+            "worst", "hate", "clickbait", "ужасно", "скучно", "плохо", "отстой", "кринж",
+            "дизлайк", "фу", "кликбейт",
+        ],
+        ("negative", "criticism"),
+    ),
+    **dict.fromkeys(
+        ["first", "early", "1st", "первый", "первая"],
+        ("off-topic", "first comment"),
+    ),
+    **dict.fromkeys(
+        ["hi", "hello", "hey", "привет", "приветик"],
+        ("off-topic", "greeting"),
+    ),
+}
+
+_TIMESTAMP = re.compile(r"^(?:\d{1,2}:)?\d{1,2}:\d{2}$")
+_REPEATED_CHARS = re.compile(r"(.)\1{2,}")
+# Emoji joiners and modifiers that carry no meaning of their own
+_EMOJI_MODIFIERS = {"‍", "︎", "️", "⃣"} | {chr(c) for c in range(0x1F3FB, 0x1F400)}
+
+
+class CommentPrefilter:
+    """
+    Rule/lexicon classifier for low-information comments that don't need the LLM.
+
+    Each rule returns a label with a confidence; the label is used only when
+    the confidence reaches `min_confidence`, otherwise the comment goes to
+    OpenAI as usual. Themes are labelled in the language of the analysis
+    (app.i18n), and left empty for languages without a translation.
+    Per-rule hit counts are kept for /metrics.
+    """
+
+    RULES = ("punctuation", "timestamps", "emoji", "lexicon")
+    # Emoji-only comments without any known-polarity emoji
+    UNKNOWN_EMOJI_CONFIDENCE = 0.9
+    LEXICON_CONFIDENCE = 0.95
+
+    def __init__(self, *, enabled: bool = True, min_confidence: float = 0.9, max_words: int = 1):
+        self.enabled = enabled
+        self.min_confidence = min_confidence
+        self.max_words = max_words
+        self.checked = 0
+        self.hits: Counter = Counter()
+        self.low_confidence: Counter = Counter()
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "CommentPrefilter":
+        return cls(
+            enabled=settings.prefilter_enabled,
+            min_confidence=settings.prefilter_min_confidence,
+            max_words=settings.prefilter_max_words,
+        )
+
+    def classify(self, text: str, *, language: str | None = None) -> Optional[CommentAnalysisResult]:
+        """Return a local classification, or None if the comment needs the LLM."""
+        if not self.enabled:
+            return None
+        self.checked += 1
+        stripped = text.strip()
+        for rule in self.RULES:
+            match = getattr(self, f"_rule_{rule}")(stripped)
+            if match is None:
+                continue
+            sentiment, theme, confidence = match
+            if confidence < self.min_confidence:
+                self.low_confidence[rule] += 1
+                return None
+            self.hits[rule] += 1
+            return CommentAnalysisResult(sentiment=sentiment, main_theme=_theme_label(theme, language))
+        return None
+
+    def stats(self) -> dict:
+        matched = sum(self.hits.values())
+        return {
+            "checked": self.checked,
+            "matched": matched,
+            "hit_rate": matched / self.checked if self.checked else 0.0,
+            "rules": {
+                rule: {
+                    "hits": self.hits[rule],
+                    "hit_rate": self.hits[rule] / self.checked if self.checked else 0.0,
+                    "below_threshold": self.low_confidence[rule],
+                }
+                for rule in self.RULES
+            },
+        }
+
+    def _rule_punctuation(self, text: str):
+        """Empty or punctuation-only ("...", "?!")."""
+        if all(unicodedata.category(ch).startswith(("P", "Z")) or ch.isspace() for ch in text):
+            return "nonsensical", "no content", 1.0
+        return None
+
+    def _rule_timestamps(self, text: str):
+        """Only timestamps, e.g. "2:35" or "1:02:03 4:10"."""
+        tokens = re.split(r"[\s,;]+", text)
+        if all(_TIMESTAMP.match(token) for token in tokens):
+            return "neutral", "timestamp", 0.95
+        return None
+
+    def _rule_emoji(self, text: str):
+        """Only emoji; labelled by the share of the dominant polarity."""
+        emoji = [ch for ch in text if not ch.isspace() and ch not in _EMOJI_MODIFIERS]
+        if not emoji or not all(unicodedata.category(ch) == "So" for ch in emoji):
+            return None
+        positive = sum(ch in POSITIVE_EMOJI for ch in emoji)
+        negative = sum(ch in NEGATIVE_EMOJI for ch in emoji)
+        if not positive and not negative:
+            return "neutral", "emoji reaction", self.UNKNOWN_EMOJI_CONFIDENCE
+        if positive >= negative:
+            return "positive", "emoji reaction", positive / len(emoji)
+        return "negative", "emoji reaction", negative / len(emoji)
+
+    def _rule_lexicon(self, text: str):
+        """Up to `max_words` words, all from the lexicon and with the same label."""
+        words = [w for w in re.split(r"[^\w]+", text.lower()) if w]
+        if not words or len(words) > self.max_words:
+            return None
+        labels = {_lookup_word(w) for w in words}
+        if None in labels or len(labels) != 1:
+            return None
+        sentiment, theme = labels.pop()
+        return sentiment, theme, self.LEXICON_CONFIDENCE
+
+
+def _theme_label(theme: str, language: str | None) -> str:
+    """`theme` in `language` (default English); empty if there is no translation."""
+    language = language or "en"
+    if language not in LANGUAGE_NAMES:
+        return ""
+    return t(language, "theme_" + theme.replace(" ", "_"))
+
+
+def _lookup_word(word: str) -> tuple[str, str] | None:
+    """Lexicon lookup tolerant to stretched words ("niiiice", "coooool")."""
+    for candidate in (word, _REPEATED_CHARS.sub(r"\1\1", word), _REPEATED_CHARS.sub(r"\1", word)):
+        if candidate in WORD_LEXICON:
+            return WORD_LEXICON[candidate]
+    return None
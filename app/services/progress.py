@@ -0,0 +1,117 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, AsyncIterator
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    """One pipeline event, e.g. ("page", {"page": 2, "comments": 100})."""
+    name: str
+    data: dict[str, Any]
+
+
+class AnalysisProgress:
+    """
+    Live state of one analysis and the events that change it.
+
+    The services report through it as they work: YouTubeService per fetched
+    page, the pipeline per fetched comment and once the video info is
+    resolved, CommentAnalyzer per classified batch and for the summary
+    (streamed as "summary_delta" events while anyone is subscribed).
+    Every `events()` iterator gets a snapshot of the counters first, then
+    each event as it happens, and ends with the final event.
+    An analysis shared by several requests reports into one progress, which
+    `attach()`es the progress of each request so they all follow along.
+    """
+
+    def __init__(self):
+        self.fetched = 0
+        self.classified = 0
+        self.pages = 0
+        self.video_info: dict[str, Any] | None = None
+        self.final: ProgressEvent | None = None
+        self._subscribers: set[asyncio.Queue] = set()
+        self._attached: list["AnalysisProgress"] = []
+
+    def attach(self, other: "AnalysisProgress") -> None:
+        """Bring `other` up to date and report every later change to it as well."""
+        other.add_fetched(max(0, self.fetched - other.fetched))
+        other.add_classified(max(0, self.classified - other.classified))
+        other.pages = max(other.pages, self.pages)
+        if self.video_info is not None and other.video_info is None:
+            other.video_info_resolved(self.video_info)
+        self._attached.append(other)
+
+    def add_fetched(self, n: int = 1) -> None:
+        self.fetched += n
+        for other in self._attached:
+            other.add_fetched(n)
+
+    def add_classified(self, n: int = 1) -> None:
+        if n:
+            self.classified += n
+            self.emit("classified", classified=self.classified, fetched=self.fetched)
+            for other in self._attached:
+                other.add_classified(n)
+
+    def page_fetched(self, comments: int) -> None:
+        self.pages += 1
+        self.emit("page", page=self.pages, comments=comments)
+        for other in self._attached:
+            other.page_fetched(comments)
+
+    def summary_delta(self, text: str) -> None:
+        self.emit("summary_delta", text=text)
+        for other in self._attached:
+            other.summary_delta(text)
+
+    def summary_ready(self, text: str, *, local: bool) -> None:
+        self.emit("summary", text=text, local=local)
+        for other in self._attached:
+            other.summary_ready(text, local=local)
+
+    @property
+    def listening(self) -> bool:
+        """Whether anyone is subscribed to the events, here or in an attached progress."""
+        return bool(self._subscribers) or any(other.listening for other in self._attached)
+
+    def video_info_resolved(self, video_info: dict[str, Any]) -> None:
+        self.video_info = video_info
+        self.emit("video_info", **video_info)
+        for other in self._attached:
+            other.video_info_resolved(video_info)
+
+    def emit(self, name: str, **data: Any) -> None:
+        event = ProgressEvent(name, data)
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+    def finish(self, name: str, **data: Any) -> None:
+        """Emit the final event (result or error) and end every subscription."""
+        self.emit(name, **data)
+        self.final = ProgressEvent(name, data)
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+
+    def snapshot(self) -> ProgressEvent:
+        return ProgressEvent("progress", {
+            "fetched": self.fetched,
+            "classified": self.classified,
+            "pages": self.pages,
+            "video_info": self.video_info,
+        })
+
+    async def events(self) -> AsyncIterator[ProgressEvent]:
+        if self.final is not None:
+            yield self.snapshot()
+            yield self.final
+            return
+        # Subscribe before the snapshot so nothing emitted in between is lost
+        queue: asyncio.Queue[ProgressEvent | None] = asyncio.Queue()
+        self._subscribers.add(queue)
+        try:
+            yield self.snapshot()
+            while (event := await queue.get()) is not None:
+                yield event
+        finally:
+            self._subscribers.discard(queue)
@@ -0,0 +1,141 @@
+import math
+import random
+from collections import Counter, defaultdict
+from statistics import NormalDist
+from typing import Callable, Generic, Hashable, Iterable, Mapping, Sequence, TypeVar
+
+from app.modals.video import Comment
+
+T = TypeVar("T")
+
+
+def like_stratum(comment: Comment) -> int:
+    """Order-of-magnitude like bucket: 0 likes, 1-9, 10-99, 100-999, ..."""
+    return 0 if comment.like_count <= 0 else 1 + int(math.log10(comment.like_count))
+
+
+def stratified_order(comments: Sequence[Comment], *, rng: random.Random | None = None) -> list[Comment]:
+    """
+    Random order of `comments` in which every prefix is (close to) a
+    proportional stratified sample by like bucket: comments are shuffled
+    within their stratum and the strata are interleaved evenly.
+    """
+    rng = rng or random.Random()
+    strata: defaultdict[int, list[Comment]] = defaultdict(list)
+    for c in comments:
+        strata[like_stratum(c)].append(c)
+
+    keyed: list[tuple[float, Comment]] = []
+    for members in strata.values():
+        rng.shuffle(members)
+        offset = rng.random()
+        keyed.extend(((i + offset) / len(members), c) for i, c in enumerate(members))
+    keyed.sort(key=lambda item: item[0])
+    return [c for _, c in keyed]
+
+
+def z_score(confidence: float) -> float:
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def wilson_interval(
+    successes: int,
+    n: int,
+    *,
+    z: float,
+    population: int | None = None,
+) -> tuple[float, float]:
+    """
+    Wilson score interval for a proportion. With a finite `population`
+    the width is scaled by the finite population correction, so it
+    collapses to the point estimate once everything has been sampled.
+    """
+    if n <= 0:
+        return 0.0, 1.0
+    if population is not None and population > 1:
+        z *= math.sqrt(max(0.0, (population - n) / (population - 1)))
+    p = successes / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+def share_intervals(
+    counts: Mapping[str, int],
+    *,
+    confidence: float,
+    population: int | None = None,
+) -> dict[str, tuple[float, float]]:
+    """Wilson interval of every category's share of `counts`."""
+    n = sum(counts.values())
+    z = z_score(confidence)
+    return {
+        category: wilson_interval(count, n, z=z, population=population)
+        for category, count in counts.items()
+    }
+
+
+def max_half_width(intervals: Mapping[str, tuple[float, float]]) -> float:
+    return max(((high - low) / 2 for low, high in intervals.values()), default=1.0)
+
+
+class ReservoirSampler(Generic[T]):
+    """
+    Uniform random sample of at most `k` items from a stream of unknown
+    length, in O(k) memory (Algorithm R).
+
+    With `stratify`, one reservoir is kept per stratum and `sample()`
+    allocates the `k` slots proportionally to how many items of each
+    stratum were seen (largest remainder), so rare strata such as highly
+    liked comments are represented by their true share.
+    """
+
+    def __init__(
+        self,
+        k: int,
+        *,
+        stratify: Callable[[T], Hashable] | None = None,
+        rng: random.Random | None = None,
+    ):
+        self.k = k
+        self.stratify = stratify
+        self.rng = rng or random.Random()
+        self.seen = 0
+        self._reservoirs: defaultdict[Hashable, list[T]] = defaultdict(list)
+        self._seen_per_stratum: Counter = Counter()
+
+    def add(self, item: T) -> None:
+        self.seen += 1
+        stratum = self.stratify(item) if self.stratify else None
+        self._seen_per_stratum[stratum] += 1
+        reservoir = self._reservoirs[stratum]
+        if len(reservoir) < self.k:
+            reservoir.append(item)
+            return
+        j = self.rng.randrange(self._seen_per_stratum[stratum])
+        if j < self.k:
+            reservoir[j] = item
+
+    def extend(self, items: Iterable[T]) -> None:
+        for item in items:
+            self.add(item)
+
+    def sample(self) -> list[T]:
+        """The current sample, in random order."""
+        if self.seen <= self.k:
+            picked = [item for reservoir in self._reservoirs.values() for item in reservoir]
+        else:
+            picked = []
+            for stratum, slots in self._allocate().items():
+                picked.extend(self.rng.sample(self._reservoirs[stratum], slots))
+        self.rng.shuffle(picked)
+        return picked
+
+    def _allocate(self) -> dict[Hashable, int]:
+        quotas = {s: self.k * n / self.seen for s, n in self._seen_per_stratum.items()}
+        slots = {s: int(q) for s, q in quotas.items()}
+        by_remainder = sorted(quotas, key=lambda s: quotas[s] - slots[s], reverse=True)
+        for s in by_remainder[: self.k - sum(slots.values())]:
+            slots[s] += 1
+        return slots
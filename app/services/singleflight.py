@@ -0,0 +1,91 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Future
+    context: Any = None
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one in-flight task.
+
+    The first caller (the leader) starts the work; callers arriving while it
+    runs (followers) await the same task. Its result or error is delivered to
+    every waiter, and the key is forgotten as soon as the task finishes, so
+    the next call after a failure starts a fresh attempt. One waiter being
+    cancelled doesn't affect the others, but once every waiter is gone (e.g.
+    all their clients disconnected) the work is cancelled too.
+
+    The leader can publish a `context` with its work (e.g. the progress it
+    reports into); each follower is handed it through `on_join`.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.abandoned = 0
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        context: Any = None,
+        on_join: Callable[[Any], None] | None = None,
+    ) -> T:
+        flight = self._inflight.get(key)
+        if flight is None:
+            self.leaders += 1
+            flight = _Flight(asyncio.ensure_future(fn()), context)
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda done: self._forget(key, flight))
+        else:
+            self.followers += 1
+            if on_join is not None:
+                on_join(flight.context)
+        flight.waiters += 1
+        try:
+            # Shielded so one waiter going away does not cancel the work for the others
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is left to get the result; new callers start afresh
+                self.abandoned += 1
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "abandoned": self.abandoned,
+        }
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+
+# Singleton instance
+_single_flight: SingleFlight | None = None
+
+
+def get_single_flight() -> SingleFlight:
+    """Get or create the analysis single-flight singleton."""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
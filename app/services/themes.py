@@ -0,0 +1,121 @@
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable
+
+_WORD = re.compile(r"\w+")
+
+STOPWORDS = {
+    "a", "an", "the", "of", "and", "or", "for", "to", "in", "on", "with", "about",
+    "this", "that", "is", "are", "be", "it", "its", "video", "videos",
+    "и", "в", "во", "на", "с", "со", "о", "об", "про", "это", "для", "по", "к", "видео",
+}
+
+# (suffix, replacement, minimal word length) - crude lemma folding, first match wins
+_SUFFIXES = [
+    ("ies", "y", 5), ("sses", "ss", 5), ("ches", "ch", 5), ("shes", "sh", 5), ("xes", "x", 4),
+    ("ing", "", 6), ("ed", "", 5), ("s", "", 4),
+    ("ами", "", 6), ("ями", "", 6), ("ов", "", 5), ("ев", "", 5), ("ах", "", 5), ("ях", "", 5),
+    ("ой", "", 5), ("ей", "", 5), ("ы", "", 4), ("и", "", 4), ("а", "", 4), ("я", "", 4),
+    ("у", "", 4), ("ю", "", 4), ("е", "", 4),
+]
+
+
+def _fold(word: str) -> str:
+    for suffix, replacement, min_length in _SUFFIXES:
+        if len(word) >= min_length and word.endswith(suffix) and not word.endswith("ss"):
+            return word[: -len(suffix)] + replacement
+    return word
+
+
+def theme_tokens(theme: str) -> frozenset[str]:
+    """Case- and inflection-folded content words of a theme label."""
+    words = [w for w in _WORD.findall(theme.lower()) if w not in STOPWORDS]
+    return frozenset(_fold(w) for w in words)
+
+
+@dataclass
+class ThemeCluster:
+    """Aggregate of all comments whose themes fold into one cluster."""
+    tokens: frozenset[str]
+    comments: int = 0
+    likes: int = 0
+    sentiments: Counter = field(default_factory=Counter)
+    labels: Counter = field(default_factory=Counter)
+
+    @property
+    def label(self) -> str:
+        """The most frequent original spelling of the theme."""
+        return self.labels.most_common(1)[0][0]
+
+    def add(self, other: "ThemeCluster") -> None:
+        self.comments += other.comments
+        self.likes += other.likes
+        self.sentiments.update(other.sentiments)
+        self.labels.update(other.labels)
+
+
+def cluster_themes(
+    entries: Iterable[tuple[str, int, str]],
+    *,
+    similarity: float = 0.5,
+) -> list[ThemeCluster]:
+    """
+    Group (main_theme, like_count, sentiment) entries into theme clusters.
+
+    Themes with the same folded token set are merged first. The resulting
+    groups are then visited from most to least frequent and each joins the
+    first cluster whose seed token set has a Jaccard similarity of at least
+    `similarity`, otherwise it seeds a new cluster. Clusters are returned
+    ranked by comment count, then likes.
+    """
+    groups: dict[frozenset[str], ThemeCluster] = {}
+    for theme, likes, sentiment in entries:
+        tokens = theme_tokens(theme) or frozenset([theme.strip().lower()])
+        group = groups.get(tokens)
+        if group is None:
+            group = groups[tokens] = ThemeCluster(tokens=tokens)
+        group.comments += 1
+        group.likes += likes
+        group.sentiments[sentiment] += 1
+        group.labels[theme.strip()] += 1
+
+    clusters: list[ThemeCluster] = []
+    by_token: defaultdict[str, list[int]] = defaultdict(list)
+    for group in sorted(groups.values(), key=lambda g: (-g.comments, -g.likes)):
+        candidates = sorted({i for token in group.tokens for i in by_token[token]})
+        for i in candidates:
+            seed = clusters[i].tokens
+            if len(group.tokens & seed) / len(group.tokens | seed) >= similarity:
+                clusters[i].add(group)
+                break
+        else:
+            for token in group.tokens:
+                by_token[token].append(len(clusters))
+            clusters.append(group)
+
+    return sorted(clusters, key=lambda c: (-c.comments, -c.likes))
+
+
+def theme_table(clusters: list[ThemeCluster], *, max_themes: int) -> list[dict]:
+    """
+    Compact, ranked rows for the topic-analysis prompt: the `max_themes`
+    largest clusters plus one row aggregating the rest.
+    """
+    rows = [_row(c.label, c) for c in clusters[:max_themes]]
+    rest = clusters[max_themes:]
+    if rest:
+        other = ThemeCluster(tokens=frozenset())
+        for c in rest:
+            other.add(c)
+        rows.append(_row(f"other ({len(rest)} themes)", other))
+    return rows
+
+
+def _row(theme: str, cluster: ThemeCluster) -> dict:
+    return {
+        "theme": theme,
+        "comments": cluster.comments,
+        "likes": cluster.likes,
+        "sentiment": dict(cluster.sentiments.most_common()),
+    }
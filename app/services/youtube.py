@@ -1,128 +1,391 @@
+import asyncio
+import logging
 import re
 import random
-from typing import Literal
+from typing import Any, AsyncIterator, Literal
 from dataclasses import dataclass
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+
+import httpx
 
 from config import get_settings
 from app.modals.video import Comment, VideoInfo
+from app.services.concurrency import discard_future, gather_fail_fast
+from app.services.progress import AnalysisProgress
+from app.services.sampling import ReservoirSampler, like_stratum
+
+
 
+class YouTubeAPIError(Exception):
+    """Raised when the YouTube Data API answers with an error status."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
 
 
 class YouTubeService:
     """Service for interacting with YouTube Data API."""
-    
+
     # Patterns to extract video ID from various YouTube URL formats
     VIDEO_ID_PATTERNS = [
         r'(?:youtube\.com/watch\?v=|youtu\.be/|youtube\.com/embed/|youtube\.com/v/)([a-zA-Z0-9_-]{11})',
         r'^([a-zA-Z0-9_-]{11})$'  # Direct video ID
     ]
-    
+
+    API_BASE_URL = "https://www.googleapis.com/youtube/v3"
+
+    # Connection pool shared by every request of this process (keep-alive)
+    MAX_CONNECTIONS = 20
+    MAX_KEEPALIVE_CONNECTIONS = 10
+    KEEPALIVE_EXPIRY_S = 30.0
+
+    # commentThreads().list accepts at most 100 results per page
+    COMMENT_PAGE_SIZE = 100
+
+    # Partial responses: only ask the API for the fields we actually read
+    VIDEO_FIELDS = "items(snippet(title,channelTitle),statistics(commentCount))"
+    COMMENT_THREAD_FIELDS = (
+        "nextPageToken,"
+        "items(id,snippet(totalReplyCount,"
+        "topLevelComment/snippet(textDisplay,likeCount,authorDisplayName)))"
+    )
+    REPLY_FIELDS = "nextPageToken,items(id,snippet(textDisplay,likeCount,authorDisplayName))"
+
+    # comments().list accepts at most 100 results per page
+    REPLY_PAGE_SIZE = 100
+
     def __init__(self):
         settings = get_settings()
-        self.youtube = build('youtube', 'v3', developerKey=settings.youtube_api_key)
+        self.api_key = settings.youtube_api_key
         self.max_comments = settings.max_comments
-    
+        self.sample_max_pages = settings.sample_max_pages
+        self.reply_threads = settings.reply_threads
+        self.reply_budget = settings.reply_budget
+        self.reply_fetch_concurrency = settings.reply_fetch_concurrency
+        self.http_client = httpx.AsyncClient(
+            base_url=self.API_BASE_URL,
+            timeout=settings.http_timeout_s,
+            limits=httpx.Limits(
+                max_connections=self.MAX_CONNECTIONS,
+                max_keepalive_connections=self.MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=self.KEEPALIVE_EXPIRY_S,
+            ),
+            # Google APIs only compress responses when the user agent mentions gzip
+            headers={"Accept-Encoding": "gzip", "User-Agent": "yt-stat (gzip)"},
+        )
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP client."""
+        await self.http_client.aclose()
+
     def extract_video_id(self, url_or_id: str) -> str | None:
         """Extract video ID from a YouTube URL or return the ID if already valid."""
         url_or_id = url_or_id.strip()
-        
+
         for pattern in self.VIDEO_ID_PATTERNS:
             match = re.search(pattern, url_or_id)
             if match:
                 return match.group(1)
-        
+
         return None
-    
-    def get_video_info(self, video_id: str) -> VideoInfo | None:
-        """Fetch basic video information."""
+
+    async def _get(self, resource: str, **params: Any) -> dict:
+        """GET a YouTube Data API resource and return the decoded JSON body."""
+        response = await self.http_client.get(
+            f"/{resource}",
+            params={"key": self.api_key, **params},
+        )
+        if response.status_code >= 400:
+            try:
+                message = response.json()["error"]["message"]
+            except (ValueError, KeyError, TypeError):
+                message = response.text
+            raise YouTubeAPIError(response.status_code, message)
+        return response.json()
+
+    async def get_video_info(self, video_id: str) -> VideoInfo | None:
+        """Fetch basic video information and its comment count."""
         try:
-            response = self.youtube.videos().list(
-                part='snippet',
-                id=video_id
-            ).execute()
-            
+            response = await self._get(
+                'videos',
+                part='snippet,statistics',
+                id=video_id,
+                fields=self.VIDEO_FIELDS,
+            )
+
             if not response.get('items'):
                 return None
-            
-            snippet = response['items'][0]['snippet']
+
+            item = response['items'][0]
+            snippet = item['snippet']
+            comment_count = item.get('statistics', {}).get('commentCount')
             return VideoInfo(
                 video_id=video_id,
                 title=snippet.get('title', 'Unknown'),
-                channel=snippet.get('channelTitle', 'Unknown')
+                channel=snippet.get('channelTitle', 'Unknown'),
+                comment_count=int(comment_count) if comment_count is not None else None,
             )
-        except HttpError:
+        except YouTubeAPIError:
+            # Transport errors propagate: a timeout doesn't mean the video is missing
             return None
-    
-    def get_comments(self, 
+
+    async def _fetch_comment_page(
+        self,
+        video_id: str,
+        *,
+        order: Literal['time', 'relevance'],
+        page_size: int,
+        page_token: str | None = None,
+    ) -> tuple[list[Comment], str | None]:
+        """Fetch one commentThreads page. Returns the comments and the next page token."""
+        params = {}
+        if page_token:
+            params['pageToken'] = page_token
+        try:
+            response = await self._get(
+                'commentThreads',
+                part='snippet',
+                videoId=video_id,
+                order=order,
+                maxResults=page_size,
+                textFormat='plainText',
+                fields=self.COMMENT_THREAD_FIELDS,
+                **params,
+            )
+        except YouTubeAPIError as e:
+            if e.status_code == 403:
+                raise PermissionError("Comments are disabled for this video")
+            elif e.status_code == 404:
+                raise ValueError("Video not found")
+            raise
+
+        comments = []
+        for item in response.get('items', []):
+            snippet = item['snippet']['topLevelComment']['snippet']
+            comments.append(Comment(
+                text=snippet.get('textDisplay', ''),
+                like_count=snippet.get('likeCount', 0),
+                author=snippet.get('authorDisplayName', 'Anonymous'),
+                reply_count=item['snippet'].get('totalReplyCount', 0),
+                id=item.get('id'),
+            ))
+        return comments, response.get('nextPageToken')
+
+    async def iter_comment_pages(
+        self,
+        video_id: str,
+        limit: int | None = None,
+        order: Literal['time', 'relevance'] = 'relevance',
+        progress: AnalysisProgress | None = None,
+        page_size: int | None = None,
+    ) -> AsyncIterator[list[Comment]]:
+        """
+        Stream pages of up to `page_size` comments (default: COMMENT_PAGE_SIZE),
+        never yielding more than `limit` comments in total.
+        The next page is requested before the current one is handed to the caller,
+        so the network round trip overlaps with whatever the caller does with it.
+        Every fetched page is reported to `progress`.
+        """
+        remaining = self.max_comments if limit is None else limit
+        page_size = page_size or self.COMMENT_PAGE_SIZE
+        if remaining <= 0:
+            return
+
+        def fetch(page_token: str | None = None) -> asyncio.Future:
+            return asyncio.ensure_future(self._fetch_comment_page(
+                video_id,
+                order=order,
+                page_size=min(remaining, page_size),
+                page_token=page_token,
+            ))
+
+        next_page: asyncio.Future | None = fetch()
+        try:
+            while next_page is not None:
+                comments, page_token = await next_page
+                next_page = None
+                comments = comments[:remaining]
+                remaining -= len(comments)
+                if page_token and remaining > 0:
+                    next_page = fetch(page_token)
+                if progress is not None:
+                    progress.page_fetched(len(comments))
+                if comments:
+                    yield comments
+        finally:
+            if next_page is not None:
+                discard_future(next_page)
+
+    async def iter_comments(
+        self,
+        video_id: str,
+        limit: int | None = None,
+        order: Literal['time', 'relevance'] = 'relevance',
+    ) -> AsyncIterator[Comment]:
+        """Stream comments one by one (see `iter_comment_pages`)."""
+        pages = self.iter_comment_pages(video_id, limit=limit, order=order)
+        try:
+            async for page in pages:
+                for comment in page:
+                    yield comment
+        finally:
+            await pages.aclose()
+
+    async def sample_comments(
+        self,
+        video_id: str,
+        k: int | None = None,
+        *,
+        order: Literal['time', 'relevance'] = 'time',
+        max_pages: int | None = None,
+        stratify: bool = True,
+        progress: AnalysisProgress | None = None,
+        page_size: int | None = None,
+    ) -> list[Comment]:
+        """
+        Random sample of `k` comments (default: max_comments), in random order.
+        Streams up to `max_pages` pages of `page_size` comments (default:
+        sample_max_pages from settings, COMMENT_PAGE_SIZE) through a reservoir, so memory stays O(k) however many comments are read.
+        With `stratify` the sample keeps the share of each like bucket.
+        """
+        k = self.max_comments if k is None else k
+        max_pages = self.sample_max_pages if max_pages is None else max_pages
+        page_size = page_size or self.COMMENT_PAGE_SIZE
+        sampler = ReservoirSampler(k, stratify=like_stratum if stratify else None)
+        pages = self.iter_comment_pages(
+            video_id, limit=max_pages * page_size, order=order, progress=progress, page_size=page_size
+        )
+        try:
+            async for page in pages:
+                sampler.extend(page)
+        finally:
+            await pages.aclose()
+        return sampler.sample()
+
+    async def _fetch_reply_page(
+        self,
+        parent_id: str,
+        *,
+        page_size: int,
+        page_token: str | None = None,
+    ) -> tuple[list[Comment], str | None]:
+        """Fetch one comments().list page of replies. Returns the replies and the next page token."""
+        params = {}
+        if page_token:
+            params['pageToken'] = page_token
+        response = await self._get(
+            'comments',
+            part='snippet',
+            parentId=parent_id,
+            maxResults=page_size,
+            textFormat='plainText',
+            fields=self.REPLY_FIELDS,
+            **params,
+        )
+        replies = []
+        for item in response.get('items', []):
+            snippet = item['snippet']
+            replies.append(Comment(
+                text=snippet.get('textDisplay', ''),
+                like_count=snippet.get('likeCount', 0),
+                author=snippet.get('authorDisplayName', 'Anonymous'),
+                id=item.get('id'),
+                parent_id=parent_id,
+            ))
+        return replies, response.get('nextPageToken')
+
+    async def fetch_replies(self, parent: Comment, limit: int) -> list[Comment]:
+        """
+        Fetch up to `limit` replies of a thread, page by page. A failing thread
+        only loses its replies: the replies fetched so far are returned.
+        """
+        replies: list[Comment] = []
+        page_token = None
+        try:
+            while len(replies) < limit:
+                page, page_token = await self._fetch_reply_page(
+                    parent.id,
+                    page_size=min(limit - len(replies), self.REPLY_PAGE_SIZE),
+                    page_token=page_token,
+                )
+                replies.extend(page[:limit - len(replies)])
+                if not page or not page_token:
+                    break
+        except (YouTubeAPIError, httpx.HTTPError) as e:
+            logging.getLogger(__name__).warning("Fetching replies of %s failed: %s", parent.id, e)
+        return replies
+
+    async def expand_replies(
+        self,
+        comments: list[Comment],
+        *,
+        threads: int | None = None,
+        budget: int | None = None,
+        concurrency: int | None = None,
+    ) -> list[Comment]:
+        """
+        Fetch the replies of the `threads` most replied-to comments (default:
+        reply_threads from settings), `concurrency` threads at a time.
+
+        At most `budget` replies are fetched in total, split max-min fairly
+        between the threads, so a single huge thread can't use up the quota.
+        Replies are attached to their parent's `replies` and returned flat,
+        most replied-to thread first.
+        """
+        threads = self.reply_threads if threads is None else threads
+        budget = self.reply_budget if budget is None else budget
+        concurrency = self.reply_fetch_concurrency if concurrency is None else concurrency
+        parents = sorted(
+            (c for c in comments if c.id and c.reply_count > 0),
+            key=lambda c: c.reply_count,
+            reverse=True,
+        )[:threads]
+        shares = _fair_shares([c.reply_count for c in parents], budget)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def expand(parent: Comment, limit: int) -> list[Comment]:
+            async with semaphore:
+                parent.replies = await self.fetch_replies(parent, limit)
+            return parent.replies
+
+        work = [expand(parent, limit) for parent, limit in zip(parents, shares) if limit > 0]
+        if not work:
+            return []
+        fetched = await gather_fail_fast(*work)
+        return [reply for replies in fetched for reply in replies]
+
+    async def get_comments(self,
                     video_id: str,
                     comment_chunk_size: int = None,
                     order: Literal['time', 'relevance'] = 'relevance',
-                    # mode: Literal['random', 'top'] = 'random'
+                    mode: Literal['random', 'top'] = 'top',
                     ) -> list[Comment]:
         """
         Fetch top comments for a video sorted by relevance or time.
         pram video_id: YouTube video ID
         param comment_chunk_size: Number of comments to fetch (default: max_comments from settings)
         param order: Order of comments, either 'time' or 'relevance' (default: 'relevance')
+        param mode: 'top' - the first comments in `order`; 'random' - a stratified
+            random sample of them (see `sample_comments`)
         """
-        comments = []
-        if comment_chunk_size is None:
-            comment_chunk_size = self.max_comments
-        try:
-            # Fetch top-level comments sorted by relevance
-            response = self.youtube.commentThreads().list(
-                part='snippet',
-                videoId=video_id,
-                order=order,
-                maxResults=comment_chunk_size,
-                textFormat='plainText'
-            ).execute()
-            
-            for item in response.get('items', []):
-                snippet = item['snippet']['topLevelComment']['snippet']
-                comments.append(Comment(
-                    text=snippet.get('textDisplay', ''),
-                    like_count=snippet.get('likeCount', 0),
-                    author=snippet.get('authorDisplayName', 'Anonymous'),
-                    reply_count=item['snippet'].get('totalReplyCount', 0)
-                ))
-            
-            # Fetch more if needed and available
-            # Commenred out for now to limit to single chunk for beta launch
-            # next_page_token = response.get('nextPageToken')
-            # while next_page_token and len(comments) < self.max_comments:
-            #     response = self.youtube.commentThreads().list(
-            #         part='snippet',
-            #         videoId=video_id,
-            #         order='relevance',
-            #         maxResults=min(self.max_comments - len(comments), 100),
-            #         pageToken=next_page_token,
-            #         textFormat='plainText'
-            #     ).execute()
-                
-            #     for item in response.get('items', []):
-            #         snippet = item['snippet']['topLevelComment']['snippet']
-            #         comments.append(Comment(
-            #             text=snippet.get('textDisplay', ''),
-            #             like_count=snippet.get('likeCount', 0),
-            #             author=snippet.get('authorDisplayName', 'Anonymous'),
-            #             reply_count=item['snippet'].get('totalReplyCount', 0)
-            #         ))
-                
-            #     next_page_token = response.get('nextPageToken')
-        
-        except HttpError as e:
-            if e.resp.status == 403:
-                raise PermissionError("Comments are disabled for this video")
-            elif e.resp.status == 404:
-                raise ValueError("Video not found")
-            raise
-        
-        return comments
+        if mode == 'random':
+            return await self.sample_comments(video_id, comment_chunk_size, order=order)
+        return [
+            comment
+            async for comment in self.iter_comments(video_id, limit=comment_chunk_size, order=order)
+        ]
 
 
+def _fair_shares(demands: list[int], budget: int) -> list[int]:
+    """Max-min fair split of `budget`: smaller demands are met in full, the rest share equally."""
+    shares = [0] * len(demands)
+    remaining = max(0, budget)
+    by_demand = sorted(range(len(demands)), key=lambda i: demands[i])
+    for position, i in enumerate(by_demand):
+        shares[i] = min(demands[i], remaining // (len(demands) - position))
+        remaining -= shares[i]
+    return shares
+
 
 # Singleton instance
 _youtube_service: YouTubeService | None = None
@@ -134,3 +397,11 @@ def get_youtube_service() -> YouTubeService:
     if _youtube_service is None:
         _youtube_service = YouTubeService()
     return _youtube_service
+
+
+async def close_youtube_service() -> None:
+    """Close the YouTube service singleton's HTTP client, if it was created."""
+    global _youtube_service
+    if _youtube_service is not None:
+        await _youtube_service.aclose()
+        _youtube_service = None
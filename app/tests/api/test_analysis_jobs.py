@@ -0,0 +1,112 @@
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from app.modals.video import Comment, VideoInfo
+from app.routers.analyze.jobs import app
+from app.services.analyzer import CommentAnalyzer
+from app.tests.helpers.mock_library import OpenAIMock, YouTubeMock
+
+
+VIDEO_ID = "dQw4w9WgXcQ"
+
+
+def install_mocks(monkeypatch, youtube_mock: YouTubeMock, openai_mock: OpenAIMock) -> None:
+    analyzer = CommentAnalyzer()
+    analyzer.openai_client.responses.create = openai_mock.create
+    monkeypatch.setattr("app.routers.analyze.jobs.get_youtube_service", lambda: youtube_mock)
+    monkeypatch.setattr("app.routers.analyze.jobs.get_analyzer", lambda: analyzer)
+
+
+def wait_for_job(client: TestClient, location: str, timeout_s: float = 5.0) -> dict:
+    started = time.monotonic()
+    while time.monotonic() - started < timeout_s:
+        body = client.get(location).json()
+        if body["status"] in ("succeeded", "failed"):
+            return body
+        time.sleep(0.02)
+    raise AssertionError("job did not finish")
+
+
+def test_job_is_accepted_at_once_and_polled_to_completion(monkeypatch):
+    youtube_mock = YouTubeMock(latency=0.2)
+    youtube_mock.register_video(
+        VIDEO_ID,
+        comments=[Comment(text=f"comment {i}", like_count=i, author=f"U{i}") for i in range(5)],
+        video_info=VideoInfo(video_id=VIDEO_ID, title="Test Video", channel="Test Channel"),
+    )
+    openai_mock = OpenAIMock(default_output='{"sentiment":"neutral","main_theme":"general"}')
+    install_mocks(monkeypatch, youtube_mock, openai_mock)
+
+    # The context manager keeps one event loop running between requests
+    with TestClient(app) as client:
+        response = client.post("/analyze/jobs", json={"video_url": VIDEO_ID})
+        assert response.status_code == 202
+        assert response.json()["status"] in ("pending", "running")
+        location = response.headers["location"]
+        assert location == f"/analyze/jobs/{response.json()['job_id']}"
+
+        body = wait_for_job(client, location)
+
+    assert body["status"] == "succeeded"
+    assert body["progress"] == {"fetched": 5, "classified": 5}
+    assert body["result"]["comments_count"] == 5
+    assert body["result"]["video_info"]["title"] == "Test Video"
+
+
+def test_failed_job_reports_the_analysis_error(monkeypatch):
+    youtube_mock = YouTubeMock()
+    youtube_mock.register_error(VIDEO_ID, PermissionError("Comments are disabled for this video"))
+    install_mocks(monkeypatch, youtube_mock, OpenAIMock())
+
+    with TestClient(app) as client:
+        response = client.post("/analyze/jobs", json={"video_url": VIDEO_ID})
+        body = wait_for_job(client, response.headers["location"])
+
+    assert body["status"] == "failed"
+    assert body["error_status"] == 403
+    assert body["error"] == "Comments are disabled for this video"
+
+
+def test_unknown_job_is_404():
+    with TestClient(app) as client:
+        assert client.get("/analyze/jobs/missing").status_code == 404
+
+
+def parse_sse(lines) -> list[tuple[str, dict]]:
+    events, name = [], None
+    for line in lines:
+        if line.startswith("event: "):
+            name = line[len("event: "):]
+        elif line.startswith("data: "):
+            events.append((name, json.loads(line[len("data: "):])))
+    return events
+
+
+def test_job_events_are_streamed_as_server_sent_events(monkeypatch):
+    youtube_mock = YouTubeMock(latency=0.2, max_comments=4)
+    youtube_mock.COMMENT_PAGE_SIZE = 2
+    youtube_mock.register_video(
+        VIDEO_ID,
+        comments=[Comment(text=f"comment {i}", like_count=i, author=f"U{i}") for i in range(4)],
+        video_info=VideoInfo(video_id=VIDEO_ID, title="Test Video", channel="Test Channel"),
+    )
+    openai_mock = OpenAIMock(default_output='{"sentiment":"neutral","main_theme":"general"}')
+    install_mocks(monkeypatch, youtube_mock, openai_mock)
+
+    with TestClient(app) as client:
+        job_id = client.post("/analyze/jobs", json={"video_url": VIDEO_ID}).json()["job_id"]
+        with client.stream("GET", f"/analyze/jobs/{job_id}/events") as response:
+            assert response.headers["content-type"].startswith("text/event-stream")
+            events = parse_sse(response.iter_lines())
+
+    names = [name for name, _ in events]
+    assert names[0] == "progress"
+    assert names[-1] == "result"
+    assert {"video_info", "page", "classified", "summary"} <= set(names)
+    assert [data["page"] for name, data in events if name == "page"] == [1, 2]
+    assert events[-1][1]["comments_count"] == 4
+    # The summary was streamed to the subscriber before the final event
+    summary = next(data["text"] for name, data in events if name == "summary")
+    assert "".join(data["text"] for name, data in events if name == "summary_delta") == summary
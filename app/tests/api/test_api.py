@@ -11,4 +11,10 @@ async def test_get_health_not_initialized():
     assert response.status_code == 200
     assert response.json() ==  {
         "status": "ok"
-    }
\ No newline at end of file
+    }
+
+def test_metrics_exposes_limiter_saturation():
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    limiter = response.json()["openai_limiter"]
+    assert {"limit", "in_flight", "queued", "avg_wait_s", "max_wait_s"} <= limiter.keys()
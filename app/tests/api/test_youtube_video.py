@@ -1,3 +1,5 @@
+import time
+
 from fastapi.testclient import TestClient
 import pytest
 
@@ -88,9 +90,8 @@ async def test_get_analyzis_for_comments(monkeypatch):
     assert len(youtube_mock.calls) == 3
     assert youtube_mock.calls[0].method == "extract_video_id"
     assert test_video_id in youtube_mock.calls[0].args[0]
-    assert youtube_mock.calls[1].method == "get_comments"
-    assert youtube_mock.calls[2].method == "get_video_info"
-    assert youtube_mock.calls[1].args[0] == test_video_id
+    assert {c.method for c in youtube_mock.calls[1:]} == {"fetch_comment_page", "get_video_info"}
+    assert all(c.args[0] == test_video_id for c in youtube_mock.calls[1:])
 
 
 @pytest.mark.asyncio
@@ -139,8 +140,8 @@ async def test_comments_disabled(monkeypatch):
 
     # Verify the methods were called
     assert len(youtube_mock.calls) >= 1
-    get_comments_calls = [c for c in youtube_mock.calls if c.method == "get_comments"]
-    assert len(get_comments_calls) == 1
+    comment_page_calls = [c for c in youtube_mock.calls if c.method == "fetch_comment_page"]
+    assert len(comment_page_calls) == 1
 
 
 @pytest.mark.asyncio
@@ -168,8 +169,8 @@ async def test_video_not_found(monkeypatch):
 
     # Verify the methods were called
     assert len(youtube_mock.calls) >= 1
-    get_comments_calls = [c for c in youtube_mock.calls if c.method == "get_comments"]
-    assert len(get_comments_calls) == 1
+    comment_page_calls = [c for c in youtube_mock.calls if c.method == "fetch_comment_page"]
+    assert len(comment_page_calls) == 1
 
 
 @pytest.mark.asyncio
@@ -203,7 +204,117 @@ async def test_empty_comments_list(monkeypatch):
     assert response.status_code == 400
     assert response.json().get("detail") == "No comments to analyze"
 
-    # Verify YouTube service was called correctly
-    assert len(youtube_mock.calls) == 2
+    # Verify YouTube service was called correctly (both lookups start concurrently)
+    assert len(youtube_mock.calls) == 3
     assert youtube_mock.calls[0].method == "extract_video_id"
-    assert youtube_mock.calls[1].method == "get_comments" 
+    assert {c.method for c in youtube_mock.calls[1:]} == {"fetch_comment_page", "get_video_info"}
+
+
+@pytest.mark.asyncio
+async def test_retry_with_idempotency_key_replays_the_analysis(monkeypatch):
+    """A retry with the same Idempotency-Key gets the first outcome; another body is refused."""
+    youtube_mock = YouTubeMock()
+    test_video_id = "idempotentVid"
+    youtube_mock.register_video(
+        test_video_id,
+        comments=[Comment(text="Great video!", like_count=1, author="User1")],
+        video_info=VideoInfo(video_id=test_video_id, title="Test Video", channel="Test Channel"),
+    )
+    openai_mock = OpenAIMock(default_output='{"sentiment":"positive","main_theme":"praise"}')
+
+    from app.services.analyzer import CommentAnalyzer
+
+    analyzer = CommentAnalyzer()
+    analyzer.openai_client.responses.create = openai_mock.create
+    monkeypatch.setattr("app.routers.analyze.youtube_video.get_youtube_service", lambda: youtube_mock)
+    monkeypatch.setattr("app.routers.analyze.youtube_video.get_analyzer", lambda: analyzer)
+
+    body = {"video_url": f"https://www.youtube.com/watch?v={test_video_id}", "language": "en"}
+    headers = {"Idempotency-Key": "tg-1-1"}
+    first = client.post("/analyze/youtube/comments", json=body, headers=headers)
+    retry = client.post("/analyze/youtube/comments", json=body, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert sum(c.method == "get_video_info" for c in youtube_mock.calls) == 1
+
+    conflict = client.post(
+        "/analyze/youtube/comments", json={**body, "language": "ru"}, headers=headers
+    )
+    assert conflict.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_request_timeout_header_cancels_the_analysis(monkeypatch):
+    """The client's X-Request-Timeout runs out mid-analysis: the OpenAI calls are cancelled, not awaited."""
+    youtube_mock = YouTubeMock()
+    test_video_id = "clientTimeout"
+    youtube_mock.register_video(
+        test_video_id,
+        comments=[Comment(text=f"comment {i}", like_count=i, author=f"U{i}") for i in range(5)],
+        video_info=VideoInfo(video_id=test_video_id, title="Test Video", channel="Test Channel"),
+    )
+    openai_mock = OpenAIMock(default_output='{"sentiment":"positive","main_theme":"praise"}', latency=30)
+
+    from app.services.abort import get_abort_watcher
+    from app.services.analyzer import CommentAnalyzer
+
+    analyzer = CommentAnalyzer()
+    analyzer.openai_client.responses.create = openai_mock.create
+    monkeypatch.setattr("app.routers.analyze.youtube_video.get_youtube_service", lambda: youtube_mock)
+    monkeypatch.setattr("app.routers.analyze.youtube_video.get_analyzer", lambda: analyzer)
+    # Keep the analysis deadline (10 s) past the header's, so only the hard deadline can stop it
+    monkeypatch.setattr("app.routers.analyze.youtube_video.CLIENT_TIMEOUT_SHARE", 10)
+
+    started = time.monotonic()
+    response = client.post(
+        "/analyze/youtube/comments",
+        json={"video_url": f"https://www.youtube.com/watch?v={test_video_id}", "language": "en", "deadline_s": 10},
+        headers={"X-Request-Timeout": "1"},
+    )
+
+    assert response.status_code == 504
+    assert response.json()["detail"] == "Client deadline exceeded"
+    assert time.monotonic() - started < 5
+    assert get_abort_watcher().stats() == {"disconnected": 0, "deadline": 1}
+    assert analyzer.abort_stats["openai_calls"] == 5
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_the_analysis(monkeypatch):
+    """The client went away: the analysis is cancelled, OpenAI calls included, and logged as 499."""
+    youtube_mock = YouTubeMock()
+    test_video_id = "clientGone"
+    youtube_mock.register_video(
+        test_video_id,
+        comments=[Comment(text=f"comment {i}", like_count=i, author=f"U{i}") for i in range(5)],
+        video_info=VideoInfo(video_id=test_video_id, title="Test Video", channel="Test Channel"),
+    )
+    openai_mock = OpenAIMock(default_output='{"sentiment":"positive","main_theme":"praise"}', latency=30)
+
+    from app.services.abort import AbortWatcher, get_abort_watcher
+    from app.services.analyzer import CommentAnalyzer
+
+    analyzer = CommentAnalyzer()
+    analyzer.openai_client.responses.create = openai_mock.create
+    monkeypatch.setattr("app.routers.analyze.youtube_video.get_youtube_service", lambda: youtube_mock)
+    monkeypatch.setattr("app.routers.analyze.youtube_video.get_analyzer", lambda: analyzer)
+    monkeypatch.setattr("app.services.abort._abort_watcher", AbortWatcher(poll_s=0.2))
+
+    async def is_disconnected(self):
+        return True
+
+    monkeypatch.setattr("starlette.requests.Request.is_disconnected", is_disconnected)
+
+    started = time.monotonic()
+    response = client.post(
+        "/analyze/youtube/comments",
+        json={"video_url": f"https://www.youtube.com/watch?v={test_video_id}", "language": "en"},
+    )
+
+    assert response.status_code == 499
+    assert time.monotonic() - started < 5
+    assert get_abort_watcher().stats() == {"disconnected": 1, "deadline": 0}
+    assert analyzer.abort_stats["openai_calls"] == 5
@@ -15,4 +15,15 @@ def settings_env(monkeypatch):
     monkeypatch.setenv("JWT_SECRET", "test-jwt-secret")
     get_settings.cache_clear()
     yield
-    get_settings.cache_clear()
\ No newline at end of file
+    get_settings.cache_clear()
+
+@pytest.fixture(autouse=True)
+def reset_pipeline_state(monkeypatch):
+    """Each test starts with empty caches, no in-flight analyses or jobs and fresh OpenAI limiters."""
+    monkeypatch.setattr("app.services.cache._result_cache", None)
+    monkeypatch.setattr("app.services.singleflight._single_flight", None)
+    monkeypatch.setattr("app.services.jobs._job_store", None)
+    monkeypatch.setattr("app.services.idempotency._idempotency_store", None)
+    monkeypatch.setattr("app.services.abort._abort_watcher", None)
+    monkeypatch.setattr("app.services.limiter._openai_limiter", None)
+    monkeypatch.setattr("app.services.limiter._openai_rate_limiter", None)
@@ -1,6 +1,7 @@
+import asyncio
 from dataclasses import dataclass
 from types import SimpleNamespace
-from typing import Any
+from typing import Any, Callable
 
 
 @dataclass
@@ -8,20 +9,105 @@ class OpenAICall:
     model: str
     input: Any
     prompt: Any
+    stream: bool = False
+
+
+@dataclass
+class RawResponse:
+    """Stand-in for the SDK's raw response (``responses.with_raw_response.create``)."""
+    headers: dict[str, str]
+    parsed: Any
+
+    def parse(self):
+        return self.parsed
 
 
 class OpenAIMock:
     """Register input -> output mappings for OpenAI response stubs."""
 
-    def __init__(self, mapping: dict[str, str] | None = None, *, default_output: str = ""):
+    def __init__(
+        self,
+        mapping: dict[str, str] | None = None,
+        *,
+        default_output: str = "",
+        latency: float = 0.0,
+        responder: Callable[[Any, Any], str | None] | None = None,
+    ):
         self.mapping = dict(mapping or {})
         self.default_output = default_output
+        # Optional callable (input, prompt) -> output_text for inputs built at runtime;
+        # returning None falls back to the registered mapping
+        self.responder = responder
+        # Simulated round trip per call, in seconds (per prompt ID via set_latency)
+        self.latency = latency
+        self.prompt_latency: dict[str, float] = {}
         self.calls: list[OpenAICall] = []
+        # Exceptions raised by the next calls, in order, before any output is produced
+        self.errors: list[Exception] = []
+        # stream=True calls: output is sent in chunks of this many characters,
+        # each delayed by chunk_latency (the call latency is the time to the first chunk)
+        self.chunk_size = 8
+        self.chunk_latency = 0.0
+        # HTTP headers of every successful response (e.g. x-ratelimit-remaining-requests)
+        self.headers: dict[str, str] = {}
 
     def register(self, input_text: str, output_text: str) -> None:
         self.mapping[input_text] = output_text
 
-    async def create(self, *, model: str, input: Any, prompt: Any):
-        self.calls.append(OpenAICall(model=model, input=input, prompt=prompt))
-        output_text = self.mapping.get(str(input), self.default_output)
-        return SimpleNamespace(output_text=output_text)
+    def set_latency(self, prompt_id: str, seconds: float) -> None:
+        """Delay every call made with prompt ``prompt_id`` by ``seconds``."""
+        self.prompt_latency[prompt_id] = seconds
+
+    def set_stream_chunks(self, chunk_size: int, chunk_latency: float = 0.0) -> None:
+        """Shape simulated streams: ``chunk_size`` characters every ``chunk_latency`` seconds."""
+        self.chunk_size = chunk_size
+        self.chunk_latency = chunk_latency
+
+    def queue_error(self, error: Exception) -> None:
+        """Make the next not-yet-failed call raise ``error`` (e.g. a RateLimitError)."""
+        self.errors.append(error)
+
+    async def create(
+        self,
+        *,
+        model: str,
+        input: Any,
+        prompt: Any,
+        stream: bool = False,
+        extra_headers: dict[str, str] | None = None,
+    ):
+        self.calls.append(OpenAICall(model=model, input=input, prompt=prompt, stream=stream))
+        prompt_id = prompt.get("id") if isinstance(prompt, dict) else None
+        latency = self.prompt_latency.get(prompt_id, self.latency)
+        if latency:
+            await asyncio.sleep(latency)
+        if self.errors:
+            raise self.errors.pop(0)
+        output_text = self.responder(input, prompt) if self.responder else None
+        if output_text is None:
+            output_text = self.mapping.get(str(input), self.default_output)
+        # Usage is a crude chars/4 count, enough to exercise token accounting
+        input_tokens = len(str(input)) // 4
+        output_tokens = len(output_text) // 4
+        response = SimpleNamespace(
+            output_text=output_text,
+            usage=SimpleNamespace(
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                total_tokens=input_tokens + output_tokens,
+            ),
+        )
+        result = self._stream(response) if stream else response
+        # with_raw_response asks for the raw response through this header
+        if extra_headers and extra_headers.get("X-Stainless-Raw-Response") == "true":
+            return RawResponse(headers=dict(self.headers), parsed=result)
+        return result
+
+    async def _stream(self, response):
+        """Responses API stream events: output text deltas, then the completed response."""
+        text = response.output_text
+        for start in range(0, len(text), self.chunk_size):
+            if start and self.chunk_latency:
+                await asyncio.sleep(self.chunk_latency)
+            yield SimpleNamespace(type="response.output_text.delta", delta=text[start:start + self.chunk_size])
+        yield SimpleNamespace(type="response.completed", response=response)
@@ -1,6 +1,8 @@
+import asyncio
 from dataclasses import dataclass
 from typing import Any
 from app.modals.video import Comment, VideoInfo
+from app.services.youtube import YouTubeService
 
 
 @dataclass
@@ -11,13 +13,48 @@ class YouTubeCall:
     kwargs: dict
 
 
-class YouTubeMock:
-    """Mock YouTube service for testing. Register video ID -> data mappings."""
+class YouTubeMock(YouTubeService):
+    """
+    Mock YouTube service for testing. Register video ID -> data mappings.
 
-    def __init__(self):
+    Only the methods that talk to the API are overridden; orchestration helpers
+    (e.g. ``iter_comment_pages``) are inherited so tests exercise the real code.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        max_comments: int = 30,
+        sample_max_pages: int = 10,
+        reply_threads: int = 0,
+        reply_budget: int = 200,
+        reply_fetch_concurrency: int = 4,
+    ):
+        # No super().__init__(): the mock never opens an HTTP client.
+        self.max_comments = max_comments
+        self.sample_max_pages = sample_max_pages
+        self.reply_threads = reply_threads
+        self.reply_budget = reply_budget
+        self.reply_fetch_concurrency = reply_fetch_concurrency
         self.video_data: dict[str, dict[str, Any]] = {}
+        self.replies: dict[str, list[Comment]] = {}
         self.video_errors: dict[str, Exception] = {}
         self.calls: list[YouTubeCall] = []
+        self.latency: dict[str, float] = {}
+        self.default_latency = latency
+
+    def set_latency(self, method: str, seconds: float) -> None:
+        """Delay every call of ``method`` by ``seconds`` to simulate network RTT."""
+        self.latency[method] = seconds
+
+    async def _simulate_latency(self, method: str) -> None:
+        delay = self.latency.get(method, self.default_latency)
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        return None
 
     def register_video(
         self,
@@ -25,12 +62,14 @@ class YouTubeMock:
         *,
         comments: list[Comment] | None = None,
         video_info: VideoInfo | None = None,
+        replies: dict[str, list[Comment]] | None = None,
     ) -> None:
-        """Register mock data for a video ID."""
+        """Register mock data for a video ID. `replies` maps a thread (comment) ID to its replies."""
         self.video_data[video_id] = {
             "comments": comments or [],
             "video_info": video_info,
         }
+        self.replies.update(replies or {})
 
     def register_error(self, video_id: str, error: Exception) -> None:
         """Register an error to raise for a video ID."""
@@ -43,9 +82,9 @@ class YouTubeMock:
             args=(url_or_id,),
             kwargs={}
         ))
-        
+
         url_or_id = url_or_id.strip()
-        
+
         # Try to extract from common URL patterns first
         patterns = [
             (r"youtube\.com/watch\?v=([a-zA-Z0-9_-]+)", 1),
@@ -53,7 +92,7 @@ class YouTubeMock:
             (r"youtube\.com/embed/([a-zA-Z0-9_-]+)", 1),
             (r"youtube\.com/v/([a-zA-Z0-9_-]+)", 1),
         ]
-        
+
         import re
         for pattern, group in patterns:
             match = re.search(pattern, url_or_id)
@@ -62,49 +101,112 @@ class YouTubeMock:
                 # Check if this video ID is registered or has an error registered
                 if video_id in self.video_data or video_id in self.video_errors:
                     return video_id
-        
+
         # Check if it's a direct video ID match
         if url_or_id in self.video_data or url_or_id in self.video_errors:
             return url_or_id
-        
+
         return None
 
-    def get_video_info(self, video_id: str) -> VideoInfo | None:
+    async def get_video_info(self, video_id: str) -> VideoInfo | None:
         """Mock get_video_info - returns registered VideoInfo or None."""
         self.calls.append(YouTubeCall(
             method="get_video_info",
             args=(video_id,),
             kwargs={}
         ))
-        
+        await self._simulate_latency("get_video_info")
+
         if video_id in self.video_errors:
             raise self.video_errors[video_id]
-        
+
         if video_id in self.video_data:
             return self.video_data[video_id]["video_info"]
-        
+
         return None
 
-    def get_comments(
+    async def get_comments(
         self,
         video_id: str,
         comment_chunk_size: int | None = None,
         order: str = 'relevance',
+        mode: str = 'top',
     ) -> list[Comment]:
-        """Mock get_comments - returns registered comments or raises error."""
+        """Mock get_comments - returns registered comments or raises error.
+        mode='random' runs the real sampler over the mocked pages."""
         self.calls.append(YouTubeCall(
             method="get_comments",
             args=(video_id,),
             kwargs={
                 "comment_chunk_size": comment_chunk_size,
                 "order": order,
+                "mode": mode,
             }
         ))
-        
+        if mode == 'random':
+            return await self.sample_comments(video_id, comment_chunk_size, order=order)
+        await self._simulate_latency("get_comments")
+
         if video_id in self.video_errors:
             raise self.video_errors[video_id]
-        
+
         if video_id in self.video_data:
             return self.video_data[video_id]["comments"]
-        
+
         raise ValueError("Video not found")
+
+    async def _fetch_comment_page(
+        self,
+        video_id: str,
+        *,
+        order: str,
+        page_size: int,
+        page_token: str | None = None,
+    ) -> tuple[list[Comment], str | None]:
+        """Mock commentThreads page - slices registered comments, page tokens are offsets."""
+        self.calls.append(YouTubeCall(
+            method="fetch_comment_page",
+            args=(video_id,),
+            kwargs={
+                "order": order,
+                "page_size": page_size,
+                "page_token": page_token,
+            }
+        ))
+        await self._simulate_latency("fetch_comment_page")
+
+        if video_id in self.video_errors:
+            raise self.video_errors[video_id]
+
+        if video_id not in self.video_data:
+            raise ValueError("Video not found")
+
+        comments = self.video_data[video_id]["comments"]
+        start = int(page_token or 0)
+        end = start + page_size
+        next_page_token = str(end) if end < len(comments) else None
+        return comments[start:end], next_page_token
+
+    async def _fetch_reply_page(
+        self,
+        parent_id: str,
+        *,
+        page_size: int,
+        page_token: str | None = None,
+    ) -> tuple[list[Comment], str | None]:
+        """Mock comments().list page - slices registered replies, page tokens are offsets."""
+        self.calls.append(YouTubeCall(
+            method="fetch_reply_page",
+            args=(parent_id,),
+            kwargs={
+                "page_size": page_size,
+                "page_token": page_token,
+            }
+        ))
+        await self._simulate_latency("fetch_reply_page")
+
+        replies = self.replies.get(parent_id, [])
+        start = int(page_token or 0)
+        end = start + page_size
+        next_page_token = str(end) if end < len(replies) else None
+        return replies[start:end], next_page_token
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from app.services.abort import AbortWatcher, RequestAborted
+
+
+async def connected() -> bool:
+    return False
+
+
+@pytest.mark.asyncio
+async def test_result_is_returned_while_the_client_waits():
+    watcher = AbortWatcher(poll_s=0.01)
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    assert await watcher.run(work(), is_disconnected=connected) == "result"
+    assert watcher.stats() == {"disconnected": 0, "deadline": 0}
+
+
+@pytest.mark.asyncio
+async def test_work_is_cancelled_when_the_client_disconnects():
+    watcher = AbortWatcher(poll_s=0.01)
+    cancelled = asyncio.Event()
+    polls = 0
+
+    async def is_disconnected() -> bool:
+        nonlocal polls
+        polls += 1
+        return polls >= 3
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(RequestAborted) as exc_info:
+        await watcher.run(work(), is_disconnected=is_disconnected)
+
+    assert exc_info.value.reason == "disconnected"
+    assert cancelled.is_set()
+    assert watcher.stats() == {"disconnected": 1, "deadline": 0}
+
+
+@pytest.mark.asyncio
+async def test_work_is_cancelled_at_the_client_deadline():
+    watcher = AbortWatcher(poll_s=10)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    with pytest.raises(RequestAborted) as exc_info:
+        await watcher.run(asyncio.sleep(10), is_disconnected=connected, deadline=started + 0.05)
+
+    assert exc_info.value.reason == "deadline"
+    assert loop.time() - started < 1
+    assert watcher.stats() == {"disconnected": 0, "deadline": 1}
@@ -1,8 +1,18 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import httpx
+
 import pytest
+from openai import RateLimitError
 
 from config import get_settings
 from app.modals.video import Comment
 from app.services.analyzer import CommentAnalyzer
+from app.services.limiter import OpenAIRateLimiter
+from app.services.progress import AnalysisProgress
 from app.tests.helpers.mock_library import OpenAIMock
 
 
@@ -49,19 +59,383 @@ async def test_analyze_async_uses_openai_api_responses():
     assert "topic-prompt" in prompt_ids
     assert len(openai_mock.calls) == 3
 
-    expected_topic_input = str(
+    expected_topic_input = json.dumps(
         [
-            {
-                "main_theme": "praise",
-                "like_count": 3,
-                "sentiment": "positive",
-            },
-            {
-                "main_theme": "complaint",
-                "like_count": 1,
-                "sentiment": "negative",
-            },
-        ]
+            {"theme": "praise", "comments": 1, "likes": 3, "sentiment": {"positive": 1}},
+            {"theme": "complaint", "comments": 1, "likes": 1, "sentiment": {"negative": 1}},
+        ],
+        separators=(",", ":"),
     )
     inputs = {str(call.input) for call in openai_mock.calls}
     assert expected_topic_input in inputs
+
+
+def batch_responder(input, prompt):
+    """Answer batch-prompt calls with one positive result per comment."""
+    if prompt.get("id") != "batch-prompt":
+        return None
+    items = json.loads(input)
+    return json.dumps([
+        {"index": item["index"], "sentiment": "positive", "main_theme": item["text"]}
+        for item in items
+    ])
+
+
+@pytest.mark.asyncio
+async def test_batched_classification_reduces_openai_calls():
+    analyzer = CommentAnalyzer()
+    analyzer.comment_batch_prompt_id = "batch-prompt"
+    analyzer.batch_size = 10
+    openai_mock = OpenAIMock(default_output="Overall summary", responder=batch_responder)
+    analyzer.openai_client.responses.create = openai_mock.create
+
+    comments = [Comment(text=f"comment {i}", like_count=i, author="A") for i in range(30)]
+    await analyzer.categorize_comments_async(comments, language="en")
+
+    assert all(c.analysis_result.sentiment == "positive" for c in comments)
+    assert [c.analysis_result.main_theme for c in comments] == [c.text for c in comments]
+    # 30 comments in batches of 10: 3 requests instead of 30
+    assert len(openai_mock.calls) == 3
+    assert {call.prompt["id"] for call in openai_mock.calls} == {"batch-prompt"}
+
+
+@pytest.mark.asyncio
+async def test_malformed_batch_reply_falls_back_to_single_calls():
+    analyzer = CommentAnalyzer()
+    analyzer.comment_batch_prompt_id = "batch-prompt"
+    openai_mock = OpenAIMock(
+        default_output='{"sentiment":"negative","main_theme":"single"}',
+        responder=lambda input, prompt: "not json" if prompt.get("id") == "batch-prompt" else None,
+    )
+    analyzer.openai_client.responses.create = openai_mock.create
+
+    comments = [Comment(text=f"comment {i}", like_count=i, author="A") for i in range(4)]
+    await analyzer.categorize_comments_async(comments, language="en")
+
+    assert all(c.analysis_result.sentiment == "negative" for c in comments)
+    prompt_ids = [call.prompt["id"] for call in openai_mock.calls]
+    assert prompt_ids.count("batch-prompt") == 1
+    assert prompt_ids.count("comment-prompt") == 4
+
+
+def rate_limit_error(headers: dict[str, str]) -> RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/responses")
+    response = httpx.Response(429, headers=headers, request=request)
+    return RateLimitError("Rate limit reached", response=response, body=None)
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_retry_waits_for_retry_after_instead_of_backoff():
+    analyzer = CommentAnalyzer()
+    openai_mock = OpenAIMock(default_output='{"sentiment":"positive","main_theme":"praise"}')
+    openai_mock.queue_error(rate_limit_error({"retry-after-ms": "50"}))
+    analyzer.openai_client.responses.create = openai_mock.create
+
+    started = time.perf_counter()
+    result = await analyzer.analyze_single_comment_async(Comment(text="Great video!", like_count=1, author="A"))
+    elapsed = time.perf_counter() - started
+
+    assert result.sentiment == "positive"
+    assert len(openai_mock.calls) == 2
+    assert 0.05 <= elapsed < 0.75 * CommentAnalyzer.BASE_BACKOFF_S
+    stats = analyzer.rate_limiter.stats()
+    assert stats["paced_calls"] == 1
+    assert stats["actual_tokens"] > 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_headers_of_successful_responses_pace_next_calls():
+    analyzer = CommentAnalyzer()
+    analyzer.rate_limiter = OpenAIRateLimiter(rpm=500, tpm=100_000)
+    openai_mock = OpenAIMock(default_output='{"sentiment":"positive","main_theme":"praise"}')
+    openai_mock.headers = {
+        "x-ratelimit-remaining-requests": "3",
+        "x-ratelimit-remaining-tokens": "0",
+        "x-ratelimit-reset-tokens": "6m0s",
+    }
+    analyzer.openai_client.responses.create = openai_mock.create
+
+    await analyzer.analyze_single_comment_async(Comment(text="Great video!", like_count=1, author="A"))
+
+    # Budgets follow the server's view before any 429 was seen
+    assert analyzer.rate_limiter.requests.level == 3
+    assert analyzer.rate_limiter.stats()["paused_for_s"] > 300
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_retries_exhausted_reraises_last_error(monkeypatch):
+    monkeypatch.setattr(CommentAnalyzer, "MAX_RETRIES", 2)
+    analyzer = CommentAnalyzer()
+    openai_mock = OpenAIMock()
+    for _ in range(2):
+        openai_mock.queue_error(rate_limit_error({"retry-after-ms": "1"}))
+    analyzer.openai_client.responses.create = openai_mock.create
+
+    with pytest.raises(RateLimitError):
+        await analyzer.analyze_single_comment_async(Comment(text="Great video!", like_count=1, author="A"))
+
+
+@pytest.mark.asyncio
+async def test_duplicate_comments_are_classified_once_and_counted_per_copy():
+    analyzer = CommentAnalyzer()
+    openai_mock = OpenAIMock(default_output='{"sentiment":"nonsensical","main_theme":"spam"}')
+    openai_mock.register("Great video!", '{"sentiment":"positive","main_theme":"praise"}')
+    analyzer.openai_client.responses.create = openai_mock.create
+    spam = "Check out my channel for the best gaming videos every day"
+
+    comments = [
+        Comment(text="Great video!", like_count=5, author="A"),
+        Comment(text="great video", like_count=2, author="B"),
+        Comment(text=spam, like_count=1, author="C"),
+        Comment(text=spam + "!!", like_count=1, author="D"),
+        Comment(text=spam + " bro", like_count=1, author="E"),
+    ]
+
+    categorized = await analyzer.categorize_comments_async(comments)
+
+    assert sorted(str(call.input) for call in openai_mock.calls) == sorted(["Great video!", spam])
+    assert [c.analysis_result.sentiment for c in categorized] == [
+        "positive", "positive", "nonsensical", "nonsensical", "nonsensical",
+    ]
+    assert analyzer.count_comment_per_sentiment(categorized) == {"positive": 2, "nonsensical": 3}
+    likes = analyzer.count_likes_per_category(categorized)
+    assert (likes["positive"], likes["nonsensical"]) == (7, 3)
+    assert analyzer.dedup_stats == {"comments": 5, "exact_duplicates": 2, "near_duplicates": 1}
+
+
+@pytest.mark.asyncio
+async def test_trivial_comments_skip_openai():
+    analyzer = CommentAnalyzer()
+    openai_mock = OpenAIMock(default_output='{"sentiment":"positive","main_theme":"praise"}')
+    analyzer.openai_client.responses.create = openai_mock.create
+
+    comments = [
+        Comment(text="🔥🔥🔥", like_count=4, author="A"),
+        Comment(text="12:40", like_count=1, author="B"),
+        Comment(text="This explained recursion better than my professor", like_count=9, author="C"),
+    ]
+
+    categorized = await analyzer.categorize_comments_async(comments)
+
+    assert [str(call.input) for call in openai_mock.calls] == [comments[2].text]
+    assert [c.analysis_result.main_theme for c in categorized] == ["emoji reaction", "timestamp", "praise"]
+    assert analyzer.prefilter.stats()["matched"] == 2
+
+
+@pytest.mark.asyncio
+async def test_topic_summary_switches_to_map_reduce_above_threshold(monkeypatch):
+    monkeypatch.setenv("TOPIC_MAP_REDUCE_THRESHOLD", "20")
+    monkeypatch.setenv("TOPIC_MAP_FAN_OUT", "5")
+    monkeypatch.setenv("TOPIC_REDUCE_FAN_IN", "2")
+    monkeypatch.setenv("TOPIC_REDUCE_PROMPT_ID", "reduce-prompt")
+    get_settings.cache_clear()
+    analyzer = CommentAnalyzer()
+
+    def responder(input, prompt):
+        rows = json.loads(input)
+        if prompt["id"] == "reduce-prompt":
+            return "+".join(row["summary"] for row in rows)
+        return f"map({len(rows)})"
+
+    openai_mock = OpenAIMock(responder=responder)
+    analyzer.openai_client.responses.create = openai_mock.create
+    comments = [
+        Comment(
+            text=f"comment {i}",
+            like_count=1,
+            author="A",
+            analysis_result={"sentiment": "neutral", "main_theme": f"topic{i}"},
+        )
+        for i in range(50)
+    ]
+
+    summary = await analyzer._summarize_topics_async(comments)
+
+    # 5 map chunks of 10 clusters, reduced pairwise: 5 -> 3 -> 2 -> 1
+    assert summary == "+".join(["map(10)"] * 5)
+    prompts = [call.prompt["id"] for call in openai_mock.calls]
+    assert prompts.count("topic-prompt") == 5
+    assert prompts.count("reduce-prompt") == 4
+    reduce_inputs = [json.loads(call.input) for call in openai_mock.calls if call.prompt["id"] == "reduce-prompt"]
+    # The reduce prompt gets partial summaries, never theme rows
+    assert reduce_inputs[0] == [
+        {"comments": 10, "likes": 10, "summary": "map(10)"},
+        {"comments": 10, "likes": 10, "summary": "map(10)"},
+    ]
+    assert all(set(row) == {"comments", "likes", "summary"} for rows in reduce_inputs for row in rows)
+    assert reduce_inputs[-1][0]["comments"] + reduce_inputs[-1][1]["comments"] == 50
+
+
+@pytest.mark.asyncio
+async def test_topic_summary_stays_single_pass_without_a_reduce_prompt(monkeypatch):
+    monkeypatch.setenv("TOPIC_MAP_REDUCE_THRESHOLD", "20")
+    get_settings.cache_clear()
+    analyzer = CommentAnalyzer()
+    openai_mock = OpenAIMock(default_output="summary")
+    analyzer.openai_client.responses.create = openai_mock.create
+    comments = [
+        Comment(
+            text=f"comment {i}",
+            like_count=1,
+            author="A",
+            analysis_result={"sentiment": "neutral", "main_theme": f"topic{i}"},
+        )
+        for i in range(50)
+    ]
+
+    assert await analyzer._summarize_topics_async(comments) == "summary"
+    assert [call.prompt["id"] for call in openai_mock.calls] == ["topic-prompt"]
+    assert "summary" not in json.loads(openai_mock.calls[0].input)[0]
+
+
+@pytest.mark.asyncio
+async def test_categorize_comments_stops_at_the_deadline():
+    openai_mock = OpenAIMock(default_output='{"sentiment":"positive","main_theme":"praise"}')
+    analyzer = CommentAnalyzer()
+
+    async def create(**kwargs):
+        # One classification never comes back
+        if kwargs["input"] == "a stuck comment":
+            await asyncio.sleep(30)
+        return await openai_mock.create(**kwargs)
+
+    analyzer.openai_client.responses.create = create
+    comments = [
+        Comment(text="a quick comment", like_count=1, author="A"),
+        Comment(text="a stuck comment", like_count=2, author="B"),
+    ]
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    categorized = await analyzer.categorize_comments_async(comments, language="en", deadline=started + 0.5)
+
+    assert loop.time() - started < 2
+    assert [c.text for c in categorized] == ["a quick comment"]
+    assert analyzer.abort_stats["openai_calls"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sequential_sampling_population_excludes_link_comments():
+    openai_mock = OpenAIMock(responder=lambda input, prompt: (
+        '{"sentiment":"positive","main_theme":"praise"}' if "good" in str(input)
+        else '{"sentiment":"negative","main_theme":"complaint"}'
+    ))
+    analyzer = CommentAnalyzer()
+    analyzer.openai_client.responses.create = openai_mock.create
+    analyzer.sequential_step = 10
+    analyzer.sequential_min_sample = 100
+    comments = [
+        Comment(text=f"{'good' if i % 2 else 'bad'} video number {i}", like_count=i, author="U") for i in range(20)
+    ] + [Comment(text=f"see https://example.com/{i}", like_count=0, author="S") for i in range(20)]
+
+    analysis = await analyzer.analyze_sequential_async(comments, language="en")
+
+    assert len(analysis.comments) == 20
+    assert analysis.received == 40
+    # Every classifiable comment was classified: the shares are exact
+    assert analysis.sentiment_intervals["positive"] == (0.5, 0.5)
+    assert analysis.sentiment_intervals["negative"] == (0.5, 0.5)
+
+
+@pytest.mark.asyncio
+async def test_comments_are_classified_in_engagement_order(monkeypatch):
+    monkeypatch.setattr(CommentAnalyzer, "MAX_IN_FLIGHT_REQUESTS", 1)
+    analyzer = CommentAnalyzer()
+    openai_mock = OpenAIMock(default_output='{"sentiment":"neutral","main_theme":"general"}')
+    analyzer.openai_client.responses.create = openai_mock.create
+
+    comments = [
+        Comment(text="a quiet comment", like_count=1, author="A"),
+        Comment(text="a popular comment", like_count=50, author="B"),
+        Comment(text="a discussed comment", like_count=5, author="C", reply_count=30),
+        Comment(text="an ignored comment", like_count=0, author="D"),
+    ]
+
+    categorized = await analyzer.categorize_comments_async(comments)
+
+    assert [call.input for call in openai_mock.calls] == [
+        "a discussed comment", "a popular comment", "a quiet comment", "an ignored comment",
+    ]
+    # Results still come back in arrival order
+    assert categorized == comments
+
+
+@pytest.mark.asyncio
+async def test_topic_summary_streams_deltas_before_the_generation_completes():
+    """Benchmark: time to the first summary text vs. the whole generation."""
+    summary = "Viewers praise the editing and ask for a follow-up video on the same topic."
+    openai_mock = OpenAIMock(
+        responder=lambda input, prompt: summary if prompt["id"] == "topic-prompt" else None,
+        default_output='{"sentiment":"positive","main_theme":"editing"}',
+    )
+    openai_mock.set_stream_chunks(chunk_size=10, chunk_latency=0.05)
+    analyzer = CommentAnalyzer()
+    analyzer.openai_client.responses.create = openai_mock.create
+
+    async def comments():
+        for i in range(3):
+            yield Comment(text=f"Great editing in part {i}", like_count=i, author="U")
+
+    progress = AnalysisProgress()
+    started = time.perf_counter()
+    delta_times = []
+    deltas = []
+
+    async def listen():
+        async for event in progress.events():
+            if event.name == "summary_delta":
+                delta_times.append(time.perf_counter() - started)
+                deltas.append(event.data["text"])
+
+    listener = asyncio.ensure_future(listen())
+    await asyncio.sleep(0)
+    analysis = await analyzer.analyze_comment_stream_async(comments(), language="en", progress=progress)
+    elapsed = time.perf_counter() - started
+    progress.finish("result")
+    await listener
+
+    assert analysis.summary == summary
+    assert "".join(deltas) == summary
+    assert len(deltas) == 8
+    assert [c.stream for c in openai_mock.calls if c.prompt["id"] == "topic-prompt"] == [True]
+    # 7 more chunks arrive 50 ms apart after the first one
+    assert delta_times[0] < elapsed - 0.3
+
+
+async def events(*events):
+    for event in events:
+        yield event
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "last_event",
+    [
+        SimpleNamespace(type="response.failed", response=SimpleNamespace(error=SimpleNamespace(message="server_error"))),
+        SimpleNamespace(type="response.incomplete", response=SimpleNamespace(incomplete_details=SimpleNamespace(reason="max_output_tokens"))),
+        SimpleNamespace(type="error", message="stream interrupted"),
+        None,
+    ],
+)
+async def test_stream_without_a_completed_response_raises(last_event):
+    stream = [SimpleNamespace(type="response.output_text.delta", delta="Viewers praise")]
+    if last_event is not None:
+        stream.append(last_event)
+    deltas = []
+
+    with pytest.raises(RuntimeError):
+        await CommentAnalyzer._consume_stream(events(*stream), deltas.append)
+    assert deltas == ["Viewers praise"]
+
+
+@pytest.mark.asyncio
+async def test_stream_returns_the_completed_response_with_its_usage():
+    usage = SimpleNamespace(input_tokens=10, output_tokens=4, total_tokens=14)
+    completed = SimpleNamespace(output_text="Viewers praise it", usage=usage)
+    stream = events(
+        SimpleNamespace(type="response.output_text.delta", delta="Viewers praise"),
+        SimpleNamespace(type="response.output_text.delta", delta=" it"),
+        SimpleNamespace(type="response.completed", response=completed),
+    )
+
+    assert await CommentAnalyzer._consume_stream(stream, lambda _: None) is completed
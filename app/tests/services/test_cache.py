@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+import pytest
+
+from app.modals.video import Comment, CommentAnalysisResult
+from app.services.analyzer import CommentAnalyzer
+from app.services.cache import CommentAnalysisCache, ResultCache
+from app.tests.helpers.mock_library import OpenAIMock
+
+
+def make_key(text: str, language: str = "en") -> str:
+    return CommentAnalysisCache.make_key(text, model="gpt", prompt_id="comment-prompt", language=language)
+
+
+def test_key_normalizes_text_and_separates_language():
+    assert make_key("Great   Video!") == make_key(" great video! ")
+    assert make_key("Great video!", "en") != make_key("Great video!", "ru")
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_new_instance_and_expires(tmp_path):
+    now = [1000.0]
+    path = str(tmp_path / "cache.sqlite")
+    result = CommentAnalysisResult(sentiment="positive", main_theme="praise")
+
+    cache = CommentAnalysisCache(path=path, ttl_s=60, clock=lambda: now[0])
+    await cache.set(make_key("Great video!"), result)
+    cache.close()
+
+    reopened = CommentAnalysisCache(path=path, ttl_s=60, clock=lambda: now[0])
+    assert await reopened.get(make_key("Great video!")) == result
+    assert reopened.stats()["hits_disk"] == 1
+    # Promoted to the memory tier
+    assert await reopened.get(make_key("Great video!")) == result
+    assert reopened.stats()["hits_memory"] == 1
+
+    now[0] += 61
+    assert await reopened.get(make_key("Great video!")) is None
+    assert reopened.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_evicts_least_recently_used():
+    cache = CommentAnalysisCache(max_memory_entries=2)
+    result = CommentAnalysisResult(sentiment="neutral", main_theme="")
+    for text in ("a", "b"):
+        await cache.set(make_key(text), result)
+    await cache.get(make_key("a"))
+    await cache.set(make_key("c"), result)
+
+    assert await cache.get(make_key("b")) is None
+    assert await cache.get(make_key("a")) == result
+
+
+@pytest.mark.asyncio
+async def test_repeat_analysis_is_served_from_cache():
+    analyzer = CommentAnalyzer()
+    openai_mock = OpenAIMock(default_output='{"sentiment":"positive","main_theme":"praise"}')
+    analyzer.openai_client.responses.create = openai_mock.create
+
+    for _ in range(2):
+        comments = [Comment(text="Great video!", like_count=1, author="A")]
+        await analyzer.categorize_comments_async(comments, language="en")
+        assert comments[0].analysis_result.sentiment == "positive"
+
+    assert len(openai_mock.calls) == 1
+    assert analyzer.cache.stats()["hits_memory"] == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_results_are_cached_per_batch_prompt():
+    analyzer = CommentAnalyzer()
+    analyzer.comment_batch_prompt_id = "batch-prompt"
+    openai_mock = OpenAIMock(
+        default_output='{"sentiment":"negative","main_theme":"single"}',
+        responder=lambda input, prompt: (
+            json.dumps([{"index": i, "sentiment": "positive", "main_theme": "batch"} for i in range(2)])
+            if prompt.get("id") == "batch-prompt" else None
+        ),
+    )
+    analyzer.openai_client.responses.create = openai_mock.create
+
+    def comments():
+        return [Comment(text=f"comment {i}", like_count=1, author="A") for i in range(2)]
+
+    await analyzer.analyze_comment_batch_async(comments(), language="en")
+    # Same batch prompt: served from the cache
+    cached = await analyzer.analyze_comment_batch_async(comments(), language="en")
+    assert [r.main_theme for r in cached] == ["batch", "batch"]
+    assert len(openai_mock.calls) == 1
+
+    # Neither a changed batch prompt nor the single prompt reuses them
+    analyzer.comment_batch_prompt_id = "batch-prompt-v2"
+    await analyzer.analyze_comment_batch_async(comments(), language="en")
+    assert [call.prompt["id"] for call in openai_mock.calls[1:]] == [
+        "batch-prompt-v2", "comment-prompt", "comment-prompt",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_background_refresh_leaves_storing_to_the_refresh():
+    now = [0.0]
+    cache = ResultCache(ttl_s=10, stale_s=10, clock=lambda: now[0])
+    cache.set("key", "old")
+    now[0] = 15.0
+
+    async def refresh():
+        # e.g. a partial result the refresh chose not to store
+        return "partial"
+
+    cache.schedule_refresh("key", refresh)
+    await asyncio.gather(*cache._background_tasks)
+
+    assert cache.get("key")[0] == "old"
+    assert cache.stats()["refreshes"] == 1
@@ -0,0 +1,19 @@
+import asyncio
+
+import pytest
+
+from app.services.concurrency import ready_batches
+
+
+@pytest.mark.asyncio
+async def test_ready_batches_hand_out_what_arrived_without_waiting_for_more():
+    async def pages():
+        for page in ([1, 2, 3, 4, 5], [6, 7]):
+            await asyncio.sleep(0.05)
+            for item in page:
+                yield item
+
+    batches = [batch async for batch in ready_batches(pages(), 3)]
+
+    # Full batches, then the rest of a page instead of waiting for the next one
+    assert batches == [[1, 2, 3], [4, 5], [6, 7]]
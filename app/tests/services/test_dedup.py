@@ -0,0 +1,50 @@
+import random
+import string
+import time
+
+from app.services.dedup import NearDuplicateIndex
+
+
+def test_exact_duplicates_ignore_case_whitespace_and_punctuation():
+    index = NearDuplicateIndex()
+
+    assert index.find_or_add("First!", "a") is None
+    assert index.find_or_add("  first  ", "b") == "a"
+    assert index.find_or_add("FIRST!!!", "c") == "a"
+    assert index.find_or_add("second", "d") is None
+    assert index.exact_duplicates == 2
+
+
+def test_near_duplicates_share_a_representative():
+    index = NearDuplicateIndex(threshold=0.7)
+    spam = "Check out my channel for the best gaming videos every day"
+
+    assert index.find_or_add(spam, "a") is None
+    assert index.find_or_add(spam + " bro", "b") == "a"
+    assert index.find_or_add("This tutorial finally made recursion click for me", "c") is None
+    assert index.near_duplicates == 1
+
+
+def test_short_texts_and_disabled_threshold_only_match_exactly():
+    index = NearDuplicateIndex()
+    assert index.find_or_add("comment 1", "a") is None
+    assert index.find_or_add("comment 12", "b") is None
+
+    exact_only = NearDuplicateIndex(threshold=None)
+    text = "Check out my channel for the best gaming videos every day"
+    assert exact_only.find_or_add(text, "a") is None
+    assert exact_only.find_or_add(text + " bro", "b") is None
+
+
+def test_indexing_cpu_time_per_comment_is_capped():
+    """Benchmark: signatures must stay cheap, the index runs for every fetched comment."""
+    rng = random.Random(0)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9))) for _ in range(3000)]
+    texts = [" ".join(rng.choice(words) for _ in range(60)) for _ in range(500)]  # ~390 chars each
+    index = NearDuplicateIndex()
+
+    started = time.process_time()
+    index.find_or_add_many((text, i) for i, text in enumerate(texts))
+    per_comment = (time.process_time() - started) / len(texts)
+
+    assert per_comment < 0.002
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from app.services.idempotency import IdempotencyKeyReused, IdempotencyStore
+from app.services.pipeline import AnalysisError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_retry_attaches_to_the_running_request():
+    store = IdempotencyStore()
+    release = asyncio.Event()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "result"
+
+    first = asyncio.create_task(store.run("key", "body", work))
+    await asyncio.sleep(0)
+    # The client gave up on the first attempt; its work keeps going for the retry
+    first.cancel()
+    retry = asyncio.create_task(store.run("key", "body", work))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await retry == ("result", True)
+    assert calls == 1
+    assert store.stats() == {"entries": 1, "started": 1, "replayed": 1, "conflicts": 0, "abandoned": 0}
+
+
+@pytest.mark.asyncio
+async def test_finished_outcome_is_replayed_until_it_expires():
+    clock = FakeClock()
+    store = IdempotencyStore(ttl_s=60, clock=clock)
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await store.run("key", "body", work) == (1, False)
+    assert await store.run("key", "body", work) == (1, True)
+
+    clock.now = 60
+    assert await store.run("key", "body", work) == (2, False)
+
+
+@pytest.mark.asyncio
+async def test_key_reused_for_another_request_is_rejected():
+    store = IdempotencyStore()
+
+    async def work():
+        return "result"
+
+    await store.run("key", "body", work)
+    with pytest.raises(IdempotencyKeyReused):
+        await store.run("key", "other body", work)
+    assert store.stats()["conflicts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_replayed_and_server_errors_retried():
+    store = IdempotencyStore()
+    calls = 0
+
+    async def work(status_code):
+        nonlocal calls
+        calls += 1
+        raise AnalysisError(status_code, "failed")
+
+    for _ in range(2):
+        with pytest.raises(AnalysisError):
+            await store.run("not-found", "body", lambda: work(404))
+    assert calls == 1
+
+    for _ in range(2):
+        with pytest.raises(AnalysisError):
+            await store.run("unavailable", "body", lambda: work(503))
+    assert calls == 3
+
+
+@pytest.mark.asyncio
+async def test_oldest_keys_are_dropped_past_max_entries():
+    store = IdempotencyStore(max_entries=2)
+
+    async def work():
+        return "result"
+
+    for key in ("a", "b", "c"):
+        await store.run(key, "body", work)
+
+    assert store.stats()["entries"] == 2
+    assert await store.run("a", "body", work) == ("result", False)
+
+
+@pytest.mark.asyncio
+async def test_work_without_a_retry_is_cancelled_after_the_grace_period():
+    store = IdempotencyStore(abandon_grace_s=0.05)
+    cancelled = asyncio.Event()
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    first = asyncio.create_task(store.run("key", "body", work))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0.1)
+
+    assert cancelled.is_set()
+    assert store.stats()["abandoned"] == 1
+    # Cancelled work is forgotten, so a late retry starts over
+    assert store.stats()["entries"] == 0
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from app.modals.video import VideoAnalysisResponse
+from app.services.jobs import AnalysisJobStore, TooManyJobs
+from app.services.pipeline import AnalysisError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_response() -> VideoAnalysisResponse:
+    return VideoAnalysisResponse(
+        analyze_result="summary",
+        count_comments_per_sentiment={"neutral": 1},
+        likes_per_category={"neutral": 0},
+    )
+
+
+@pytest.mark.asyncio
+async def test_job_reports_progress_and_result():
+    store = AnalysisJobStore()
+    release = asyncio.Event()
+
+    async def run(progress):
+        progress.add_fetched(3)
+        progress.add_classified(2)
+        await release.wait()
+        return make_response()
+
+    job = store.submit("key", run)
+    await asyncio.sleep(0)
+    assert job.status == "running"
+    assert (job.progress.fetched, job.progress.classified) == (3, 2)
+
+    release.set()
+    await asyncio.sleep(0)
+    assert store.get(job.id).status == "succeeded"
+    assert job.result.analyze_result == "summary"
+
+
+@pytest.mark.asyncio
+async def test_running_job_is_reused_for_the_same_analysis():
+    store = AnalysisJobStore()
+    release = asyncio.Event()
+    runs = 0
+
+    async def run(progress):
+        nonlocal runs
+        runs += 1
+        await release.wait()
+        return make_response()
+
+    first = store.submit("key", run)
+    second = store.submit("key", run)
+    release.set()
+    await asyncio.sleep(0)
+
+    assert second is first
+    assert runs == 1
+    # Once finished, the next submission starts a fresh job
+    assert store.submit("key", run) is not first
+
+
+@pytest.mark.asyncio
+async def test_failed_job_keeps_the_error_status():
+    store = AnalysisJobStore()
+
+    async def not_found(progress):
+        raise AnalysisError(404, "Video not found")
+
+    async def broken(progress):
+        raise RuntimeError("boom")
+
+    jobs = [store.submit("a", not_found), store.submit("b", broken)]
+    await asyncio.sleep(0)
+
+    assert [(j.status, j.error_status, j.error) for j in jobs] == [
+        ("failed", 404, "Video not found"),
+        ("failed", 500, "Analysis failed"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_retention_is_bounded():
+    clock = FakeClock()
+    store = AnalysisJobStore(max_jobs=2, ttl_s=60, clock=clock)
+    release = asyncio.Event()
+
+    async def quick(progress):
+        return make_response()
+
+    async def slow(progress):
+        await release.wait()
+        return make_response()
+
+    finished = store.submit("a", quick)
+    await asyncio.sleep(0)
+    running = [store.submit("b", slow), store.submit("c", slow)]
+
+    # The finished job made room for the second running one
+    assert store.get(finished.id) is None
+    with pytest.raises(TooManyJobs):
+        store.submit("d", slow)
+
+    release.set()
+    await asyncio.sleep(0)
+    clock.now = 61
+    assert all(store.get(job.id) is None for job in running)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_job_is_finished_and_evictable():
+    clock = FakeClock()
+    store = AnalysisJobStore(ttl_s=60, clock=clock)
+
+    async def run(progress):
+        await asyncio.sleep(10)
+        return make_response()
+
+    job = store.submit("key", run)
+    await asyncio.sleep(0)
+    for task in list(store._tasks):
+        task.cancel()
+    await asyncio.gather(*store._tasks, return_exceptions=True)
+
+    assert (job.status, job.error_status, job.error) == ("failed", 503, "Analysis cancelled")
+    assert job.progress.final.name == "error"
+    assert store.stats()["active"] == 0
+
+    clock.now = 60
+    assert store.get(job.id) is None
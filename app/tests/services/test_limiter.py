@@ -0,0 +1,159 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.limiter import AdaptiveConcurrencyLimiter, OpenAIRateLimiter, TokenBucket
+
+
+class Overloaded(Exception):
+    pass
+
+
+def make_limiter(**kwargs) -> AdaptiveConcurrencyLimiter:
+    now = [0.0]
+    limiter = AdaptiveConcurrencyLimiter(
+        overload_exceptions=(Overloaded,),
+        clock=lambda: now[0],
+        **kwargs,
+    )
+    limiter.now = now
+    return limiter
+
+
+@pytest.mark.asyncio
+async def test_limit_grows_additively_and_halves_on_overload():
+    limiter = make_limiter(initial_limit=4, max_limit=10)
+
+    for _ in range(4):
+        async with limiter.acquire():
+            pass
+    # ~1 per window of `limit` successes
+    assert 4.9 < limiter.limit < 5.0
+
+    with pytest.raises(Overloaded):
+        async with limiter.acquire():
+            raise Overloaded()
+    assert 2.4 < limiter.limit < 2.5
+    assert limiter.stats()["overloads"] == 1
+
+
+@pytest.mark.asyncio
+async def test_decreases_are_rate_limited_by_cooldown():
+    limiter = make_limiter(initial_limit=16, decrease_cooldown_s=1.0)
+    limiter.record_overload()
+    limiter.record_overload()
+    assert limiter.limit == 8
+
+    limiter.now[0] += 1.0
+    limiter.record_overload()
+    assert limiter.limit == 4
+
+
+@pytest.mark.asyncio
+async def test_rising_latency_triggers_decrease():
+    limiter = make_limiter(initial_limit=10, max_limit=10)
+    for _ in range(limiter.MIN_LATENCY_SAMPLES):
+        async with limiter.acquire():
+            limiter.now[0] += 0.1
+    assert limiter.limit == 10
+
+    for _ in range(5):
+        async with limiter.acquire():
+            limiter.now[0] += 2.0
+    assert limiter.limit <= 5
+
+
+@pytest.mark.asyncio
+async def test_caps_concurrency_across_callers_and_reports_queue():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2)
+    running = 0
+    peak = 0
+    queued = []
+
+    async def call():
+        nonlocal running, peak
+        async with limiter.acquire():
+            running += 1
+            peak = max(peak, running)
+            queued.append(limiter.stats()["queued"])
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(call() for _ in range(6)))
+
+    assert peak == 2
+    assert max(queued) > 0
+    assert limiter.stats()["in_flight"] == 0
+    assert limiter.stats()["acquired"] == 6
+
+
+def test_token_bucket_reserves_into_debt_and_refills():
+    now = [0.0]
+    bucket = TokenBucket(60, clock=lambda: now[0])  # 1 token per second
+
+    assert bucket.reserve(59) == 0.0
+    assert bucket.reserve(3) == pytest.approx(2.0)  # 2 tokens short
+    now[0] = 2.0
+    bucket.refill()
+    assert bucket.level == pytest.approx(0.0)
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_paces_calls_under_rpm_budget():
+    limiter = OpenAIRateLimiter(rpm=600)  # 10 requests per second after the burst
+    limiter.requests.level = 1
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for _ in range(3):
+        await limiter.acquire(10)
+    elapsed = loop.time() - started
+
+    assert 0.15 < elapsed < 0.5
+    assert limiter.stats()["paced_calls"] == 2
+
+
+def test_rate_limiter_reconciles_estimate_with_usage():
+    now = [0.0]
+    limiter = OpenAIRateLimiter(tpm=1000, clock=lambda: now[0])
+    limiter.tokens.level = 500
+
+    limiter.reconcile(200, SimpleNamespace(total_tokens=50))
+
+    assert limiter.tokens.level == 650
+    assert limiter.stats()["actual_tokens"] == 50
+
+
+def test_rate_limiter_honors_rate_limit_headers():
+    now = [0.0]
+    limiter = OpenAIRateLimiter(rpm=500, tpm=100_000, clock=lambda: now[0])
+
+    retry_after = limiter.apply_headers({
+        "retry-after": "2",
+        "x-ratelimit-remaining-requests": "10",
+        "x-ratelimit-remaining-tokens": "0",
+        "x-ratelimit-reset-tokens": "6m0s",
+    })
+
+    assert retry_after == 2.0
+    assert limiter.requests.level == 10
+    assert limiter.tokens.level == 0
+    # Tokens are exhausted until the reported reset, which outlasts retry-after
+    assert limiter.stats()["paused_for_s"] == 360.0
+
+
+def test_rate_limiter_without_budgets_pauses_on_exhausted_headers():
+    now = [0.0]
+    limiter = OpenAIRateLimiter(clock=lambda: now[0])
+
+    retry_after = limiter.apply_headers({
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "20s",
+        "x-ratelimit-remaining-tokens": "5000",
+        "x-ratelimit-reset-tokens": "1s",
+    })
+
+    assert retry_after is None
+    assert limiter.stats()["requests_available"] is None
+    assert limiter.stats()["paused_for_s"] == 20.0
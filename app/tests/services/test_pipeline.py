@@ -0,0 +1,470 @@
+import asyncio
+import random
+import time
+
+import httpx
+import pytest
+
+from app.modals.video import Comment, VideoInfo
+from app.services.analyzer import CommentAnalyzer
+from app.services.cache import ResultCache
+from app.services.pipeline import AnalysisError, AnalysisPipeline
+from app.services.planner import FetchPlanner
+from app.services.progress import AnalysisProgress
+from app.services.singleflight import SingleFlight
+from app.tests.helpers.mock_library import OpenAIMock, YouTubeMock
+
+
+VIDEO_ID = "dQw4w9WgXcQ"
+
+
+def make_pipeline(youtube_mock: YouTubeMock, openai_mock: OpenAIMock) -> AnalysisPipeline:
+    analyzer = CommentAnalyzer()
+    analyzer.openai_client.responses.create = openai_mock.create
+    return AnalysisPipeline(youtube_mock, analyzer)
+
+
+def register_video(youtube_mock: YouTubeMock, n_comments: int) -> None:
+    youtube_mock.register_video(
+        VIDEO_ID,
+        comments=[Comment(text=f"comment {i}", like_count=i, author=f"U{i}") for i in range(n_comments)],
+        video_info=VideoInfo(video_id=VIDEO_ID, title="Test Video", channel="Test Channel"),
+    )
+
+
+@pytest.mark.asyncio
+async def test_pipeline_overlaps_fetching_and_classification():
+    """Benchmark: three pages, each as slow to fetch as to classify."""
+    latency = 0.3
+    youtube_mock = YouTubeMock(max_comments=60)
+    youtube_mock.COMMENT_PAGE_SIZE = 20
+    youtube_mock.set_latency("fetch_comment_page", latency)
+    register_video(youtube_mock, 60)
+    openai_mock = OpenAIMock(
+        default_output='{"sentiment":"neutral","main_theme":"general"}',
+        latency=latency,
+    )
+    pipeline = make_pipeline(youtube_mock, openai_mock)
+
+    started = time.perf_counter()
+    response = await pipeline.run(VIDEO_ID, language="en")
+    elapsed = time.perf_counter() - started
+
+    assert response.comments_count == 60
+    assert response.count_comments_per_sentiment == {"neutral": 60}
+    # fetch (3 pages) + classify (3 rounds of 20 workers) + summary, done serially
+    serial = 3 * latency + 3 * latency + latency
+    assert elapsed < serial - latency
+
+
+@pytest.mark.asyncio
+async def test_pipeline_maps_youtube_errors():
+    youtube_mock = YouTubeMock()
+    youtube_mock.register_error(VIDEO_ID, PermissionError("Comments are disabled for this video"))
+    pipeline = make_pipeline(youtube_mock, OpenAIMock())
+
+    with pytest.raises(AnalysisError) as exc_info:
+        await pipeline.run(VIDEO_ID, language="en")
+
+    assert exc_info.value.status_code == 403
+    assert exc_info.value.detail == "Comments are disabled for this video"
+
+
+@pytest.mark.asyncio
+async def test_result_cache_serves_fresh_then_stale_while_revalidating():
+    now = [0.0]
+    result_cache = ResultCache(ttl_s=60, stale_s=60, clock=lambda: now[0])
+    youtube_mock = YouTubeMock()
+    register_video(youtube_mock, 3)
+    openai_mock = OpenAIMock(default_output='{"sentiment":"neutral","main_theme":"general"}')
+    pipeline = make_pipeline(youtube_mock, openai_mock)
+    pipeline.result_cache = result_cache
+
+    first = await pipeline.run(VIDEO_ID, language="en")
+    assert first.cache_hit is False
+    calls_after_first = len(openai_mock.calls)
+
+    now[0] = 30.0
+    fresh = await pipeline.run(VIDEO_ID, language="en")
+    assert fresh.cache_hit is True
+    assert fresh.cache_age_s == 30.0
+    assert len(openai_mock.calls) == calls_after_first
+
+    # Stale: served immediately, recomputed in the background
+    now[0] = 90.0
+    youtube_mock.set_latency("get_video_info", 0.2)
+    started = time.perf_counter()
+    stale = await pipeline.run(VIDEO_ID, language="en")
+    assert time.perf_counter() - started < 0.1
+    assert stale.cache_hit is True
+    assert stale.cache_age_s == 90.0
+
+    await asyncio.gather(*result_cache._background_tasks)
+    refreshed = await pipeline.run(VIDEO_ID, language="en")
+    assert refreshed.cache_hit is True
+    assert refreshed.cache_age_s == 0.0
+    assert result_cache.stats()["refreshes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_result_cache_is_keyed_by_language():
+    youtube_mock = YouTubeMock()
+    register_video(youtube_mock, 1)
+    pipeline = make_pipeline(youtube_mock, OpenAIMock(default_output="{}"))
+    pipeline.result_cache = ResultCache()
+
+    await pipeline.run(VIDEO_ID, language="en")
+    other_language = await pipeline.run(VIDEO_ID, language="ru")
+
+    assert other_language.cache_hit is False
+
+
+@pytest.mark.asyncio
+async def test_concurrent_runs_share_one_pipeline():
+    youtube_mock = YouTubeMock(latency=0.1)
+    register_video(youtube_mock, 3)
+    openai_mock = OpenAIMock(default_output='{"sentiment":"neutral","main_theme":"general"}')
+    pipeline = make_pipeline(youtube_mock, openai_mock)
+    pipeline.single_flight = SingleFlight()
+
+    first, second = await asyncio.gather(
+        pipeline.run(VIDEO_ID, language="en"),
+        pipeline.run(VIDEO_ID, language="en"),
+    )
+
+    assert first == second
+    # 3 comments + 1 topic summary, once
+    assert len(openai_mock.calls) == 4
+    assert len([c for c in youtube_mock.calls if c.method == "get_video_info"]) == 1
+    assert pipeline.single_flight.stats() == {"in_flight": 0, "leaders": 1, "followers": 1, "abandoned": 0}
+
+
+@pytest.mark.asyncio
+async def test_leader_failure_reaches_every_waiter_and_next_call_retries():
+    youtube_mock = YouTubeMock(latency=0.1)
+    youtube_mock.register_error(VIDEO_ID, ValueError("Video not found"))
+    pipeline = make_pipeline(youtube_mock, OpenAIMock())
+    pipeline.single_flight = SingleFlight()
+
+    run_key = pipeline.join_key(pipeline.analysis_key(VIDEO_ID, language="en", mode="full"), None)
+    runs = [asyncio.create_task(pipeline.run(VIDEO_ID, language="en")) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    assert pipeline.single_flight.in_flight(run_key)
+
+    results = await asyncio.gather(*runs, return_exceptions=True)
+    assert all(isinstance(r, AnalysisError) and r.status_code == 404 for r in results)
+    assert not pipeline.single_flight.in_flight(run_key)
+
+    youtube_mock.video_errors.clear()
+    register_video(youtube_mock, 1)
+    pipeline.analyzer.openai_client.responses.create = OpenAIMock(default_output="{}").create
+    response = await pipeline.run(VIDEO_ID, language="en")
+    assert response.comments_count == 1
+
+
+@pytest.mark.asyncio
+async def test_deadline_returns_partial_result_with_coverage():
+    youtube_mock = YouTubeMock(max_comments=400)
+    register_video(youtube_mock, 400)
+    # 20 workers x 50ms per call: classifying all 400 comments would take ~1s
+    openai_mock = OpenAIMock(default_output='{"sentiment":"neutral","main_theme":"general"}', latency=0.05)
+    openai_mock.set_latency("topic-prompt", 0.0)
+    result_cache = ResultCache()
+    pipeline = make_pipeline(youtube_mock, openai_mock)
+    pipeline.result_cache = result_cache
+
+    started = time.perf_counter()
+    response = await pipeline.run(VIDEO_ID, language="en", deadline_s=0.5)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.6
+    assert response.partial
+    assert 0 < response.coverage < 1
+    # The summary of what finished still came from the topic-analysis call
+    assert openai_mock.calls[-1].prompt["id"] == "topic-prompt"
+    assert sum(response.count_comments_per_sentiment.values()) == round(response.coverage * response.comments_count)
+    # Partial results are not cached
+    assert result_cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_deadline_falls_back_to_local_summary_when_topic_call_is_too_slow():
+    youtube_mock = YouTubeMock()
+    register_video(youtube_mock, 10)
+    openai_mock = OpenAIMock(default_output='{"sentiment":"positive","main_theme":"praise"}')
+    openai_mock.set_latency("topic-prompt", 5.0)
+    pipeline = make_pipeline(youtube_mock, openai_mock)
+
+    started = time.perf_counter()
+    response = await pipeline.run(VIDEO_ID, language="en", deadline_s=0.3)
+
+    assert time.perf_counter() - started < 0.5
+    assert response.partial
+    assert response.coverage == 1.0
+    assert response.analyze_result == "• praise — 10 (45 👍)"
+
+
+@pytest.mark.asyncio
+async def test_sequential_mode_stops_once_sentiment_shares_are_stable():
+    youtube_mock = YouTubeMock(max_comments=3000)
+    youtube_mock.register_video(
+        VIDEO_ID,
+        comments=[Comment(text=f"comment {i}", like_count=i % 7, author="A") for i in range(3000)],
+        video_info=VideoInfo(video_id=VIDEO_ID, title="Test Video", channel="Test Channel"),
+    )
+
+    def responder(input, prompt):
+        if prompt["id"] != "comment-prompt":
+            return "Summary"
+        sentiment = "negative" if int(str(input).split()[-1]) % 10 < 3 else "positive"
+        return f'{{"sentiment":"{sentiment}","main_theme":"general"}}'
+
+    openai_mock = OpenAIMock(responder=responder)
+    pipeline = make_pipeline(youtube_mock, openai_mock)
+    pipeline.analyzer.sampling_rng = random.Random(1)
+
+    response = await pipeline.run(VIDEO_ID, language="en", mode="sequential")
+
+    assert response.comments_count == 3000
+    # ~0.7 * 0.3 * 1.96^2 / 0.05^2 = 323 comments are enough for a +/-5% margin
+    assert 300 <= response.classified_count <= 500
+    assert not response.partial
+    assert response.coverage == round(response.classified_count / 3000, 3)
+    low, high = response.sentiment_intervals["positive"]
+    assert low <= 0.7 <= high
+    assert (high - low) / 2 <= 0.05
+    assert sum(response.count_comments_per_sentiment.values()) == response.classified_count
+
+
+@pytest.mark.asyncio
+async def test_sample_mode_classifies_a_random_sample():
+    youtube_mock = YouTubeMock(max_comments=20, sample_max_pages=5)
+    register_video(youtube_mock, 500)
+    openai_mock = OpenAIMock(default_output='{"sentiment":"neutral","main_theme":"general"}')
+    pipeline = make_pipeline(youtube_mock, openai_mock)
+
+    response = await pipeline.run(VIDEO_ID, language="en", mode="sample")
+
+    assert response.comments_count == response.classified_count == 20
+    assert not response.partial
+    assert len([c for c in youtube_mock.calls if c.method == "fetch_comment_page"]) == 5
+
+
+@pytest.mark.asyncio
+async def test_auto_mode_reads_a_small_video_in_one_request():
+    youtube_mock = YouTubeMock(max_comments=500)
+    youtube_mock.register_video(
+        VIDEO_ID,
+        comments=[Comment(text=f"comment {i}", like_count=i, author=f"U{i}") for i in range(12)],
+        video_info=VideoInfo(video_id=VIDEO_ID, title="Test Video", channel="Test Channel", comment_count=12),
+    )
+    openai_mock = OpenAIMock(default_output='{"sentiment":"neutral","main_theme":"general"}')
+    pipeline = make_pipeline(youtube_mock, openai_mock)
+
+    response = await pipeline.run(VIDEO_ID, language="en", mode="auto")
+
+    assert response.fetch_strategy == "single_page"
+    assert response.comments_count == 12
+    assert len([c for c in youtube_mock.calls if c.method == "fetch_comment_page"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_auto_mode_samples_a_video_larger_than_the_budget():
+    youtube_mock = YouTubeMock(max_comments=20, sample_max_pages=3)
+    youtube_mock.register_video(
+        VIDEO_ID,
+        comments=[Comment(text=f"comment {i}", like_count=i, author=f"U{i}") for i in range(500)],
+        video_info=VideoInfo(video_id=VIDEO_ID, title="Test Video", channel="Test Channel", comment_count=500),
+    )
+    openai_mock = OpenAIMock(default_output='{"sentiment":"neutral","main_theme":"general"}')
+    pipeline = make_pipeline(youtube_mock, openai_mock)
+
+    response = await pipeline.run(VIDEO_ID, language="en", mode="auto")
+
+    assert response.fetch_strategy == "sample"
+    assert response.classified_count == 20
+    # The first page fetched alongside the video info, then the 3 sampled pages
+    page_calls = [c for c in youtube_mock.calls if c.method == "fetch_comment_page"]
+    assert [c.kwargs["order"] for c in page_calls] == ["relevance", "time", "time", "time"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("comment_count", [12, 60])
+async def test_auto_mode_fetches_the_first_page_alongside_the_video_info(comment_count):
+    """Benchmark: with injected RTT, planning costs no round trip of its own."""
+    latency = 0.2
+    youtube_mock = YouTubeMock(max_comments=60, latency=latency)
+    youtube_mock.register_video(
+        VIDEO_ID,
+        comments=[Comment(text=f"comment {i}", like_count=i, author=f"U{i}") for i in range(comment_count)],
+        video_info=VideoInfo(
+            video_id=VIDEO_ID, title="Test Video", channel="Test Channel", comment_count=comment_count
+        ),
+    )
+    pipeline = make_pipeline(youtube_mock, OpenAIMock(default_output='{"sentiment":"neutral","main_theme":"general"}'))
+    pipeline.planner = FetchPlanner(max_comments=60, sample_max_pages=2, max_workers=4, page_size=50)
+
+    started = time.perf_counter()
+    response = await pipeline.run(VIDEO_ID, language="en", mode="auto")
+    elapsed = time.perf_counter() - started
+
+    assert response.fetch_strategy == ("single_page" if comment_count == 12 else "full")
+    assert response.comments_count == comment_count
+    page_calls = [c for c in youtube_mock.calls if c.method == "fetch_comment_page"]
+    assert len(page_calls) == (1 if comment_count == 12 else 2)
+    # One round trip per page; the video info shares the first one
+    assert elapsed < (len(page_calls) + 0.5) * latency
+
+
+@pytest.mark.asyncio
+async def test_reply_expansion_classifies_replies_of_top_threads():
+    youtube_mock = YouTubeMock(max_comments=10, reply_threads=1, reply_budget=5)
+    comments = [
+        Comment(text=f"comment {i}", like_count=i, author=f"U{i}", reply_count=i, id=f"c{i}")
+        for i in range(10)
+    ]
+    youtube_mock.register_video(
+        VIDEO_ID,
+        comments=comments,
+        video_info=VideoInfo(video_id=VIDEO_ID, title="Test Video", channel="Test Channel"),
+        replies={
+            "c9": [Comment(text=f"reply number {i}", like_count=0, author="R") for i in range(9)],
+            "c8": [Comment(text=f"other reply {i}", like_count=0, author="R") for i in range(8)],
+        },
+    )
+    openai_mock = OpenAIMock(default_output='{"sentiment":"neutral","main_theme":"general"}')
+    pipeline = make_pipeline(youtube_mock, openai_mock)
+
+    response = await pipeline.run(VIDEO_ID, language="en")
+
+    assert response.comments_count == response.classified_count == 15
+    assert len(comments[9].replies) == 5
+    assert all(r.analysis_result is not None for r in comments[9].replies)
+    assert {c.args for c in youtube_mock.calls if c.method == "fetch_reply_page"} == {("c9",)}
+
+
+@pytest.mark.asyncio
+async def test_run_cancelled_by_every_waiter_cancels_openai_calls():
+    youtube_mock = YouTubeMock()
+    register_video(youtube_mock, 10)
+    openai_mock = OpenAIMock(default_output='{"sentiment":"neutral","main_theme":"general"}', latency=5)
+    pipeline = make_pipeline(youtube_mock, openai_mock)
+    pipeline.single_flight = SingleFlight()
+    run_key = pipeline.join_key(pipeline.analysis_key(VIDEO_ID, language="en", mode="full"), None)
+
+    waiters = [asyncio.create_task(pipeline.run(VIDEO_ID, language="en")) for _ in range(2)]
+    await asyncio.sleep(0.1)
+    assert pipeline.single_flight.in_flight(run_key)
+    waiters[0].cancel()
+    await asyncio.sleep(0)
+    # The other waiter still wants the result
+    assert pipeline.single_flight.stats()["abandoned"] == 0
+    assert pipeline.analyzer.abort_stats["openai_calls"] == 0
+
+    waiters[1].cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    # Let the cancellation unwind through the workers
+    await asyncio.sleep(0.05)
+
+    assert pipeline.single_flight.stats()["abandoned"] == 1
+    assert pipeline.analyzer.abort_stats["openai_calls"] == 10
+    assert pipeline.analyzer.abort_stats["comments"] == 10
+    assert not pipeline.single_flight.in_flight(run_key)
+
+
+@pytest.mark.asyncio
+async def test_youtube_transport_error_is_not_reported_as_missing_video():
+    youtube_mock = YouTubeMock()
+    youtube_mock.register_error(VIDEO_ID, httpx.ConnectTimeout("timed out"))
+    pipeline = make_pipeline(youtube_mock, OpenAIMock())
+
+    with pytest.raises(AnalysisError) as exc_info:
+        await pipeline.run(VIDEO_ID, language="en")
+
+    assert exc_info.value.status_code == 502
+
+
+@pytest.mark.asyncio
+async def test_video_info_and_first_page_are_fetched_concurrently():
+    """Benchmark: with injected RTT the first page and the video info cost one round trip, not two."""
+    latency = 0.2
+    youtube_mock = YouTubeMock(latency=latency)
+    register_video(youtube_mock, 1)
+    pipeline = make_pipeline(youtube_mock, OpenAIMock(default_output="{}"))
+
+    started = time.perf_counter()
+    first_page, video_info = await pipeline._fetch_with_video_info(
+        VIDEO_ID,
+        youtube_mock.get_comments(VIDEO_ID),
+        deadline=None,
+        progress=AnalysisProgress(),
+    )
+
+    assert video_info.title == "Test Video"
+    assert len(first_page) == 1
+    assert time.perf_counter() - started < 1.5 * latency
+
+
+@pytest.mark.asyncio
+async def test_comment_failure_cancels_the_video_info_lookup():
+    youtube_mock = YouTubeMock()
+    youtube_mock.set_latency("get_video_info", 5.0)
+    youtube_mock.register_error(VIDEO_ID, PermissionError("Comments are disabled for this video"))
+    pipeline = make_pipeline(youtube_mock, OpenAIMock())
+
+    started = time.perf_counter()
+    with pytest.raises(AnalysisError) as exc_info:
+        await pipeline.run(VIDEO_ID, language="en")
+
+    assert exc_info.value.status_code == 403
+    assert time.perf_counter() - started < 1.0
+
+
+@pytest.mark.asyncio
+async def test_runs_with_different_deadlines_are_not_shared():
+    youtube_mock = YouTubeMock(latency=0.1)
+    register_video(youtube_mock, 3)
+    openai_mock = OpenAIMock(default_output='{"sentiment":"neutral","main_theme":"general"}')
+    pipeline = make_pipeline(youtube_mock, openai_mock)
+    pipeline.single_flight = SingleFlight()
+
+    await asyncio.gather(
+        pipeline.run(VIDEO_ID, language="en", deadline_s=5),
+        pipeline.run(VIDEO_ID, language="en"),
+    )
+
+    # A follower without a deadline must not get the short run's (possibly partial) result
+    assert pipeline.single_flight.stats()["leaders"] == 2
+
+
+@pytest.mark.asyncio
+async def test_follower_progress_follows_the_shared_run():
+    youtube_mock = YouTubeMock(latency=0.1)
+    register_video(youtube_mock, 3)
+    openai_mock = OpenAIMock(default_output='{"sentiment":"neutral","main_theme":"general"}')
+    pipeline = make_pipeline(youtube_mock, openai_mock)
+    pipeline.single_flight = SingleFlight()
+    follower = AnalysisProgress()
+
+    leader_run = asyncio.create_task(pipeline.run(VIDEO_ID, language="en"))
+    await asyncio.sleep(0)
+    await asyncio.gather(leader_run, pipeline.run(VIDEO_ID, language="en", progress=follower))
+
+    assert pipeline.single_flight.stats()["followers"] == 1
+    assert (follower.fetched, follower.classified) == (3, 3)
+    assert follower.video_info["title"] == "Test Video"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["full", "sample"])
+async def test_fetch_uses_the_planned_page_size(mode):
+    youtube_mock = YouTubeMock(max_comments=30, sample_max_pages=2)
+    register_video(youtube_mock, 30)
+    openai_mock = OpenAIMock(default_output='{"sentiment":"neutral","main_theme":"general"}')
+    pipeline = make_pipeline(youtube_mock, openai_mock)
+    pipeline.planner = FetchPlanner(max_comments=30, sample_max_pages=2, max_workers=4, page_size=10)
+
+    await pipeline.run(VIDEO_ID, language="en", mode=mode)
+
+    page_sizes = [c.kwargs["page_size"] for c in youtube_mock.calls if c.method == "fetch_comment_page"]
+    assert page_sizes == ([10, 10, 10] if mode == "full" else [10, 10])
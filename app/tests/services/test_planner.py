@@ -0,0 +1,66 @@
+from app.services.planner import FetchPlanner
+
+
+def make_planner(max_comments: int = 500, sample_max_pages: int = 10) -> FetchPlanner:
+    return FetchPlanner(max_comments=max_comments, sample_max_pages=sample_max_pages, max_workers=20)
+
+
+def test_unknown_comment_count_paginates_up_to_max_comments():
+    plan = make_planner().plan(None)
+
+    assert plan.strategy == "full"
+    assert plan.limit == 500
+    assert plan.workers == 20
+
+
+def test_small_video_is_read_in_one_page_sized_to_the_count():
+    plan = make_planner().plan(12)
+
+    assert plan.strategy == "single_page"
+    assert plan.limit == plan.page_size == 12
+    assert plan.max_pages == 1
+    assert plan.workers == 12
+
+
+def test_video_within_budget_is_paginated_in_full():
+    plan = make_planner().plan(250)
+
+    assert plan.strategy == "full"
+    assert plan.limit == 250
+    assert plan.max_pages == 3
+
+
+def test_huge_video_with_large_budget_uses_sequential_sampling():
+    plan = make_planner(max_comments=2000).plan(2_000_000)
+
+    assert plan.strategy == "sequential"
+    assert plan.limit == 2000
+
+
+def test_huge_video_with_small_budget_is_reservoir_sampled():
+    plan = make_planner(max_comments=30, sample_max_pages=10).plan(2_000_000)
+
+    assert plan.strategy == "sample"
+    assert plan.max_pages == 10
+    assert plan.sample_size == 30
+    assert plan.workers == 20
+
+
+def test_short_deadline_limits_the_pages_read():
+    planner = make_planner(max_comments=2000)
+
+    # 2 s left: half of it for fetching at 0.5 s per page -> 2 pages
+    plan = planner.plan(1500, time_left_s=2.0)
+
+    assert plan.strategy == "sample"
+    assert plan.max_pages == 2
+    assert plan.sample_size == 200
+
+
+def test_explicit_strategy_uses_configured_budgets():
+    planner = make_planner(max_comments=30, sample_max_pages=5)
+
+    assert planner.for_strategy("full").limit == 30
+    sample = planner.for_strategy("sample")
+    assert sample.max_pages == 5
+    assert sample.sample_size == 30
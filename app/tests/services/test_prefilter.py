@@ -0,0 +1,61 @@
+import pytest
+
+from app.services.prefilter import CommentPrefilter
+
+
+@pytest.mark.parametrize("text, sentiment, theme", [
+    ("...", "nonsensical", "no content"),
+    ("?!", "nonsensical", "no content"),
+    ("2:35", "neutral", "timestamp"),
+    ("1:02:03, 4:10", "neutral", "timestamp"),
+    ("😍🔥🔥", "positive", "emoji reaction"),
+    ("👍🏽", "positive", "emoji reaction"),
+    ("💩👎", "negative", "emoji reaction"),
+    ("🦆", "neutral", "emoji reaction"),
+    ("Niiiice!", "positive", "praise"),
+    ("Круто", "positive", "praise"),
+    ("cringe", "negative", "criticism"),
+    ("First!", "off-topic", "first comment"),
+])
+def test_trivial_comments_are_labelled_locally(text, sentiment, theme):
+    result = CommentPrefilter().classify(text)
+
+    assert result is not None
+    assert (result.sentiment, result.main_theme) == (sentiment, theme)
+
+
+@pytest.mark.parametrize("text", [
+    "Great video!",       # two words
+    "Bruh",               # unknown word
+    "😍😭",               # mixed emoji: confidence 0.5
+    "2:35 best part",     # timestamp with text
+    "lol",                # laughter: often sarcastic
+    "hahaha",
+])
+def test_uncertain_comments_go_to_the_llm(text):
+    assert CommentPrefilter().classify(text) is None
+
+
+@pytest.mark.parametrize("language, theme", [
+    ("ru", "похвала"),
+    ("en", "praise"),
+    ("de", ""),  # no translation
+])
+def test_theme_is_labelled_in_the_analysis_language(language, theme):
+    result = CommentPrefilter().classify("круто", language=language)
+
+    assert (result.sentiment, result.main_theme) == ("positive", theme)
+
+
+def test_thresholds_are_configurable_and_hits_are_reported():
+    prefilter = CommentPrefilter(min_confidence=0.5, max_words=2)
+
+    assert prefilter.classify("😍😭").sentiment == "positive"
+    assert prefilter.classify("nice nice").sentiment == "positive"
+    assert prefilter.classify("What a great explanation of recursion") is None
+
+    stats = prefilter.stats()
+    assert (stats["checked"], stats["matched"]) == (3, 2)
+    assert stats["rules"]["emoji"]["hits"] == 1
+    assert stats["rules"]["lexicon"]["hit_rate"] == pytest.approx(1 / 3)
+    assert CommentPrefilter(enabled=False).classify("...") is None
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from app.services.progress import AnalysisProgress
+
+
+async def collect(progress: AnalysisProgress) -> list[tuple[str, dict]]:
+    return [(event.name, event.data) async for event in progress.events()]
+
+
+@pytest.mark.asyncio
+async def test_subscriber_gets_snapshot_then_live_events_then_final():
+    progress = AnalysisProgress()
+    progress.add_fetched(100)
+    progress.page_fetched(100)
+
+    subscriber = asyncio.ensure_future(collect(progress))
+    await asyncio.sleep(0)
+    progress.add_classified(40)
+    progress.emit("summary", text="Viewers liked it", local=False)
+    progress.finish("result", comments_count=100)
+    events = await subscriber
+
+    assert events == [
+        ("progress", {"fetched": 100, "classified": 0, "pages": 1, "video_info": None}),
+        ("classified", {"classified": 40, "fetched": 100}),
+        ("summary", {"text": "Viewers liked it", "local": False}),
+        ("result", {"comments_count": 100}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_late_subscriber_gets_snapshot_and_final_event():
+    progress = AnalysisProgress()
+    progress.video_info_resolved({"title": "Test Video"})
+    progress.add_classified(3)
+    progress.finish("error", status=404, detail="Video not found")
+
+    events = await collect(progress)
+
+    assert [name for name, _ in events] == ["progress", "error"]
+    assert events[0][1]["classified"] == 3
+    assert events[0][1]["video_info"] == {"title": "Test Video"}
+
+
+@pytest.mark.asyncio
+async def test_attached_progress_catches_up_and_follows():
+    shared = AnalysisProgress()
+    shared.add_fetched(5)
+    shared.add_classified(2)
+    shared.video_info_resolved({"title": "Test Video"})
+
+    follower = AnalysisProgress()
+    events = aiter(follower.events())
+    await anext(events)
+    shared.attach(follower)
+    shared.add_classified(3)
+    shared.summary_ready("summary", local=False)
+
+    assert (follower.fetched, follower.classified) == (5, 5)
+    assert follower.video_info == {"title": "Test Video"}
+    assert [(await anext(events)).name for _ in range(4)] == ["classified", "video_info", "classified", "summary"]
+    assert shared.listening
+    await events.aclose()
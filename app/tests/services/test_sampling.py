@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from app.modals.video import Comment
+from app.services.sampling import (
+    ReservoirSampler,
+    like_stratum,
+    share_intervals,
+    stratified_order,
+    wilson_interval,
+    z_score,
+)
+
+
+def test_wilson_interval_matches_reference_values():
+    low, high = wilson_interval(50, 100, z=z_score(0.95))
+    assert low == pytest.approx(0.4038, abs=1e-4)
+    assert high == pytest.approx(0.5962, abs=1e-4)
+
+    low, high = wilson_interval(0, 20, z=z_score(0.95))
+    assert low == pytest.approx(0.0)
+    assert 0.15 < high < 0.17
+
+
+def test_finite_population_correction_collapses_interval_for_full_census():
+    assert wilson_interval(30, 100, z=1.96, population=100) == pytest.approx((0.3, 0.3))
+    narrow = share_intervals({"positive": 30, "negative": 70}, confidence=0.95, population=120)
+    wide = share_intervals({"positive": 30, "negative": 70}, confidence=0.95)
+    assert narrow["positive"][1] - narrow["positive"][0] < wide["positive"][1] - wide["positive"][0]
+
+
+def test_stratified_order_keeps_like_buckets_proportional_in_every_prefix():
+    comments = [Comment(text=f"c{i}", like_count=0, author="A") for i in range(900)]
+    comments += [Comment(text=f"p{i}", like_count=500, author="B") for i in range(100)]
+
+    order = stratified_order(comments, rng=random.Random(7))
+
+    assert sorted(c.text for c in order) == sorted(c.text for c in comments)
+    popular = sum(like_stratum(c) == 3 for c in order[:100])
+    assert 9 <= popular <= 11
+
+
+def test_reservoir_sample_is_uniform():
+    hits = [0] * 100
+    for seed in range(2000):
+        sampler = ReservoirSampler(10, rng=random.Random(seed))
+        sampler.extend(range(100))
+        for item in sampler.sample():
+            hits[item] += 1
+
+    assert sampler.seen == 100
+    # Every item has a 10% chance: 200 expected hits out of 2000 draws
+    assert min(hits) > 140 and max(hits) < 260
+
+
+def test_stratified_reservoir_keeps_rare_strata_share():
+    comments = [Comment(text=f"c{i}", like_count=0, author="A") for i in range(950)]
+    comments += [Comment(text=f"p{i}", like_count=1000, author="B") for i in range(50)]
+    random.Random(3).shuffle(comments)
+
+    sampler = ReservoirSampler(40, stratify=like_stratum, rng=random.Random(5))
+    sampler.extend(comments)
+    sample = sampler.sample()
+
+    assert len(sample) == 40
+    assert sum(c.like_count == 1000 for c in sample) == 2  # 5% of 40
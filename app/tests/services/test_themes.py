@@ -0,0 +1,39 @@
+from app.services.themes import cluster_themes, theme_table, theme_tokens
+
+
+def test_theme_tokens_fold_case_inflection_and_stopwords():
+    assert theme_tokens("Audio Quality") == theme_tokens("audio quality of the video")
+    assert theme_tokens("Editing") == theme_tokens("edited") == frozenset({"edit"})
+    assert theme_tokens("Jokes") == theme_tokens("joke")
+
+
+def test_similar_themes_are_merged_and_ranked():
+    entries = [
+        ("Audio quality", 5, "negative"),
+        ("audio quality issues", 1, "negative"),
+        ("Bad audio quality", 2, "negative"),
+        ("Jokes", 10, "positive"),
+        ("joke", 3, "positive"),
+        ("Music choice", 7, "positive"),
+        ("Audio quality", 0, "neutral"),
+    ]
+
+    clusters = cluster_themes(entries, similarity=0.5)
+
+    assert [(c.label, c.comments, c.likes) for c in clusters] == [
+        ("Audio quality", 4, 8),
+        ("Jokes", 2, 13),
+        ("Music choice", 1, 7),
+    ]
+    assert clusters[0].sentiments == {"negative": 3, "neutral": 1}
+
+
+def test_theme_table_is_bounded():
+    entries = [(f"theme number {i}", i, "neutral") for i in range(100)]
+
+    rows = theme_table(cluster_themes(entries, similarity=1.0), max_themes=10)
+
+    assert len(rows) == 11
+    assert rows[0] == {"theme": "theme number 99", "comments": 1, "likes": 99, "sentiment": {"neutral": 1}}
+    assert rows[-1]["theme"] == "other (90 themes)"
+    assert rows[-1]["comments"] == 90
@@ -0,0 +1,206 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.modals.video import Comment, VideoInfo
+from app.services.youtube import YouTubeService
+from app.tests.helpers.mock_library import YouTubeMock
+
+
+def make_service(handler) -> YouTubeService:
+    service = YouTubeService()
+    service.http_client = httpx.AsyncClient(
+        base_url=YouTubeService.API_BASE_URL,
+        transport=httpx.MockTransport(handler),
+    )
+    return service
+
+
+@pytest.mark.asyncio
+async def test_get_comments_requests_partial_response():
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={
+            "items": [
+                {
+                    "snippet": {
+                        "totalReplyCount": 2,
+                        "topLevelComment": {"snippet": {
+                            "textDisplay": "Great video!",
+                            "likeCount": 7,
+                            "authorDisplayName": "User1",
+                        }},
+                    },
+                },
+            ],
+        })
+
+    service = make_service(handler)
+    comments = await service.get_comments("dQw4w9WgXcQ", comment_chunk_size=5)
+
+    assert [c.text for c in comments] == ["Great video!"]
+    assert comments[0].like_count == 7
+    assert comments[0].reply_count == 2
+
+    params = requests[0].url.params
+    assert requests[0].url.path.endswith("/commentThreads")
+    assert params["key"] == "test-youtube"
+    assert params["maxResults"] == "5"
+    assert params["fields"] == YouTubeService.COMMENT_THREAD_FIELDS
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status_code, error", [(403, PermissionError), (404, ValueError)])
+async def test_get_comments_maps_api_errors(status_code, error):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(status_code, json={"error": {"message": "nope"}})
+
+    service = make_service(handler)
+    with pytest.raises(error):
+        await service.get_comments("dQw4w9WgXcQ")
+
+
+@pytest.mark.asyncio
+async def test_get_video_info_returns_none_on_api_error():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.params.get("id") == "missing":
+            return httpx.Response(404, json={"error": {"message": "not found"}})
+        return httpx.Response(200, json={
+            "items": [{"snippet": {"title": "Test Video", "channelTitle": "Test Channel"}}],
+        })
+
+    service = make_service(handler)
+
+    info = await service.get_video_info("dQw4w9WgXcQ")
+    assert info.title == "Test Video"
+    assert info.channel == "Test Channel"
+    assert await service.get_video_info("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_get_video_info_raises_transport_errors():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    service = make_service(handler)
+
+    with pytest.raises(httpx.ReadTimeout):
+        await service.get_video_info("dQw4w9WgXcQ")
+
+
+@pytest.mark.asyncio
+async def test_get_video_info_reads_comment_count():
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.params["part"] == "snippet,statistics"
+        statistics = {"commentCount": "1234"} if request.url.params["id"] == "dQw4w9WgXcQ" else {}
+        return httpx.Response(200, json={
+            "items": [{
+                "snippet": {"title": "Test Video", "channelTitle": "Test Channel"},
+                "statistics": statistics,
+            }],
+        })
+
+    service = make_service(handler)
+
+    assert (await service.get_video_info("dQw4w9WgXcQ")).comment_count == 1234
+    # Channels can hide the comment count
+    assert (await service.get_video_info("hidden00000")).comment_count is None
+
+
+def make_comments(n: int) -> list[Comment]:
+    return [Comment(text=f"comment {i}", like_count=i, author=f"User{i}") for i in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_iter_comments_paginates_up_to_hard_limit():
+    youtube_mock = YouTubeMock()
+    youtube_mock.register_video("dQw4w9WgXcQ", comments=make_comments(250))
+
+    comments = [c async for c in youtube_mock.iter_comments("dQw4w9WgXcQ", limit=150, order="time")]
+
+    assert [c.text for c in comments] == [f"comment {i}" for i in range(150)]
+    page_calls = [c for c in youtube_mock.calls if c.method == "fetch_comment_page"]
+    assert [c.kwargs["page_size"] for c in page_calls] == [100, 50]
+    assert [c.kwargs["page_token"] for c in page_calls] == [None, "100"]
+    assert all(c.kwargs["order"] == "time" for c in page_calls)
+
+
+@pytest.mark.asyncio
+async def test_iter_comment_pages_prefetches_next_page():
+    """While the caller works on page N, page N+1 is already in flight."""
+    latency = 0.1
+    youtube_mock = YouTubeMock()
+    youtube_mock.set_latency("fetch_comment_page", latency)
+    youtube_mock.register_video("dQw4w9WgXcQ", comments=make_comments(300))
+
+    started = time.perf_counter()
+    pages = 0
+    async for page in youtube_mock.iter_comment_pages("dQw4w9WgXcQ", limit=300):
+        pages += 1
+        await asyncio.sleep(latency)  # simulate per-page processing
+    elapsed = time.perf_counter() - started
+
+    assert pages == 3
+    # Serial fetch + process would take 6 * latency
+    assert elapsed < 5 * latency
+
+
+@pytest.mark.asyncio
+async def test_random_mode_samples_across_bounded_pages():
+    youtube_mock = YouTubeMock(max_comments=30, sample_max_pages=3)
+    youtube_mock.register_video("dQw4w9WgXcQ", comments=make_comments(1000))
+
+    sample = await youtube_mock.get_comments("dQw4w9WgXcQ", order="time", mode="random")
+
+    assert len(sample) == 30
+    assert len({c.text for c in sample}) == 30
+    # Only the first 3 pages are read, and the sample is not just their head
+    assert all(int(c.text.split()[-1]) < 300 for c in sample)
+    assert max(int(c.text.split()[-1]) for c in sample) >= 100
+    page_calls = [c for c in youtube_mock.calls if c.method == "fetch_comment_page"]
+    assert len(page_calls) == 3
+    assert all(c.kwargs["order"] == "time" for c in page_calls)
+
+
+@pytest.mark.asyncio
+async def test_expand_replies_paginates_within_a_fair_budget():
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        parent_id = request.url.params["parentId"]
+        start = int(request.url.params.get("pageToken", 0))
+        size = int(request.url.params["maxResults"])
+        body = {
+            "items": [
+                {"id": f"{parent_id}.{i}", "snippet": {"textDisplay": f"reply {i}", "likeCount": i}}
+                for i in range(start, start + size)
+            ],
+            "nextPageToken": str(start + size),
+        }
+        return httpx.Response(200, json=body)
+
+    service = make_service(handler)
+    service.REPLY_PAGE_SIZE = 50
+    comments = [
+        Comment(text="small", like_count=0, author="A", reply_count=20, id="small"),
+        Comment(text="huge", like_count=0, author="B", reply_count=5000, id="huge"),
+        Comment(text="none", like_count=0, author="C", reply_count=0, id="none"),
+        Comment(text="skipped", like_count=0, author="D", reply_count=3, id="skipped"),
+    ]
+
+    replies = await service.expand_replies(comments, threads=2, budget=150, concurrency=2)
+
+    # The small thread is fetched in full, the huge one gets the rest of the budget
+    assert len(comments[0].replies) == 20
+    assert len(comments[1].replies) == 130
+    assert comments[3].replies == []
+    assert len(replies) == 150
+    assert {r.parent_id for r in replies} == {"small", "huge"}
+    assert {r.url.params["fields"] for r in requests} == {YouTubeService.REPLY_FIELDS}
+    huge_pages = [r for r in requests if r.url.params["parentId"] == "huge"]
+    assert [int(r.url.params["maxResults"]) for r in huge_pages] == [50, 50, 30]
@@ -17,6 +17,10 @@ logger = logging.getLogger(__name__)
 
 router = Router()
 
+# The analysis deadline sent to the API is this much shorter than our HTTP timeout,
+# so a partial result arrives before we give up waiting
+ANALYZE_DEADLINE_MARGIN_S = 5
+
 
 def format_analysis_result(
     result: str,
@@ -248,7 +252,19 @@ async def handle_youtube_link(message: Message):
                     r = await _post_with_retries(
                         client=client,
                         url=analyze_url,
-                        json={"video_url": text, "language": language},
+                        json={
+                            "video_url": text,
+                            "language": language,
+                            # Small videos are read whole, large ones randomly sampled
+                            "mode": "auto",
+                            "deadline_s": max(1, settings.http_timeout_s - ANALYZE_DEADLINE_MARGIN_S),
+                        },
+                        headers={
+                            # Same key on every retry: a retry attaches to the analysis already running
+                            "Idempotency-Key": f"tg-{message.chat.id}-{message.message_id}",
+                            # The API cancels the analysis once we stop waiting for it
+                            "X-Request-Timeout": str(settings.http_timeout_s),
+                        },
                         max_retries=settings.http_max_retries,
                         timeout=settings.http_timeout_s,
                         backoff_base=settings.http_backoff_base_s,
@@ -350,6 +366,9 @@ async def handle_youtube_link(message: Message):
             language, count_comments_per_sentiment, likes_per_category)
         feedback_url = (settings.feedback_form_url or "").strip()
         extra_lines: list[str] = [sentiments_text, likes_text]
+        if data.get("partial"):
+            coverage = round(100 * data.get("coverage", 0))
+            extra_lines.append(t(language, "partial_result", coverage=coverage))
         reply_markup = None
         if feedback_url:
             extra_lines.append(t(language, "feedback_cta"))
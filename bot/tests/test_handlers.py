@@ -57,6 +57,8 @@ async def test_handle_youtube_link_uses_analyzer(monkeypatch):
     message = SimpleNamespace(
         text="https://youtu.be/video123",
         from_user=SimpleNamespace(id=42),
+        chat=SimpleNamespace(id=42),
+        message_id=7,
         answer=AsyncMock(return_value=processing_msg),
     )
 
@@ -80,6 +82,8 @@ async def test_invalid_youtube_link(monkeypatch):
     message = SimpleNamespace(
         text="not-a-youtube-link",
         from_user=SimpleNamespace(id=42),
+        chat=SimpleNamespace(id=42),
+        message_id=7,
         answer=AsyncMock(),
     )
 
@@ -89,3 +93,62 @@ async def test_invalid_youtube_link(monkeypatch):
     called_msg = message.answer.call_args.args[0]
     # Message is in Russian by default, so check for either Russian or English
     assert "invalid" in called_msg.lower() or "некорректна" in called_msg.lower()
+
+
+@pytest.mark.asyncio
+async def test_handle_youtube_link_sends_deadline_and_flags_partial_result(monkeypatch):
+    """The bot asks for a result before its own timeout and says when it is partial."""
+    mock_settings = SimpleNamespace(
+        api_base_url="http://localhost:8000",
+        http_max_retries=1,
+        http_timeout_s=30,
+        http_backoff_base_s=0.1,
+        http_backoff_max_s=5,
+        feedback_form_url="",
+    )
+    monkeypatch.setattr("bot.handlers.get_settings", lambda: mock_settings)
+    monkeypatch.setattr(
+        "bot.handlers.get_youtube_service",
+        lambda: SimpleNamespace(extract_video_id=lambda url: "video123"),
+    )
+
+    mock_response = SimpleNamespace(
+        status_code=200,
+        json=lambda: {
+            "analyze_result": "Summary text",
+            "count_comments_per_sentiment": {"positive": 1},
+            "likes_per_category": {"positive": 2},
+            "video_info": {"video_id": "video123", "title": "Test Video", "channel": "Test Ch"},
+            "comments_count": 4,
+            "partial": True,
+            "coverage": 0.25,
+        },
+        text='',
+        raise_for_status=lambda: None,
+    )
+    mock_client = AsyncMock()
+    mock_client.post = AsyncMock(return_value=mock_response)
+    mock_client.__aenter__ = AsyncMock(return_value=mock_client)
+    mock_client.__aexit__ = AsyncMock(return_value=None)
+    monkeypatch.setattr("httpx.AsyncClient", lambda *args, **kwargs: mock_client)
+
+    processing_msg = SimpleNamespace(edit_text=AsyncMock())
+    message = SimpleNamespace(
+        text="https://youtu.be/video123",
+        from_user=SimpleNamespace(id=42),
+        chat=SimpleNamespace(id=42),
+        message_id=7,
+        answer=AsyncMock(return_value=processing_msg),
+    )
+
+    await handlers.handle_youtube_link(message)
+
+    sent = mock_client.post.call_args.kwargs["json"]
+    assert sent["deadline_s"] == 30 - handlers.ANALYZE_DEADLINE_MARGIN_S
+    assert sent["mode"] == "auto"
+    assert mock_client.post.call_args.kwargs["headers"] == {
+        "Idempotency-Key": "tg-42-7",
+        "X-Request-Timeout": "30",
+    }
+    final_message = processing_msg.edit_text.call_args_list[-1].args[0]
+    assert "25%" in final_message
@@ -42,6 +42,8 @@ async def test_handle_youtube_link_timeout(monkeypatch):
     message = SimpleNamespace(
         text="https://youtu.be/video123",
         from_user=SimpleNamespace(id=42),
+        chat=SimpleNamespace(id=42),
+        message_id=7,
         answer=AsyncMock(return_value=processing_msg),
     )
 
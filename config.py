@@ -19,6 +19,27 @@ class Settings(BaseSettings):
         description="OpenAI model to use",
     )
 
+    openai_concurrency_initial: int = Field(
+        default=20,
+        description="Starting process-wide limit of concurrent OpenAI requests (adapted by AIMD)",
+    )
+    openai_concurrency_min: int = Field(
+        default=2,
+        description="Lowest concurrency the adaptive OpenAI limiter may back off to",
+    )
+    openai_concurrency_max: int = Field(
+        default=64,
+        description="Highest concurrency the adaptive OpenAI limiter may grow to",
+    )
+    openai_rpm_limit: int | None = Field(
+        default=None,
+        description="OpenAI requests-per-minute budget to pace calls under (unset = no pacing)",
+    )
+    openai_tpm_limit: int | None = Field(
+        default=None,
+        description="OpenAI tokens-per-minute budget to pace calls under (unset = no pacing)",
+    )
+
     # ===================== Webhook =====================
     webhook_url: str | None = Field(
         default=None,
@@ -36,6 +57,78 @@ class Settings(BaseSettings):
         default=30,
         description="Maximum comments to fetch",
     )
+    sample_max_pages: int = Field(
+        default=10,
+        description="Comment pages (100 each) read when drawing a random sample of max_comments",
+    )
+    reply_threads: int = Field(
+        default=0,
+        description="Fetch and classify the replies of this many most-replied threads (0 disables)",
+    )
+    reply_budget: int = Field(
+        default=200,
+        description="Maximum replies fetched per video, shared fairly between the expanded threads",
+    )
+    reply_fetch_concurrency: int = Field(
+        default=4,
+        description="Reply threads fetched concurrently",
+    )
+    analysis_jobs_max: int = Field(
+        default=1000,
+        description="Background analysis jobs kept in memory (running and finished)",
+    )
+    analysis_job_ttl_s: int = Field(
+        default=3600,
+        description="Seconds a finished analysis job can still be polled",
+    )
+    idempotency_ttl_s: int = Field(
+        default=3600,
+        description="Seconds a request outcome is replayed for retries with the same Idempotency-Key",
+    )
+    idempotency_max_entries: int = Field(
+        default=10000,
+        description="Idempotency-Key outcomes kept in memory",
+    )
+    idempotency_abandon_grace_s: float = Field(
+        default=10.0,
+        description="Seconds an analysis whose client went away keeps running for a retry to attach",
+    )
+    client_disconnect_poll_s: float = Field(
+        default=0.5,
+        description="How often a running analysis checks whether its client is still connected",
+    )
+
+    # ===================== Comment analysis cache =====================
+    comment_cache_path: str | None = Field(
+        default=None,
+        description="SQLite file for the persistent comment analysis cache (memory only when unset)",
+    )
+    comment_cache_ttl_s: int = Field(
+        default=7 * 24 * 3600,
+        description="Lifetime of a cached comment analysis in seconds",
+    )
+    comment_cache_max_entries: int = Field(
+        default=10_000,
+        description="Maximum comment analyses kept in the in-process LRU",
+    )
+    comment_cache_disk_max_entries: int = Field(
+        default=200_000,
+        description="Maximum comment analyses kept in the SQLite cache",
+    )
+
+    # ===================== Analysis result cache =====================
+    result_cache_ttl_s: int = Field(
+        default=600,
+        description="Seconds a whole-video analysis is served as fresh (0 disables the cache)",
+    )
+    result_cache_stale_s: int = Field(
+        default=1800,
+        description="Grace window after the TTL in which a stale analysis is served while it is refreshed",
+    )
+    result_cache_max_entries: int = Field(
+        default=512,
+        description="Maximum whole-video analyses kept in memory",
+    )
 
     # ===================== Feedback =====================
     feedback_form_url: str | None = Field(
@@ -52,6 +145,71 @@ class Settings(BaseSettings):
         ...,
         description="OpenAI Prompt ID for topic analysis",
     )
+    comment_batch_prompt_id: str | None = Field(
+        default=None,
+        description="OpenAI Prompt ID for batched comment analysis (batching is off when unset)",
+    )
+    comment_batch_size: int | None = Field(
+        default=None,
+        description="Comments per batched analysis request (default: CommentAnalyzer.BATCH_SIZE)",
+    )
+    prefilter_enabled: bool = Field(
+        default=True,
+        description="Label trivial comments (emoji/punctuation/timestamps/one word) locally without OpenAI",
+    )
+    prefilter_min_confidence: float = Field(
+        default=0.9,
+        description="Minimum rule confidence for a local label; less confident comments go to OpenAI",
+    )
+    prefilter_max_words: int = Field(
+        default=1,
+        description="Longest comment (in words) the prefilter lexicon may label",
+    )
+    theme_similarity: float = Field(
+        default=0.5,
+        description="Token-set similarity above which main themes are merged for the topic summary",
+    )
+    topic_max_themes: int = Field(
+        default=50,
+        description="Theme clusters sent to the topic-analysis prompt; the rest are aggregated",
+    )
+    topic_map_reduce_threshold: int = Field(
+        default=200,
+        description="Theme clusters above which the topic summary is built map-reduce",
+    )
+    topic_map_fan_out: int = Field(
+        default=8,
+        description="Parallel map calls (chunks of theme clusters) in map-reduce topic analysis",
+    )
+    topic_reduce_fan_in: int = Field(
+        default=4,
+        description="Partial summaries merged per reduce call in map-reduce topic analysis",
+    )
+    topic_reduce_prompt_id: str | None = Field(
+        default=None,
+        description="OpenAI Prompt ID that merges partial topic summaries (map-reduce topic analysis is off when unset)",
+    )
+    sequential_margin: float = Field(
+        default=0.05,
+        description="Sequential sampling stops once every sentiment share is known within +/- this margin",
+    )
+    sequential_confidence: float = Field(
+        default=0.95,
+        description="Confidence level of the sentiment share intervals in sequential sampling",
+    )
+    sequential_min_sample: int = Field(
+        default=100,
+        description="Comments classified before sequential sampling may stop",
+    )
+    sequential_step: int = Field(
+        default=100,
+        description="Comments classified per sequential sampling round",
+    )
+    comment_dedup_threshold: float | None = Field(
+        default=0.8,
+        description="Shingle Jaccard similarity above which comments share one classification "
+        "(unset = collapse exact duplicates only)",
+    )
 
     # ===================== Auth (Bot → FastAPI) =====================
     bot_client_id: str = Field(